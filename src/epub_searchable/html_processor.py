@@ -2,10 +2,12 @@
 HTML processing module for adding transparent text layers.
 """
 
+from html import escape
 from lxml import etree, html
 from pathlib import Path
 import re
-from .utils import _poly2rect, to_full_width, _calc_font_size, _is_furigana
+from yomitoku.ruby import pair_ruby, split_ruby_segments
+from .utils import _poly2rect, to_full_width, _calc_font_size
 
 
 class HTMLProcessor:
@@ -19,14 +21,17 @@ class HTMLProcessor:
         'epub': 'http://www.idpf.org/2007/ops'
     }
     
-    def __init__(self, base_dir):
+    def __init__(self, base_dir, ruby_markup=False):
         """
         Initialize HTML processor.
         
         Args:
             base_dir: Base directory for resolving relative image paths
+            ruby_markup: If True, furigana is emitted as <ruby> markup on its
+                base text instead of being dropped from the text layer
         """
         self.base_dir = Path(base_dir)
+        self.ruby_markup = ruby_markup
     
     def parse_html(self, html_path):
         """
@@ -145,8 +150,20 @@ class HTMLProcessor:
         # Text layer: transparent OCR text
         html_parts.append(f'  <div class="text-layer" style="width: {image_width}px; height: {image_height}px;">')
         
+        # Pair furigana with its base text
+        # Furigana is not read by screen readers as a separate word
+        pairs = pair_ruby(ocr_results.words)
+        ruby_indices = {pair["ruby"] for pair in pairs}
+        ruby_spans = {}
+        for pair in pairs:
+            ruby_text = ocr_results.words[pair["ruby"]].content
+            ruby_spans.setdefault(pair["base"], []).append((pair["span"], ruby_text))
+        
         # Add each word as a positioned span
-        for word in ocr_results.words:
+        for i, word in enumerate(ocr_results.words):
+            if i in ruby_indices:
+                continue
+            
             text = word.content
             bbox = _poly2rect(word.points)
             direction = word.direction
@@ -161,14 +178,6 @@ class HTMLProcessor:
             else:
                 font_size = _calc_font_size(text, bbox_width, bbox_height)
             
-            # Skip furigana from accessible text layer
-            if _is_furigana(text, font_size, bbox_height, bbox_width):
-                continue
-            
-            # Convert to full-width for vertical text
-            if direction == "vertical":
-                text = to_full_width(text)
-            
             # Build span styles
             styles = [
                 f'left: {x1}px',
@@ -183,10 +192,25 @@ class HTMLProcessor:
             
             style_str = '; '.join(styles)
             
-            # Escape HTML entities
-            text_escaped = html.escape(text)
+            # Split into segments with and without furigana
+            if self.ruby_markup and i in ruby_spans:
+                segments = split_ruby_segments(text, ruby_spans[i])
+            else:
+                segments = [(text, None)]
+            
+            content = []
+            for segment, ruby_text in segments:
+                # Convert to full-width for vertical text
+                if direction == "vertical":
+                    segment = to_full_width(segment)
+                
+                # Escape HTML entities
+                segment = escape(segment)
+                if ruby_text is not None:
+                    segment = f'<ruby>{segment}<rt>{escape(ruby_text)}</rt></ruby>'
+                content.append(segment)
             
-            html_parts.append(f'    <span style="{style_str}">{text_escaped}</span>')
+            html_parts.append(f'    <span style="{style_str}">{"".join(content)}</span>')
         
         html_parts.append('  </div>')
         html_parts.append('</body>')
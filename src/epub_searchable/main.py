@@ -9,7 +9,7 @@ from .ocr_processor import OCRProcessor
 from .html_processor import HTMLProcessor
 
 
-def convert_epub_to_searchable(input_epub, output_epub, font_path=None):
+def convert_epub_to_searchable(input_epub, output_epub, font_path=None, ruby_markup=False):
     """
     Convert image-based EPUB to searchable EPUB with transparent text layer.
     
@@ -17,6 +17,7 @@ def convert_epub_to_searchable(input_epub, output_epub, font_path=None):
         input_epub: Path to input EPUB file
         output_epub: Path to output EPUB file
         font_path: Path to font file for font size calculations (optional)
+        ruby_markup: Emit furigana as <ruby> markup instead of dropping it (optional)
     
     Returns:
         Path to output EPUB file
@@ -43,7 +44,7 @@ def convert_epub_to_searchable(input_epub, output_epub, font_path=None):
         print(f"  Found {len(html_files)} HTML files")
         
         # Step 4: Process each HTML file
-        html_processor = HTMLProcessor(extract_dir)
+        html_processor = HTMLProcessor(extract_dir, ruby_markup=ruby_markup)
         processed_count = 0
         
         for i, html_file in enumerate(html_files, 1):
@@ -84,15 +85,18 @@ def convert_epub_to_searchable(input_epub, output_epub, font_path=None):
 
 def main():
     """Command-line interface."""
-    if len(sys.argv) < 3:
-        print("Usage: python -m src.epub_searchable.main <input.epub> <output.epub> [font.ttf]")
+    args = [arg for arg in sys.argv[1:] if arg != "--ruby"]
+    ruby_markup = "--ruby" in sys.argv[1:]
+    
+    if len(args) < 2:
+        print("Usage: python -m src.epub_searchable.main <input.epub> <output.epub> [font.ttf] [--ruby]")
         sys.exit(1)
     
-    input_epub = sys.argv[1]
-    output_epub = sys.argv[2]
-    font_path = sys.argv[3] if len(sys.argv) > 3 else None
+    input_epub = args[0]
+    output_epub = args[1]
+    font_path = args[2] if len(args) > 2 else None
     
-    convert_epub_to_searchable(input_epub, output_epub, font_path)
+    convert_epub_to_searchable(input_epub, output_epub, font_path, ruby_markup)
 
 
 if __name__ == "__main__":
@@ -3,7 +3,6 @@ Utility functions for searchable EPUB generation.
 Adapted from yomitoku's searchable_pdf.py logic.
 """
 
-import re
 import numpy as np
 import jaconv
 from reportlab.pdfbase.ttfonts import TTFont
@@ -82,48 +81,6 @@ def to_full_width(text):
     return jaconv_text
 
 
-def _is_kana_only(text):
-    """
-    Check if text contains only hiragana, katakana, and Japanese punctuation.
-    Returns True if the text is likely furigana.
-    """
-    # Pattern: hiragana, katakana, small kana, Japanese punctuation, whitespace
-    kana_pattern = re.compile(r'^[\u3040-\u309F\u30A0-\u30FF\u3001-\u303F\s]+$')
-    return bool(kana_pattern.match(text))
-
-
-def _is_furigana(text, font_size, bbox_height, bbox_width):
-    """
-    Determine if a text element is furigana based on multiple criteria:
-    1. Font size is small (< 8pt)
-    2. Text contains only kana characters
-    3. Bounding box is small relative to typical text
-    
-    Args:
-        text: The text content
-        font_size: Calculated font size
-        bbox_height: Height of bounding box
-        bbox_width: Width of bounding box
-    
-    Returns:
-        bool: True if the text is likely furigana
-    """
-    # Criterion 1: Small font size (typical furigana is < 8pt)
-    if font_size >= 8:
-        return False
-    
-    # Criterion 2: Must be kana-only
-    if not _is_kana_only(text):
-        return False
-    
-    # Criterion 3: Small bounding box (furigana is typically small)
-    # For horizontal text, height < 12px; for vertical, width < 12px
-    if bbox_height < 12 or bbox_width < 12:
-        return True
-    
-    return False
-
-
 def register_font(font_path):
     """
     Register a TrueType font with reportlab for font size calculations.
@@ -0,0 +1,106 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from yomitoku.document_analyzer import DocumentAnalyzer
+from yomitoku.schemas import (
+    DocumentAnalyzerSchema,
+    LayoutAnalyzerSchema,
+    OCRSchema,
+)
+
+
+def synthesize_results(num_paragraphs, words_per_paragraph, num_figures, seed=0):
+    """
+    Build the OCR and layout results of a dense page without running the
+    models. Paragraphs are laid out in a grid, and each holds a column of
+    horizontal words.
+    """
+    rng = np.random.default_rng(seed)
+    cols = 4
+    rows = int(np.ceil(num_paragraphs / cols))
+    word_h, word_w, gap = 24, 300, 8
+    para_h = words_per_paragraph * (word_h + gap)
+
+    words, paragraphs = [], []
+    for i in range(num_paragraphs):
+        x1 = 50 + (i % cols) * (word_w + 60)
+        y1 = 50 + (i // cols) * (para_h + 40)
+        paragraphs.append(
+            {
+                "box": [x1, y1, x1 + word_w, y1 + para_h],
+                "score": 0.9,
+                "role": "section_headings" if i % 10 == 0 else None,
+            }
+        )
+        for j in range(words_per_paragraph):
+            y = y1 + j * (word_h + gap)
+            width = int(rng.integers(word_w // 2, word_w))
+            words.append(
+                {
+                    "points": [
+                        [x1, y],
+                        [x1 + width, y],
+                        [x1 + width, y + word_h],
+                        [x1, y + word_h],
+                    ],
+                    "content": f"word{i}-{j}",
+                    "direction": "horizontal",
+                    "rec_score": 0.9,
+                    "det_score": 0.9,
+                }
+            )
+
+    height = 100 + rows * (para_h + 40)
+    figures = [
+        {"box": [50, 50 + k * 400, 700, 350 + k * 400], "score": 0.9, "role": None}
+        for k in range(num_figures)
+        if 350 + k * 400 < height
+    ]
+
+    ocr = OCRSchema(words=words)
+    layout = LayoutAnalyzerSchema(paragraphs=paragraphs, tables=[], figures=figures)
+    return ocr, layout
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure DocumentAnalyzer.aggregate on a synthetic dense page."
+    )
+    parser.add_argument("--num_paragraphs", type=int, default=200)
+    parser.add_argument("--words_per_paragraph", type=int, default=10)
+    parser.add_argument("--num_figures", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", type=str, default=None, help="save the JSON output")
+    args = parser.parse_args()
+
+    # モデルを読み込まずにaggregateだけを実行する
+    analyzer = DocumentAnalyzer.__new__(DocumentAnalyzer)
+    analyzer.ignore_meta = False
+    analyzer.reading_order = "auto"
+    analyzer.img = None
+
+    elapsed = []
+    for _ in range(args.repeat):
+        ocr, layout = synthesize_results(
+            args.num_paragraphs, args.words_per_paragraph, args.num_figures
+        )
+        start = time.perf_counter()
+        outputs = analyzer.aggregate(ocr, layout)
+        results = DocumentAnalyzerSchema(**outputs)
+        elapsed.append(time.perf_counter() - start)
+
+    print(
+        f"{len(ocr.words)} words, {len(layout.paragraphs)} paragraphs: "
+        f"aggregate {1000 * min(elapsed):.1f} ms"
+    )
+
+    if args.out is not None:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results.model_dump(), f, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image, ImageDraw, ImageFont
+
+from yomitoku.constants import ROOT_DIR
+from yomitoku.text_recognizer import TextRecognizer
+
+WORDS = [
+    "第1章 はじめに",
+    "本書の使い方",
+    "2024年3月31日",
+    "株式会社サンプル",
+    "お問い合わせ先",
+    "合計金額 ¥12,800",
+    "ページ 128",
+    "東京都千代田区丸の内1-1-1",
+    "注意事項",
+    "Table 3. Results",
+    "吾輩は猫である。名前はまだ無い。",
+    "どこで生れたかとんと見当がつかぬ。",
+    "第二部 応用編",
+    "図4 処理の流れ",
+    "TEL 03-1234-5678",
+    "以上",
+]
+
+
+def render_words(words, font_path, height=48):
+    """Stack the rendered words on one page and return the page and their quads."""
+    font = ImageFont.truetype(font_path, int(height * 0.7))
+    crops = []
+    for word in words:
+        left, top, right, bottom = font.getbbox(word)
+        crop = Image.new("RGB", (right - left + 16, height), (255, 255, 255))
+        ImageDraw.Draw(crop).text(
+            (8 - left, (height - bottom - top) // 2), word, font=font, fill=(0, 0, 0)
+        )
+        crops.append(np.array(crop)[:, :, ::-1])
+
+    width = max(crop.shape[1] for crop in crops)
+    page = np.full((height * len(crops), width, 3), 255, dtype=np.uint8)
+    points = []
+    for i, crop in enumerate(crops):
+        y, w = i * height, crop.shape[1]
+        page[y : y + height, :w] = crop
+        points.append([[0, y], [w, y], [w, y + height], [0, y + height]])
+
+    return page, points
+
+
+def load_words(path):
+    """Read a TSV file of an image path and its text on each line."""
+    images, labels = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            image, label = line.rstrip("\n").split("\t", 1)
+            images.append(cv2.imread(image))
+            labels.append(label)
+
+    width = max(img.shape[1] for img in images)
+    height = sum(img.shape[0] for img in images)
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+    points = []
+    y = 0
+    for img in images:
+        h, w = img.shape[:2]
+        page[y : y + h, :w] = img
+        points.append([[0, y], [w, y], [w, y + h], [0, y + h]])
+        y += h
+
+    return page, points, labels
+
+
+def edit_distance(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return row[-1]
+
+
+def character_error_rate(preds, labels):
+    errors = sum(edit_distance(p, t) for p, t in zip(preds, labels))
+    return errors / max(1, sum(len(t) for t in labels))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the throughput and the character error rate of the PARSeq decode modes."
+    )
+    parser.add_argument("--model_name", type=str, default="parseqv2")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument(
+        "--labels",
+        type=str,
+        default=None,
+        help="TSV file of a word image path and its text on each line. Words rendered with the bundled font are used if not set.",
+    )
+    parser.add_argument("--repeat", type=int, default=4, help="copies of the words")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.9, 0.99])
+    parser.add_argument(
+        "--random_weights",
+        action="store_true",
+        help="skip downloading the weights. Only the throughput is meaningful.",
+    )
+    args = parser.parse_args()
+
+    if args.labels is not None:
+        page, points, labels = load_words(args.labels)
+    else:
+        labels = WORDS * args.repeat
+        page, points = render_words(labels, f"{ROOT_DIR}/resource/MPLUS1p-Medium.ttf")
+
+    torch.manual_seed(0)
+    recognizer = TextRecognizer(
+        model_name=args.model_name,
+        device=args.device,
+        from_pretrained=not args.random_weights,
+    )
+
+    cases = [("ar", None), ("nar", None)]
+    cases += [("hybrid", threshold) for threshold in args.thresholds]
+
+    print(f"{args.model_name}: {len(labels)} words")
+    for mode, threshold in cases:
+        recognizer.set_decode_mode(mode, threshold)
+        recognizer(page, points[:2])  # warm up
+
+        recognizer.model.num_decoded = recognizer.model.num_fallback = 0
+        start = time.time()
+        results, _ = recognizer(page, points)
+        elapsed = time.time() - start
+
+        name = mode if threshold is None else f"{mode}@{threshold}"
+        line = (
+            f"{name:>12}: {len(labels) / elapsed:8.1f} words/s, "
+            f"CER {100 * character_error_rate(results.contents, labels):5.1f}%"
+        )
+        if mode == "hybrid":
+            stats = recognizer.decoding_stats()
+            line += f", AR fallback {100 * stats['fallback_rate']:5.1f}%"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
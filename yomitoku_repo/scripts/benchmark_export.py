@@ -0,0 +1,83 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmark_aggregate import synthesize_results
+
+from yomitoku.document_analyzer import DocumentAnalyzer
+from yomitoku.export import open_stream_writer, save_json
+from yomitoku.schemas import DocumentAnalyzerSchema
+
+
+def write_json(pages, out_path):
+    with open_stream_writer("json", out_path) as writer:
+        for page in pages:
+            writer.write(page.model_dump())
+
+
+def write_format(format):
+    def write(pages, out_path):
+        with open_stream_writer(format, out_path) as writer:
+            for page in pages:
+                writer.write(page)
+
+    return write
+
+
+def write_per_page(pages, out_path):
+    for i, page in enumerate(pages):
+        save_json(page.model_dump(), f"{out_path}_{i}.json", "utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the export time of the JSON, JSON-lines and Parquet outputs."
+    )
+    parser.add_argument("--num_pages", type=int, default=20)
+    parser.add_argument("--num_paragraphs", type=int, default=200)
+    parser.add_argument("--words_per_paragraph", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    analyzer = DocumentAnalyzer.__new__(DocumentAnalyzer)
+    analyzer.ignore_meta = False
+    analyzer.reading_order = "auto"
+    analyzer.img = None
+
+    ocr, layout = synthesize_results(args.num_paragraphs, args.words_per_paragraph, 2)
+    page = DocumentAnalyzerSchema(**analyzer.aggregate(ocr, layout))
+    pages = [page] * args.num_pages
+
+    cases = [
+        ("json (per page)", write_per_page, "json"),
+        ("json (combine)", write_json, "json"),
+        ("jsonl", write_format("jsonl"), "jsonl"),
+    ]
+    try:
+        import pyarrow  # noqa: F401
+
+        cases.append(("parquet", write_format("parquet"), "parquet"))
+    except ImportError:
+        print("pyarrow is not installed, skip parquet")
+
+    print(f"{args.num_pages} pages, {len(page.words)} words per page")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, write, ext in cases:
+            out_path = os.path.join(tmp_dir, f"out.{ext}")
+            elapsed = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                write(pages, out_path)
+                elapsed.append(time.perf_counter() - start)
+
+            size = sum(
+                os.path.getsize(os.path.join(tmp_dir, f)) for f in os.listdir(tmp_dir)
+            )
+            print(f"{name:>16}: {1000 * min(elapsed):8.1f} ms, {size / 2**20:6.2f} MiB")
+            for f in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, f))
+
+
+if __name__ == "__main__":
+    main()
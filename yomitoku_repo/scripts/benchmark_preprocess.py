@@ -0,0 +1,119 @@
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import torch
+import torchvision.transforms as T
+from PIL import Image
+
+from yomitoku.data.functions import (
+    array_to_tensor,
+    image_to_tensor,
+    resize_shortest_edge,
+    shortest_edge_size,
+    standardization_image,
+)
+
+DET_MEAN = (0.485, 0.456, 0.406)
+DET_STD = (0.229, 0.224, 0.225)
+
+
+def legacy_detector(data, shortest_size, limit_size):
+    img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    img = img.copy()
+    img = img[:, :, ::-1].astype(np.float32)
+    resized = resize_shortest_edge(img, shortest_size, limit_size)
+    return array_to_tensor(standardization_image(resized))
+
+
+def detector(data, shortest_size, limit_size):
+    img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    size = shortest_edge_size(img.shape[:2], shortest_size, limit_size)
+    return image_to_tensor(
+        img, size, mean=DET_MEAN, std=DET_STD, interpolation=cv2.INTER_AREA
+    )
+
+
+def legacy_layout(data, img_size):
+    img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    transforms = T.Compose([T.Resize(img_size), T.ToTensor()])
+    img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    return transforms(img)[None]
+
+
+def layout(data, img_size):
+    img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    return image_to_tensor(img, img_size, swap_rb=True)
+
+
+def legacy_recognizer(words):
+    transforms = T.Compose([T.ToTensor(), T.Normalize(0.5, 0.5)])
+    return torch.cat([transforms(word)[None] for word in words], 0)
+
+
+def recognizer(words):
+    h, w = words[0].shape[:2]
+    batch = np.empty((len(words), 3, h, w), dtype=np.float32)
+    for i, word in enumerate(words):
+        image_to_tensor(word, mean=(0.5,) * 3, std=(0.5,) * 3, out=batch[i])
+    return torch.from_numpy(batch)
+
+
+def measure(func, *args, repeat=5):
+    func(*args)  # warm up
+
+    start = time.time()
+    for _ in range(repeat):
+        func(*args)
+    elapsed = (time.time() - start) / repeat
+
+    # numpyの配列の確保はtracemallocで追跡できるが、torchが確保したテンソルは含まれない
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the decode-to-tensor time and the peak memory of the preprocessing."
+    )
+    parser.add_argument("--input", type=str, default=None, help="page image")
+    parser.add_argument("--height", type=int, default=3508, help="A4 at 300 DPI")
+    parser.add_argument("--width", type=int, default=2480)
+    parser.add_argument("--num_words", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.input is not None:
+        img = cv2.imread(args.input)
+    else:
+        rng = np.random.default_rng(0)
+        img = rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    _, data = cv2.imencode(".png", img)
+
+    rng = np.random.default_rng(0)
+    words = list(rng.integers(0, 256, (args.num_words, 32, 800, 3), dtype=np.uint8))
+
+    cases = [
+        ("text_detector", legacy_detector, detector, (data, 1280, 1600)),
+        ("layout_parser", legacy_layout, layout, (data, [640, 640])),
+        ("text_recognizer", legacy_recognizer, recognizer, (words,)),
+    ]
+
+    print(f"page: {img.shape[1]}x{img.shape[0]}, {args.num_words} words")
+    for name, legacy, func, inputs in cases:
+        for mode, f in [("legacy", legacy), ("uint8", func)]:
+            elapsed, peak = measure(f, *inputs, repeat=args.repeat)
+            print(
+                f"{name:>16} {mode:>6}: {1000 * elapsed:8.1f} ms, "
+                f"peak {peak / 2**20:7.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from yomitoku.constants import ROOT_DIR
+from yomitoku.text_detector import TextDetector
+
+SAMPLE_TEXT = "吾輩は猫である。名前はまだ無い。どこで生れたかとんと見当がつかぬ。"
+
+
+def synthesize_page(height, width, font_size, line_chars, seed=0):
+    """
+    Render a dense page of small horizontal text lines.
+
+    Returns:
+        np.ndarray: page image (BGR)
+        np.ndarray: (N, 4) ground truth boxes of the lines (x1, y1, x2, y2)
+    """
+    rng = np.random.default_rng(seed)
+    font = ImageFont.truetype(f"{ROOT_DIR}/resource/MPLUS1p-Medium.ttf", font_size)
+    page = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(page)
+
+    boxes = []
+    line_height = int(font_size * 1.8)
+    line_width = font_size * line_chars
+    margin = font_size * 2
+    for y in range(margin, height - margin - line_height, line_height):
+        for x in range(margin, width - margin - line_width, line_width + font_size * 2):
+            start = int(rng.integers(len(SAMPLE_TEXT)))
+            text = (SAMPLE_TEXT * 3)[start : start + line_chars]
+            draw.text((x, y), text, font=font, fill=(0, 0, 0))
+            boxes.append(draw.textbbox((x, y), text, font=font))
+
+    return np.array(page)[:, :, ::-1].copy(), np.array(boxes, dtype=np.float32)
+
+
+def recall(gt_boxes, quads, min_coverage=0.5):
+    """Ratio of the ground truth lines covered by the detected boxes."""
+    if len(quads) == 0:
+        return 0.0
+
+    quads = np.array(quads, dtype=np.float32)
+    pred = np.concatenate([quads.min(axis=1), quads.max(axis=1)], axis=1)
+
+    found = 0
+    for x1, y1, x2, y2 in gt_boxes:
+        iw = np.clip(np.minimum(x2, pred[:, 2]) - np.maximum(x1, pred[:, 0]), 0, None)
+        ih = np.clip(np.minimum(y2, pred[:, 3]) - np.maximum(y1, pred[:, 1]), 0, None)
+        if (iw * ih).max() >= min_coverage * (x2 - x1) * (y2 - y1):
+            found += 1
+
+    return found / len(gt_boxes)
+
+
+def benchmark(detector, img, gt_boxes, repeat):
+    detector(img)  # warm up
+
+    start = time.time()
+    for _ in range(repeat):
+        results, _ = detector(img)
+    elapsed = (time.time() - start) / repeat
+
+    return elapsed, recall(gt_boxes, results.points), len(results.points)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the tiled text detection with the resize mode."
+    )
+    parser.add_argument("--device", type=str, default="cuda")
+    parser.add_argument("--height", type=int, default=6614, help="A3 at 400 DPI")
+    parser.add_argument("--width", type=int, default=4677)
+    parser.add_argument("--font_size", type=int, default=24)
+    parser.add_argument("--line_chars", type=int, default=20)
+    parser.add_argument("--tile_size", type=int, default=1280)
+    parser.add_argument("--tile_overlap", type=int, default=160)
+    parser.add_argument("--tile_batch_size", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    img, gt_boxes = synthesize_page(
+        args.height, args.width, args.font_size, args.line_chars
+    )
+    print(f"page: {args.width}x{args.height}, {len(gt_boxes)} lines")
+
+    detector = TextDetector(device=args.device)
+    for tiling in [False, True]:
+        detector._cfg.data.tiling = tiling
+        detector._cfg.data.tile_size = args.tile_size
+        detector._cfg.data.tile_overlap = args.tile_overlap
+        detector._cfg.data.tile_batch_size = args.tile_batch_size
+
+        elapsed, line_recall, num_boxes = benchmark(
+            detector, img, gt_boxes, args.repeat
+        )
+        mode = "tiled" if tiling else "resize"
+        print(
+            f"{mode:>6}: {elapsed:.2f} sec/page ({1 / elapsed:.2f} pages/sec), "
+            f"recall {line_recall:.3f}, {num_boxes} boxes"
+        )
+
+
+if __name__ == "__main__":
+    main()
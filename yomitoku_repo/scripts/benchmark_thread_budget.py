@@ -0,0 +1,72 @@
+import argparse
+import time
+
+from yomitoku import DocumentAnalyzer
+from yomitoku.data.functions import load_image
+from yomitoku.utils.threads import ThreadBudget, available_cores
+
+
+def measure(func, imgs, repeat):
+    func(imgs[0])  # warm up
+
+    start = time.time()
+    for _ in range(repeat):
+        for img in imgs:
+            func(img)
+    return (time.time() - start) / (repeat * len(imgs))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the split of the CPU threads between the text detector and the layout analyzer."
+    )
+    parser.add_argument(
+        "inputs",
+        type=str,
+        nargs="*",
+        default=["tests/data/test.jpg", "tests/data/test.png"],
+    )
+    parser.add_argument("--num_threads", type=int, default=len(available_cores()))
+    parser.add_argument("--step", type=int, default=1)
+    parser.add_argument("--pin", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    imgs = []
+    for path in args.inputs:
+        imgs.extend(load_image(path))
+
+    analyzer = DocumentAnalyzer(device="cpu", visualize=False, thread_budget=None)
+    n = args.num_threads
+
+    def sequential(img):
+        analyzer.img = img
+        results_det, _ = analyzer.text_detector(img)
+        analyzer.layout(img)
+        analyzer.text_recognizer(img, results_det.points)
+
+    elapsed = measure(sequential, imgs, args.repeat)
+    print(f"{'sequential':>24}: {elapsed:.3f} sec/page")
+
+    analyzer.thread_budget = None
+    elapsed = measure(analyzer, imgs, args.repeat)
+    print(f"{'parallel, no budget':>24}: {elapsed:.3f} sec/page")
+
+    # onnxruntimeのセッションは作成時にスレッド数が決まるため、PyTorchでの推論のみを比較する
+    results = {}
+    for k in range(1, n, args.step):
+        split = {"text_detector": k, "layout_analyzer": n - k}
+        analyzer.thread_budget = ThreadBudget(split, num_threads=n, pin=args.pin)
+        results[k] = measure(analyzer, imgs, args.repeat)
+        print(f"{f'detector {k} / layout {n - k}':>24}: {results[k]:.3f} sec/page")
+
+    if results:
+        k = min(results, key=results.get)
+        print(
+            f"best: thread_budget={{'text_detector': {k}, 'layout_analyzer': {n - k}}}"
+            f", pin_threads={args.pin}"
+        )
+
+
+if __name__ == "__main__":
+    main()
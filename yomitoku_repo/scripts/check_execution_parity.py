@@ -0,0 +1,143 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from yomitoku import DocumentAnalyzer
+from yomitoku.data.functions import load_image
+
+MODULES = [
+    ("ocr", "text_detector"),
+    ("ocr", "text_recognizer"),
+    ("layout_analyzer", "layout_parser"),
+    ("layout_analyzer", "table_structure_recognizer"),
+]
+
+
+def build_configs(device, **kwargs):
+    configs = {}
+    for group, name in MODULES:
+        configs.setdefault(group, {})[name] = {"device": device, **kwargs}
+    return configs
+
+
+def to_box(points):
+    points = np.array(points)
+    return np.concatenate([points.min(axis=0), points.max(axis=0)])
+
+
+def iou(a, b):
+    iw = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    ih = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def agreement(reference, results, min_iou=0.5):
+    """
+    Ratio of the reference words found in the results with the same content.
+
+    Returns:
+        float: ratio of the words matched by the box
+        float: ratio of the words matched by the box and the content
+    """
+    if len(reference.words) == 0:
+        return 1.0, 1.0
+
+    boxes = [to_box(word.points) for word in results.words]
+
+    box_match, text_match = 0, 0
+    for word in reference.words:
+        box = to_box(word.points)
+        ious = [iou(box, b) for b in boxes]
+        if not ious or max(ious) < min_iou:
+            continue
+
+        box_match += 1
+        if results.words[int(np.argmax(ious))].content == word.content:
+            text_match += 1
+
+    return box_match / len(reference.words), text_match / len(reference.words)
+
+
+def run(analyzer, imgs, repeat):
+    analyzer(imgs[0])  # warm up
+
+    start = time.time()
+    for _ in range(repeat):
+        results = [analyzer(img)[0] for img in imgs]
+    elapsed = (time.time() - start) / (repeat * len(imgs))
+
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the results of an execution mode with fp32."
+    )
+    parser.add_argument(
+        "inputs",
+        type=str,
+        nargs="*",
+        default=["tests/data/test.jpg", "tests/data/test.png"],
+    )
+    parser.add_argument("--device", type=str, default="cuda")
+    parser.add_argument("--precision", type=str, default="bf16")
+    parser.add_argument("--channels_last", action="store_true")
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--min_agreement",
+        type=float,
+        default=0.95,
+        help="Minimum ratio of the words with the same box and content as fp32.",
+    )
+    args = parser.parse_args()
+
+    imgs = []
+    for path in args.inputs:
+        imgs.extend(load_image(path))
+
+    reference = DocumentAnalyzer(
+        configs=build_configs(args.device), device=args.device, visualize=False
+    )
+    expected, elapsed_ref = run(reference, imgs, args.repeat)
+    print(f"  fp32: {elapsed_ref:.3f} sec/page")
+
+    target = DocumentAnalyzer(
+        configs=build_configs(
+            args.device,
+            precision=args.precision,
+            channels_last=args.channels_last,
+            compile=args.compile,
+        ),
+        device=args.device,
+        visualize=False,
+    )
+    outputs, elapsed = run(target, imgs, args.repeat)
+    print(
+        f"target: {elapsed:.3f} sec/page ({elapsed_ref / elapsed:.2f}x), "
+        f"precision={args.precision}, channels_last={args.channels_last}, "
+        f"compile={args.compile}"
+    )
+
+    passed = True
+    for i, (e, o) in enumerate(zip(expected, outputs)):
+        box_ratio, text_ratio = agreement(e, o)
+        print(
+            f"page {i}: words {len(e.words)} -> {len(o.words)}, "
+            f"box {box_ratio:.3f}, text {text_ratio:.3f}, "
+            f"paragraphs {len(e.paragraphs)} -> {len(o.paragraphs)}, "
+            f"tables {len(e.tables)} -> {len(o.tables)}"
+        )
+        passed &= text_ratio >= args.min_agreement
+
+    if not passed:
+        print(f"Agreement with fp32 is below {args.min_agreement}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
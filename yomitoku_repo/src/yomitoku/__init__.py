@@ -1,12 +1,16 @@
+from importlib import import_module
 from importlib.metadata import version
 
-from .document_analyzer import DocumentAnalyzer
-from .layout_analyzer import LayoutAnalyzer
-from .layout_parser import LayoutParser
-from .ocr import OCR
-from .table_structure_recognizer import TableStructureRecognizer
-from .text_detector import TextDetector
-from .text_recognizer import TextRecognizer
+# モデルのクラスはtorchなどの重い依存を読み込むため、最初に参照されたときに読み込む
+_LAZY_IMPORTS = {
+    "OCR": ".ocr",
+    "LayoutParser": ".layout_parser",
+    "TableStructureRecognizer": ".table_structure_recognizer",
+    "TextDetector": ".text_detector",
+    "TextRecognizer": ".text_recognizer",
+    "LayoutAnalyzer": ".layout_analyzer",
+    "DocumentAnalyzer": ".document_analyzer",
+}
 
 __all__ = [
     "OCR",
@@ -18,3 +22,16 @@ __all__ = [
     "DocumentAnalyzer",
 ]
 __version__ = version(__package__)
+
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
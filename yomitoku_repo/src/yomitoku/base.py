@@ -1,8 +1,9 @@
+import os
 import time
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Union
 
-import torch
 from omegaconf import OmegaConf
 from pydantic import BaseModel, Extra
 
@@ -48,6 +49,63 @@ def observer(cls, func):
     return wrapper
 
 
+def load_pretrained(Net, cfg):
+    """
+    Load the pretrained model from the safetensors file of `cfg.hf_hub_repo`.
+
+    The model is built on the meta device, so the random initialization that
+    the weights overwrite anyway is skipped. The memory-mapped tensors of the
+    file are assigned to the model without copying, so the processes loading
+    the same model share the weights through the page cache. Tensors stored
+    in another dtype (e.g. fp16) are cast to the dtype of the model. Falls back to
+    `Net.from_pretrained` if the weights are not available as safetensors or
+    do not cover the whole model.
+    """
+    import torch
+    from huggingface_hub import hf_hub_download
+    from huggingface_hub.errors import EntryNotFoundError
+    from safetensors.torch import load_file
+
+    repo = cfg.hf_hub_repo
+    if os.path.isdir(repo):
+        model_file = os.path.join(repo, "model.safetensors")
+        if not os.path.exists(model_file):
+            return Net.from_pretrained(repo, cfg=cfg)
+    else:
+        try:
+            model_file = hf_hub_download(repo_id=repo, filename="model.safetensors")
+        except EntryNotFoundError:
+            return Net.from_pretrained(repo, cfg=cfg)
+
+    try:
+        with torch.device("meta"):
+            model = Net(cfg=cfg)
+    except NotImplementedError:
+        # 構築時に実際の値が必要なモデルは通常通り初期化してから置き換える
+        model = Net(cfg=cfg)
+
+    # assign=True ではファイル側の dtype がそのまま使われるため、fp16 などで
+    # 保存された重みはモデルの dtype に揃えてから割り当てる
+    state_dict = load_file(model_file)
+    expected = model.state_dict()
+    for key, value in state_dict.items():
+        if key in expected and value.dtype != expected[key].dtype:
+            state_dict[key] = value.to(expected[key].dtype)
+
+    model.load_state_dict(state_dict, strict=False, assign=True)
+
+    # バッファなど重みファイルに含まれないテンソルは初期化から作り直す
+    tensors = list(model.parameters()) + list(model.buffers())
+    if any(t.is_meta for t in tensors):
+        logger.warning(
+            f"{Net.__name__} has tensors missing in {model_file}. "
+            "Build the model without memory mapping."
+        )
+        return Net.from_pretrained(repo, cfg=cfg)
+
+    return model.eval()
+
+
 class BaseSchema(BaseModel):
     class Config:
         extra = Extra.forbid
@@ -57,8 +115,61 @@ class BaseSchema(BaseModel):
         return export_json(self, out_path, **kwargs)
 
 
+def create_onnx_session(model, device, num_threads=None):
+    """
+    Create the onnxruntime session of the model.
+
+    Args:
+        model (onnx.ModelProto): ONNX model
+        device (str): device name of the module
+        num_threads (int, optional): number of intra-op threads. Defaults to
+            the onnxruntime default, which uses every core.
+    """
+    import onnxruntime
+    import torch
+
+    options = onnxruntime.SessionOptions()
+    if num_threads is not None:
+        options.intra_op_num_threads = num_threads
+
+    providers = None
+    if torch.cuda.is_available() and device == "cuda":
+        providers = ["CUDAExecutionProvider"]
+
+    return onnxruntime.InferenceSession(
+        model.SerializeToString(), sess_options=options, providers=providers
+    )
+
+
+def _bf16_supported(device):
+    import torch
+
+    if device.type == "cuda":
+        return torch.cuda.is_bf16_supported()
+
+    try:
+        return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def to_float(outputs):
+    """Convert the floating point tensors in the model outputs to fp32."""
+    import torch
+
+    if isinstance(outputs, dict):
+        return {k: to_float(v) for k, v in outputs.items()}
+    if isinstance(outputs, (list, tuple)):
+        return type(outputs)(to_float(v) for v in outputs)
+    if isinstance(outputs, torch.Tensor) and outputs.is_floating_point():
+        return outputs.float()
+    return outputs
+
+
 class BaseModule:
     model_catalog = None
+    precision = "fp32"
+    channels_last = False
 
     def __init__(self):
         if self.model_catalog is None:
@@ -81,10 +192,75 @@ class BaseModule:
         default_cfg, Net = self.model_catalog.get(name)
         self._cfg = load_config(default_cfg, path_cfg)
         if from_pretrained:
-            self.model = Net.from_pretrained(self._cfg.hf_hub_repo, cfg=self._cfg)
+            start = time.time()
+            self.model = load_pretrained(Net, self._cfg)
+            elapsed = time.time() - start
+            logger.info(f"{Net.__name__} load_model elapsed_time: {elapsed}")
         else:
             self.model = Net(cfg=self._cfg)
 
+    def setup_execution(
+        self, precision="fp32", channels_last=False, compile=False, example_input=None
+    ):
+        """
+        Set how the PyTorch model is executed. Call after the model is moved
+        to the device.
+
+        Args:
+            precision (str): "fp32", or "bf16" to run the model under bf16
+                autocast. Falls back to fp32 if the device does not support bf16.
+            channels_last (bool): use the channels_last memory format for the
+                convolutions
+            compile (bool): compile the model with torch.compile
+            example_input (torch.Tensor, optional): input of the fixed size used
+                to compile the model in advance
+        """
+        import torch
+
+        if precision not in ["fp32", "bf16"]:
+            raise ValueError(f"Invalid precision: {precision}")
+
+        if precision == "bf16" and not _bf16_supported(self.device):
+            logger.warning(f"bf16 is not supported on {self.device}. Use fp32 instead.")
+            precision = "fp32"
+
+        self.precision = precision
+        self.channels_last = channels_last
+
+        if self.model is None:
+            return
+
+        if channels_last:
+            self.model.to(memory_format=torch.channels_last)
+
+        if compile:
+            self.model = torch.compile(self.model)
+            if example_input is not None:
+                start = time.time()
+                with torch.inference_mode(), self.autocast():
+                    self.model(self.to_input(example_input))
+                elapsed = time.time() - start
+                logger.info(
+                    f"{self.__class__.__name__} compile elapsed_time: {elapsed}"
+                )
+
+    def autocast(self):
+        """Context of the autocast for the configured precision."""
+        import torch
+
+        if self.precision == "bf16":
+            return torch.autocast(device_type=self.device.type, dtype=torch.bfloat16)
+        return nullcontext()
+
+    def to_input(self, tensor):
+        """Move the input tensor to the device in the configured memory format."""
+        import torch
+
+        tensor = tensor.to(self.device)
+        if self.channels_last and tensor.dim() == 4:
+            tensor = tensor.contiguous(memory_format=torch.channels_last)
+        return tensor
+
     def save_config(self, path_cfg):
         OmegaConf.save(self._cfg, path_cfg)
 
@@ -105,6 +281,8 @@ class BaseModule:
 
     @device.setter
     def device(self, device):
+        import torch
+
         if "cuda" in device:
             if torch.cuda.is_available():
                 self._device = torch.device(device)
@@ -1,79 +1,52 @@
 import argparse
+import multiprocessing
 import os
 import re
 import time
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
 
-import torch
+import pypdfium2
+from PIL import Image
 
-from ..constants import SUPPORT_OUTPUT_FORMAT
-from ..data.functions import load_image, load_pdf
-from ..document_analyzer import DocumentAnalyzer
+from ..constants import (
+    STREAM_OUTPUT_FORMAT,
+    SUPPORT_INPUT_FORMAT,
+    SUPPORT_OUTPUT_FORMAT,
+)
+from ..data.functions import iter_pdf, load_image
 from ..utils.logger import set_logger
-from ..utils.searchable_pdf import create_searchable_pdf
 
-from ..export import save_csv, save_html, save_json, save_markdown
 from ..export import convert_json, convert_csv, convert_html, convert_markdown
+from ..export import convert_jsonl
+from ..export import get_figure_writer, open_stream_writer
+from ..export.figure_writer import FIGURE_FORMATS
 
+from ..triage import TriageCounter
 from ..utils.misc import save_image
 
 logger = set_logger(__name__, "INFO")
 
+_worker_analyzer = None
+_worker_error = None
 
-def merge_all_pages(results):
-    out = None
-    for result in results:
-        format = result["format"]
-        data = result["data"]
-
-        if format == "json":
-            if out is None:
-                out = [data]
-            else:
-                out.append(data)
-
-        elif format == "csv":
-            if out is None:
-                out = data
-            else:
-                out.extend(data)
-
-        elif format == "html":
-            if out is None:
-                out = data
-            else:
-                out += "\n" + data
-
-        elif format == "md":
-            if out is None:
-                out = data
-            else:
-                out += "\n" + data
-
-        elif format == "pdf":
-            if out is None:
-                out = [data]
-            else:
-                out.append(data)
-    return out
-
-
-def save_merged_file(out_path, args, out, imgs):
-    if args.format == "json":
-        save_json(out, out_path, args.encoding)
-    elif args.format == "csv":
-        save_csv(out, out_path, args.encoding)
-    elif args.format == "html":
-        save_html(out, out_path, args.encoding)
-    elif args.format == "md":
-        save_markdown(out, out_path, args.encoding)
-    elif args.format == "pdf":
-        create_searchable_pdf(
-            imgs,
-            out,
-            output_path=out_path,
-            font_path=args.font_path,
-        )
+
+def open_merged_writer(args, format, out_path, pdf_path=None):
+    from ..utils.searchable_pdf import SearchablePDFOverlayWriter, SearchablePDFWriter
+
+    if format == "pdf" and pdf_path is not None:
+        return SearchablePDFOverlayWriter(pdf_path, out_path, font_path=args.font_path)
+
+    if format == "pdf":
+        return SearchablePDFWriter(out_path, font_path=args.font_path)
+
+    return open_stream_writer(format, out_path, args.encoding)
+
+
+def is_merged(args, format):
+    """Whether the pages of an input file are written to a single output file."""
+    return args.combine or format in STREAM_OUTPUT_FORMAT
 
 
 def validate_encoding(encoding):
@@ -89,184 +62,536 @@ def validate_encoding(encoding):
 
 
 def process_single_file(args, analyzer, path, format):
-    if path.suffix[1:].lower() in ["pdf"]:
-        imgs = load_pdf(path, dpi=args.dpi)
+    dirname = _sanitize_path_component(path.parent.name)
+    filename = path.stem
+
+    ext = path.suffix[1:].lower()
+    if ext in ["pdf"]:
+        imgs = iter_pdf(path, dpi=args.dpi)
     else:
         imgs = load_image(path)
 
-    format_results = []
-    for page, img in enumerate(imgs):
-        result, ocr, layout = analyzer(img)
-        dirname = _sanitize_path_component(path.parent.name)
-        filename = path.stem
+    # JPEGの入力はPDF出力時に再エンコードせずそのまま埋め込む
+    source = path if ext in ["jpg", "jpeg"] else None
+
+    # PDFの入力は元のページにテキストレイヤーだけを重ねる
+    pdf_path = path if ext == "pdf" and args.pdf_overlay else None
 
-        # cv2.imwrite(
-        #    os.path.join(args.outdir, f"{dirname}_{filename}_p{page+1}.jpg"), img
-        # )
+    get_figure_writer().set_figure_format(args.figure_format)
 
-        if ocr is not None:
-            out_path = os.path.join(
-                args.outdir, f"{dirname}_{filename}_p{page + 1}_ocr.jpg"
+    merged_writer = nullcontext()
+    if is_merged(args, format):
+        out_path = os.path.join(args.outdir, f"{dirname}_{filename}.{format}")
+        merged_writer = open_merged_writer(args, format, out_path, pdf_path)
+
+    num_pages = 0
+    with merged_writer as writer:
+        for page, img in enumerate(imgs):
+            process_single_page(
+                args,
+                analyzer,
+                img,
+                page,
+                dirname,
+                filename,
+                format,
+                writer,
+                source,
+                pdf_path,
             )
+            num_pages += 1
 
-            save_image(ocr, out_path)
-            logger.info(f"Output file: {out_path}")
+        # まとめて出力する場合も図の画像を書き終えてからファイルを確定する
+        get_figure_writer().wait()
 
-        if layout is not None:
-            out_path = os.path.join(
-                args.outdir, f"{dirname}_{filename}_p{page + 1}_layout.jpg"
-            )
+    return num_pages
+
+
+def process_single_page(
+    args,
+    analyzer,
+    img,
+    page,
+    dirname,
+    filename,
+    format,
+    writer,
+    source=None,
+    pdf_path=None,
+):
+    result, ocr, layout = analyzer(img)
+
+    # cv2.imwrite(
+    #    os.path.join(args.outdir, f"{dirname}_{filename}_p{page+1}.jpg"), img
+    # )
 
-            save_image(layout, out_path)
-            logger.info(f"Output file: {out_path}")
+    if ocr is not None:
+        out_path = os.path.join(
+            args.outdir, f"{dirname}_{filename}_p{page + 1}_ocr.jpg"
+        )
 
+        save_image(ocr, out_path)
+        logger.info(f"Output file: {out_path}")
+
+    if layout is not None:
         out_path = os.path.join(
-            args.outdir, f"{dirname}_{filename}_p{page + 1}.{format}"
+            args.outdir, f"{dirname}_{filename}_p{page + 1}_layout.jpg"
+        )
+
+        save_image(layout, out_path)
+        logger.info(f"Output file: {out_path}")
+
+    out_path = os.path.join(args.outdir, f"{dirname}_{filename}_p{page + 1}.{format}")
+
+    if format == "json":
+        if writer is not None:
+            json = convert_json(
+                result,
+                out_path,
+                args.ignore_line_break,
+                img,
+                args.figure,
+                args.figure_dir,
+            )
+            writer.write(json.model_dump())
+        else:
+            result.to_json(
+                out_path,
+                ignore_line_break=args.ignore_line_break,
+                encoding=args.encoding,
+                img=img,
+                export_figure=args.figure,
+                figure_dir=args.figure_dir,
+            )
+
+    elif format == "jsonl":
+        line = convert_jsonl(
+            result,
+            out_path,
+            args.ignore_line_break,
+            img,
+            args.figure,
+            args.figure_dir,
         )
+        writer.write(line)
 
-        if format == "json":
-            if args.combine:
-                json = convert_json(
-                    result,
-                    out_path,
-                    args.ignore_line_break,
-                    img,
-                    args.figure,
-                    args.figure_dir,
-                )
-            else:
-                json = result.to_json(
-                    out_path,
-                    ignore_line_break=args.ignore_line_break,
-                    encoding=args.encoding,
-                    img=img,
-                    export_figure=args.figure,
-                    figure_dir=args.figure_dir,
-                )
-
-            format_results.append(
-                {
-                    "format": format,
-                    "data": json.model_dump(),
-                }
+    elif format == "parquet":
+        json = convert_json(
+            result,
+            out_path,
+            args.ignore_line_break,
+            img,
+            args.figure,
+            args.figure_dir,
+        )
+        writer.write(json)
+
+    elif format == "csv":
+        if writer is not None:
+            csv = convert_csv(
+                result,
+                out_path,
+                args.ignore_line_break,
+                img,
+                args.figure,
+                args.figure_letter,
+                args.figure_dir,
+            )
+            writer.write(csv)
+        else:
+            result.to_csv(
+                out_path,
+                ignore_line_break=args.ignore_line_break,
+                encoding=args.encoding,
+                img=img,
+                export_figure=args.figure,
+                export_figure_letter=args.figure_letter,
+                figure_dir=args.figure_dir,
             )
 
-        elif format == "csv":
-            if args.combine:
-                csv = convert_csv(
-                    result,
-                    out_path,
-                    args.ignore_line_break,
-                    img,
-                    args.figure,
-                    args.figure_letter,
-                    args.figure_dir,
-                )
-            else:
-                csv = result.to_csv(
-                    out_path,
-                    ignore_line_break=args.ignore_line_break,
-                    encoding=args.encoding,
-                    img=img,
-                    export_figure=args.figure,
-                    export_figure_letter=args.figure_letter,
-                    figure_dir=args.figure_dir,
-                )
-
-            format_results.append(
-                {
-                    "format": format,
-                    "data": csv,
-                }
+    elif format == "html":
+        if writer is not None:
+            html, _ = convert_html(
+                result,
+                out_path,
+                ignore_line_break=args.ignore_line_break,
+                img=img,
+                export_figure=args.figure,
+                export_figure_letter=args.figure_letter,
+                figure_width=args.figure_width,
+                figure_dir=args.figure_dir,
+            )
+            writer.write(html)
+        else:
+            result.to_html(
+                out_path,
+                ignore_line_break=args.ignore_line_break,
+                img=img,
+                export_figure=args.figure,
+                export_figure_letter=args.figure_letter,
+                figure_width=args.figure_width,
+                figure_dir=args.figure_dir,
+                encoding=args.encoding,
             )
 
-        elif format == "html":
-            if args.combine:
-                html, _ = convert_html(
-                    result,
-                    out_path,
-                    ignore_line_break=args.ignore_line_break,
-                    img=img,
-                    export_figure=args.figure,
-                    export_figure_letter=args.figure_letter,
-                    figure_width=args.figure_width,
-                    figure_dir=args.figure_dir,
-                )
-            else:
-                html = result.to_html(
-                    out_path,
-                    ignore_line_break=args.ignore_line_break,
-                    img=img,
-                    export_figure=args.figure,
-                    export_figure_letter=args.figure_letter,
-                    figure_width=args.figure_width,
-                    figure_dir=args.figure_dir,
-                    encoding=args.encoding,
-                )
-
-            format_results.append(
-                {
-                    "format": format,
-                    "data": html,
-                }
+    elif format == "md":
+        if writer is not None:
+            md, _ = convert_markdown(
+                result,
+                out_path,
+                ignore_line_break=args.ignore_line_break,
+                img=img,
+                export_figure=args.figure,
+                export_figure_letter=args.figure_letter,
+                figure_width=args.figure_width,
+                figure_dir=args.figure_dir,
+            )
+            writer.write(md)
+        else:
+            result.to_markdown(
+                out_path,
+                ignore_line_break=args.ignore_line_break,
+                img=img,
+                export_figure=args.figure,
+                export_figure_letter=args.figure_letter,
+                figure_width=args.figure_width,
+                figure_dir=args.figure_dir,
+                encoding=args.encoding,
             )
 
-        elif format == "md":
-            if args.combine:
-                md, _ = convert_markdown(
-                    result,
-                    out_path,
-                    ignore_line_break=args.ignore_line_break,
-                    img=img,
-                    export_figure=args.figure,
-                    export_figure_letter=args.figure_letter,
-                    figure_width=args.figure_width,
-                    figure_dir=args.figure_dir,
-                )
-            else:
-                md = result.to_markdown(
-                    out_path,
-                    ignore_line_break=args.ignore_line_break,
-                    img=img,
-                    export_figure=args.figure,
-                    export_figure_letter=args.figure_letter,
-                    figure_width=args.figure_width,
-                    figure_dir=args.figure_dir,
-                    encoding=args.encoding,
-                )
-
-            format_results.append(
-                {
-                    "format": format,
-                    "data": md,
-                }
+    elif format == "pdf":
+        from ..utils.searchable_pdf import (
+            create_searchable_pdf,
+            create_searchable_pdf_overlay,
+        )
+
+        if writer is not None:
+            writer.add_page(img, result, source=source)
+        elif pdf_path is not None:
+            create_searchable_pdf_overlay(
+                pdf_path,
+                [img],
+                [result],
+                output_path=out_path,
+                font_path=args.font_path,
+                pages=[page],
             )
-        elif format == "pdf":
-            if not args.combine:
-                create_searchable_pdf(
-                    [img],
-                    [result],
-                    output_path=out_path,
-                    font_path=args.font_path,
-                )
-
-            format_results.append(
-                {
-                    "format": format,
-                    "data": result,
-                }
+        else:
+            create_searchable_pdf(
+                [img],
+                [result],
+                output_path=out_path,
+                font_path=args.font_path,
+                sources=[source],
             )
 
-    out = merge_all_pages(format_results)
-    if args.combine:
+
+def count_pages(path):
+    """Return the number of pages of an input file without decoding them."""
+    if path.suffix[1:].lower() == "pdf":
+        doc = pypdfium2.PdfDocument(path)
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+
+    with Image.open(path) as img:
+        return getattr(img, "n_frames", 1)
+
+
+def is_processed(args, path, format):
+    """Check whether every output file of `path` already exists in the output directory."""
+    dirname = _sanitize_path_component(path.parent.name)
+    filename = path.stem
+
+    if is_merged(args, format):
         out_path = os.path.join(args.outdir, f"{dirname}_{filename}.{format}")
-        save_merged_file(
-            out_path,
-            args,
-            out,
-            imgs,
+        return os.path.exists(out_path)
+
+    try:
+        num_pages = count_pages(path)
+    except Exception:
+        return False
+
+    return all(
+        os.path.exists(
+            os.path.join(args.outdir, f"{dirname}_{filename}_p{page + 1}.{format}")
+        )
+        for page in range(num_pages)
+    )
+
+
+def collect_target_files(args, path, format):
+    """
+    Collect the input files under the directory, largest first so that long
+    documents do not end up as stragglers at the tail of the work queue.
+    """
+    all_files = [
+        f
+        for f in path.rglob("*")
+        if f.is_file() and f.suffix[1:].lower() in SUPPORT_INPUT_FORMAT
+    ]
+
+    if args.skip_existing:
+        targets = [f for f in all_files if not is_processed(args, f, format)]
+        skipped = len(all_files) - len(targets)
+        if skipped > 0:
+            logger.info(f"Skip {skipped} files whose outputs already exist")
+        all_files = targets
+
+    return sorted(all_files, key=lambda f: f.stat().st_size, reverse=True)
+
+
+def log_triage(triage, prefix="Triage"):
+    skipped = ["blank", "no_text", "layout_skipped", "layout_reused"]
+    if sum(triage[key] for key in skipped) == 0:
+        return
+
+    logger.info(
+        f"{prefix}: {triage['blank']}/{triage['pages']} blank pages, "
+        f"{triage['no_text']} pages without text, "
+        f"layout analysis skipped on {triage['layout_skipped']} pages "
+        f"and reused on {triage['layout_reused']} pages"
+    )
+
+
+def log_recognition_cache(cache, snapshot):
+    """Log the hit rate of the recognition cache on a file and save the cache."""
+    if cache is None:
+        return
+
+    stats = cache.stats()
+    hits = stats["hits"] - snapshot["hits"]
+    lookups = hits + stats["misses"] - snapshot["misses"]
+    if lookups > 0:
+        logger.info(
+            f"Recognition cache: {hits}/{lookups} words hit ({100 * hits / lookups:.1f}%)"
+        )
+
+    cache.save()
+
+
+def log_cascade(recognizer, snapshot):
+    """Log the ratio of the words recognized again by the cascade model on a file."""
+    if recognizer.cascade is None:
+        return
+
+    stats = recognizer.cascade_stats()
+    words = stats["words"] - snapshot["words"]
+    escalated = stats["escalated"] - snapshot["escalated"]
+    if words > 0:
+        logger.info(
+            f"Recognition cascade: {escalated}/{words} words escalated ({100 * escalated / words:.1f}%)"
+        )
+
+
+def log_decoding(recognizer, snapshot):
+    """Log the ratio of the words decoded again autoregressively on a file."""
+    stats = recognizer.decoding_stats()
+    words = stats["words"] - snapshot["words"]
+    fallback = stats["fallback"] - snapshot["fallback"]
+    if words > 0:
+        logger.info(
+            f"Hybrid decoding: {fallback}/{words} words decoded again autoregressively ({100 * fallback / words:.1f}%)"
+        )
+
+
+def run_single_file(args, analyzer, path, format):
+    start = time.time()
+    logger.info(f"Processing file: {path}")
+    snapshot = analyzer.triage.snapshot()
+    cascade_snapshot = analyzer.text_recognizer.cascade_stats()
+    decoding_snapshot = analyzer.text_recognizer.decoding_stats()
+    cache_snapshot = None
+    if analyzer.text_recognizer.cache is not None:
+        cache_snapshot = analyzer.text_recognizer.cache.stats()
+    try:
+        num_pages = process_single_file(args, analyzer, path, format)
+    except Exception as e:
+        logger.error(f"Failed to process file: {path}: {e}")
+        return {"path": str(path), "pages": 0, "error": f"{type(e).__name__}: {e}"}
+
+    end = time.time()
+    triage = analyzer.triage.since(snapshot)
+    log_triage(triage)
+    log_recognition_cache(analyzer.text_recognizer.cache, cache_snapshot)
+    log_cascade(analyzer.text_recognizer, cascade_snapshot)
+    log_decoding(analyzer.text_recognizer, decoding_snapshot)
+    logger.info(f"Total Processing time: {end - start:.2f} sec")
+    return {"path": str(path), "pages": num_pages, "error": None, "triage": triage}
+
+
+def _init_worker(configs, args, num_threads):
+    global _worker_analyzer, _worker_error
+
+    if num_threads is not None:
+        import torch
+
+        torch.set_num_threads(num_threads)
+
+    # 初期化に失敗したworkerをPoolが再起動し続けないよう、例外は保持して各ファイルの失敗として報告する
+    try:
+        _worker_analyzer = build_analyzer(configs, args)
+    except Exception as e:
+        logger.error(f"Failed to initialize worker: {e}")
+        _worker_error = f"{type(e).__name__}: {e}"
+
+
+def _run_worker_file(args, format, path):
+    if _worker_error is not None:
+        return {"path": str(path), "pages": 0, "error": _worker_error}
+
+    return run_single_file(args, _worker_analyzer, path, format)
+
+
+def process_directory(args, configs, path, format, analyzer=None):
+    """
+    Process all files under the directory.
+
+    With `args.jobs > 1`, the files are distributed to worker processes through
+    a shared queue, and each worker loads the models once at startup.
+    """
+    files = collect_target_files(args, path, format)
+    logger.info(f"Target files: {len(files)}")
+
+    start = time.time()
+    reports = []
+    if args.jobs > 1:
+        import torch
+
+        num_threads = None
+        if args.device == "cpu" or not torch.cuda.is_available():
+            num_threads = max(1, (os.cpu_count() or 1) // args.jobs)
+
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(
+            processes=args.jobs,
+            initializer=_init_worker,
+            initargs=(configs, args, num_threads),
+        ) as pool:
+            worker = partial(_run_worker_file, args, format)
+            for report in pool.imap_unordered(worker, files, chunksize=1):
+                reports.append(report)
+    else:
+        if analyzer is None:
+            analyzer = build_analyzer(configs, args)
+
+        for f in files:
+            reports.append(run_single_file(args, analyzer, f, format))
+
+    elapsed = time.time() - start
+    report_summary(reports, elapsed)
+    return reports
+
+
+def report_summary(reports, elapsed):
+    failures = [report for report in reports if report["error"] is not None]
+    num_pages = sum(report["pages"] for report in reports)
+    pages_per_sec = num_pages / elapsed if elapsed > 0 else 0.0
+
+    logger.info(
+        f"Processed {len(reports) - len(failures)}/{len(reports)} files, "
+        f"{num_pages} pages in {elapsed:.2f} sec ({pages_per_sec:.2f} pages/sec)"
+    )
+
+    triage = TriageCounter()
+    for report in reports:
+        triage.update(report.get("triage", {}))
+    log_triage(triage.snapshot(), prefix="Triage total")
+
+    if len(failures) > 0:
+        logger.error(f"Failed to process {len(failures)} files:")
+        for report in failures:
+            logger.error(f"  {report['path']}: {report['error']}")
+
+
+def build_configs(args):
+    configs = {
+        "ocr": {
+            "text_detector": {
+                "path_cfg": args.td_cfg,
+            },
+            "text_recognizer": {
+                "path_cfg": args.tr_cfg,
+            },
+        },
+        "layout_analyzer": {
+            "layout_parser": {
+                "path_cfg": args.lp_cfg,
+            },
+            "table_structure_recognizer": {
+                "path_cfg": args.tsr_cfg,
+            },
+        },
+    }
+
+    if args.cascade:
+        configs["ocr"]["text_recognizer"]["model_name"] = "parseq-small"
+        configs["ocr"]["text_recognizer"]["cascade_model"] = "parseqv2"
+        configs["ocr"]["text_recognizer"]["cascade_threshold"] = args.cascade_threshold
+
+    if args.decode_mode is not None:
+        configs["ocr"]["text_recognizer"]["decode_mode"] = args.decode_mode
+        configs["ocr"]["text_recognizer"]["ar_fallback_threshold"] = (
+            args.ar_fallback_threshold
+        )
+
+    if args.rec_cache_size > 0:
+        configs["ocr"]["text_recognizer"]["cache_size"] = args.rec_cache_size
+        configs["ocr"]["text_recognizer"]["cache_path"] = args.rec_cache_path
+
+    if args.lite:
+        import torch
+
+        configs["ocr"]["text_recognizer"]["model_name"] = "parseq-small"
+
+        if args.device == "cpu" or not torch.cuda.is_available():
+            configs["ocr"]["text_detector"]["infer_onnx"] = True
+
+        # Note: Text Detector以外はONNX推論よりもPyTorch推論の方が速いため、ONNX推論は行わない
+        # configs["ocr"]["text_recognizer"]["infer_onnx"] = True
+        # configs["layout_analyzer"]["table_structure_recognizer"]["infer_onnx"] = True
+        # configs["layout_analyzer"]["layout_parser"]["infer_onnx"] = True
+
+    return configs
+
+
+def parse_thread_budget(value):
+    """
+    Parse --thread_budget: "auto", "none", or the threads of the text
+    detector and the layout analyzer separated by a comma, e.g. "6,2".
+    """
+    if value in ["auto", "none"]:
+        return None if value == "none" else value
+
+    try:
+        detector, layout = (int(x) for x in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Invalid thread budget: {value}. Give 'auto', 'none' or two numbers, e.g. '6,2'"
         )
 
+    return {"text_detector": detector, "layout_analyzer": layout}
+
+
+def build_analyzer(configs, args):
+    from ..document_analyzer import DocumentAnalyzer
+
+    return DocumentAnalyzer(
+        configs=configs,
+        visualize=args.vis,
+        device=args.device,
+        ignore_meta=args.ignore_meta,
+        reading_order=args.reading_order,
+        skip_ruby=args.skip_ruby,
+        skip_blank=args.skip_blank,
+        layout_policy=args.layout_policy,
+        reuse_layout=args.reuse_layout,
+        reuse_threshold=args.reuse_threshold,
+        thread_budget=args.thread_budget,
+        pin_threads=args.pin_threads,
+    )
+
 
 def main():
     parser = argparse.ArgumentParser()
@@ -280,7 +605,7 @@ def main():
         "--format",
         type=str,
         default="json",
-        help="output format type (json or csv or html or md)",
+        help="output format type (json or jsonl or parquet or csv or html or md or pdf). jsonl and parquet always merge the pages of each file",
     )
     parser.add_argument(
         "-v",
@@ -359,6 +684,13 @@ def main():
         default="figures",
         help="directory to save figure images",
     )
+    parser.add_argument(
+        "--figure_format",
+        type=str,
+        default="png",
+        choices=FIGURE_FORMATS,
+        help="image format of the figures. 'png' is lossless, and 'jpg' is smaller and faster to encode but lossy for line art",
+    )
     parser.add_argument(
         "--encoding",
         type=str,
@@ -375,6 +707,70 @@ def main():
         action="store_true",
         help="if set, ignore meta information(header, footer) in the output",
     )
+    parser.add_argument(
+        "--skip_ruby",
+        action="store_true",
+        help="if set, ruby(furigana) boxes are detected from their geometry and excluded before the text recognition",
+    )
+    parser.add_argument(
+        "--cascade",
+        action="store_true",
+        help="if set, every word is recognized by the small model first, and only the words scored below --cascade_threshold are recognized again by the full model",
+    )
+    parser.add_argument(
+        "--cascade_threshold",
+        type=float,
+        default=0.9,
+        help="score below which a word is recognized again by the full model, used with --cascade",
+    )
+    parser.add_argument(
+        "--decode_mode",
+        type=str,
+        default=None,
+        choices=["ar", "nar", "hybrid"],
+        help="decoding of the text recognizer. 'ar' decodes one character at a time, 'nar' decodes all the characters at once, and 'hybrid' decodes with 'nar' and decodes again with 'ar' only the words with a character probability below --ar_fallback_threshold",
+    )
+    parser.add_argument(
+        "--ar_fallback_threshold",
+        type=float,
+        default=0.9,
+        help="character probability below which a word is decoded again with 'ar', used with --decode_mode hybrid",
+    )
+    parser.add_argument(
+        "--rec_cache_size",
+        type=int,
+        default=0,
+        help="if positive, the results of up to this number of word images are cached, and the same word images on other pages skip the text recognition",
+    )
+    parser.add_argument(
+        "--rec_cache_path",
+        type=str,
+        default=None,
+        help="JSON file to load and save the recognition cache, used with --rec_cache_size",
+    )
+    parser.add_argument(
+        "--skip_blank",
+        action="store_true",
+        help="if set, pages with almost no ink are output as empty pages without running the models",
+    )
+    parser.add_argument(
+        "--layout_policy",
+        default="always",
+        type=str,
+        choices=["always", "auto"],
+        help="'auto' skips the layout analysis on pages without table rules. The words are output as paragraphs and figures are not detected on those pages",
+    )
+    parser.add_argument(
+        "--reuse_layout",
+        action="store_true",
+        help="if set, the layout analysis results of a recent page of the same size and a similar look are reused, and only the text detection and recognition run on the page",
+    )
+    parser.add_argument(
+        "--reuse_threshold",
+        type=float,
+        default=0.9,
+        help="minimum similarity (-1 to 1) of the downsampled pages to reuse the layout analysis results, used with --reuse_layout",
+    )
     parser.add_argument(
         "--reading_order",
         default="auto",
@@ -393,6 +789,36 @@ def main():
         default=200,
         help="DPI for loading PDF files (default: 200)",
     )
+    parser.add_argument(
+        "--pdf_overlay",
+        "--pdf-overlay",
+        action="store_true",
+        help="if set, PDF input is output as the original pages with the text layer overlaid, instead of re-rendered page images",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes for directory input. Each worker loads the models once",
+    )
+    parser.add_argument(
+        "--thread_budget",
+        type=parse_thread_budget,
+        default="auto",
+        help="split of the CPU threads between the text detector and the layout analyzer, which run at the same time. 'auto' splits the threads evenly, 'none' lets both use every thread, and '6,2' gives 6 threads to the text detector and 2 to the layout analyzer",
+    )
+    parser.add_argument(
+        "--pin_threads",
+        action="store_true",
+        help="if set, each of the text detector and the layout analyzer is pinned to its own cores (Linux only)",
+    )
+    parser.add_argument(
+        "--skip_existing",
+        "--skip-existing",
+        action="store_true",
+        help="if set, skip files whose outputs already exist in the output directory",
+    )
     args = parser.parse_args()
 
     path = Path(args.arg1)
@@ -414,63 +840,22 @@ def main():
 
     validate_encoding(args.encoding)
 
+    if args.jobs < 1:
+        raise ValueError(f"Invalid number of jobs: {args.jobs}")
+
     if format == "markdown":
         format = "md"
 
-    configs = {
-        "ocr": {
-            "text_detector": {
-                "path_cfg": args.td_cfg,
-            },
-            "text_recognizer": {
-                "path_cfg": args.tr_cfg,
-            },
-        },
-        "layout_analyzer": {
-            "layout_parser": {
-                "path_cfg": args.lp_cfg,
-            },
-            "table_structure_recognizer": {
-                "path_cfg": args.tsr_cfg,
-            },
-        },
-    }
-
-    if args.lite:
-        configs["ocr"]["text_recognizer"]["model_name"] = "parseq-small"
-
-        if args.device == "cpu" or not torch.cuda.is_available():
-            configs["ocr"]["text_detector"]["infer_onnx"] = True
-
-        # Note: Text Detector以外はONNX推論よりもPyTorch推論の方が速いため、ONNX推論は行わない
-        # configs["ocr"]["text_recognizer"]["infer_onnx"] = True
-        # configs["layout_analyzer"]["table_structure_recognizer"]["infer_onnx"] = True
-        # configs["layout_analyzer"]["layout_parser"]["infer_onnx"] = True
-
-    analyzer = DocumentAnalyzer(
-        configs=configs,
-        visualize=args.vis,
-        device=args.device,
-        ignore_meta=args.ignore_meta,
-        reading_order=args.reading_order,
-    )
+    configs = build_configs(args)
 
     os.makedirs(args.outdir, exist_ok=True)
     logger.info(f"Output directory: {args.outdir}")
 
     if path.is_dir():
-        all_files = [f for f in path.rglob("*") if f.is_file()]
-        for f in all_files:
-            try:
-                start = time.time()
-                file_path = Path(f)
-                logger.info(f"Processing file: {file_path}")
-                process_single_file(args, analyzer, file_path, format)
-                end = time.time()
-                logger.info(f"Total Processing time: {end - start:.2f} sec")
-            except Exception:
-                continue
+        process_directory(args, configs, path, format)
     else:
+        analyzer = build_analyzer(configs, args)
+
         start = time.time()
         logger.info(f"Processing file: {path}")
         process_single_file(args, analyzer, path, format)
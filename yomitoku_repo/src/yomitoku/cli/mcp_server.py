@@ -1,13 +1,16 @@
+import asyncio
 import csv
+import hashlib
 import io
 import json
 import os
 from argparse import ArgumentParser
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from mcp.server.fastmcp import Context, FastMCP
 
-from yomitoku import DocumentAnalyzer
 from yomitoku.data.functions import load_image, load_pdf
 from yomitoku.export import (
     convert_csv,
@@ -22,24 +25,150 @@ except KeyError:
     raise ValueError("Environment variable 'RESOURCE_DIR' is not set.")
 
 
-analyzer = None
+class ServerBusyError(RuntimeError):
+    pass
 
 
-async def load_analyzer(ctx: Context) -> DocumentAnalyzer:
+class AnalyzerPool:
     """
-    Load the DocumentAnalyzer instance if not already loaded.
+    Pool of DocumentAnalyzer instances shared by the MCP requests.
 
-    Args:
-        ctx (Context): The context in which the analyzer is being loaded.
-
-    Returns:
-        DocumentAnalyzer: The loaded document analyzer instance.
+    The pages are analyzed in worker threads, so the event loop keeps serving
+    other requests (including `file://list`) while a large file is processed.
+    Each analyzer is used by one request at a time, and at most `max_queue`
+    requests wait for a free analyzer. Further requests are rejected.
     """
-    global analyzer
-    if analyzer is None:
-        await ctx.info("Load document analyzer")
-        analyzer = DocumentAnalyzer(visualize=False, device="cuda")
-    return analyzer
+
+    def __init__(self, num_workers=1, max_queue=8, device="cuda"):
+        self.num_workers = num_workers
+        self.max_queue = max_queue
+        self.device = device
+
+        self.executor = ThreadPoolExecutor(max_workers=num_workers)
+        self.analyzers = []
+        self.idle = None
+        self.num_loading = 0
+        self.num_waiting = 0
+
+    def _load_analyzer(self):
+        from yomitoku import DocumentAnalyzer
+
+        return DocumentAnalyzer(visualize=False, device=self.device)
+
+    async def acquire(self, ctx: Context):
+        if self.idle is None:
+            self.idle = asyncio.Queue()
+
+        num_slots = len(self.analyzers) + self.num_loading
+        if self.idle.empty() and num_slots < self.num_workers:
+            # 先に枠を確保してからモデルを読み込む
+            self.num_loading += 1
+            await ctx.info("Load document analyzer")
+            try:
+                analyzer = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self._load_analyzer
+                )
+            except BaseException:
+                # 待っているリクエストを起こし、空いた枠で読み込みを再試行させる
+                self.idle.put_nowait(None)
+                raise
+            finally:
+                self.num_loading -= 1
+
+            self.analyzers.append(analyzer)
+            return analyzer
+
+        if self.idle.empty() and self.num_waiting >= self.max_queue:
+            raise ServerBusyError(
+                f"Too many pending requests ({self.num_waiting}). Retry later."
+            )
+
+        self.num_waiting += 1
+        try:
+            analyzer = await self.idle.get()
+        finally:
+            self.num_waiting -= 1
+
+        if analyzer is None:
+            return await self.acquire(ctx)
+
+        return analyzer
+
+    def release(self, analyzer):
+        self.idle.put_nowait(analyzer)
+
+    async def analyze(self, ctx: Context, imgs):
+        """
+        Analyze the pages one by one with an analyzer of the pool.
+
+        If the request is cancelled, the remaining pages are not processed.
+        The analyzer is returned to the pool once the page being processed
+        finishes.
+        """
+        analyzer = await self.acquire(ctx)
+        loop = asyncio.get_running_loop()
+
+        results = []
+        future = None
+        try:
+            for page, img in enumerate(imgs):
+                future = loop.run_in_executor(self.executor, analyzer, img)
+                result, _, _ = await asyncio.shield(future)
+                results.append(result)
+
+                await ctx.info(f"Processed page {page + 1}/{len(imgs)}")
+                await ctx.report_progress(page + 1, len(imgs))
+        finally:
+            if future is not None and not future.done():
+                future.add_done_callback(lambda _: self.release(analyzer))
+            else:
+                self.release(analyzer)
+
+        return results
+
+
+class ResultCache:
+    """LRU cache of the converted results keyed by file hash and output format."""
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+
+    def get(self, key):
+        if key not in self.cache:
+            return None
+
+        self.cache.move_to_end(key)
+        return self.cache[key]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+
+def file_hash(file_path):
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def load_pages(file_path):
+    if Path(file_path).suffix[1:].lower() in ["pdf"]:
+        return load_pdf(file_path)
+    return load_image(file_path)
+
+
+SUPPORT_FORMATS = ["json", "markdown", "html", "csv"]
+
+pool = AnalyzerPool()
+result_cache = ResultCache()
 
 
 mcp = FastMCP("yomitoku")
@@ -63,23 +192,31 @@ async def process_ocr(ctx: Context, filename: str, output_format: str) -> str:
     Returns:
         str: The OCR results converted to the specified format.
     """
-    analyzer = await load_analyzer(ctx)
+    if output_format not in SUPPORT_FORMATS:
+        raise ValueError(
+            f"Unsupported output format: {output_format}."
+            " Supported formats are json, markdown, html or csv."
+        )
+
+    file_path = os.path.join(RESOURCE_DIR, filename)
+
+    key = (await asyncio.to_thread(file_hash, file_path), output_format)
+    output = result_cache.get(key)
+    if output is not None:
+        await ctx.info("Return cached result")
+        return output
+
+    imgs = await asyncio.to_thread(load_pages, file_path)
 
     await ctx.info("Start ocr processing")
+    results = await pool.analyze(ctx, imgs)
 
-    file_path = os.path.join(RESOURCE_DIR, filename)
-    if Path(file_path).suffix[1:].lower() in ["pdf"]:
-        imgs = load_pdf(file_path)
-    else:
-        imgs = load_image(file_path)
+    output = await asyncio.to_thread(convert_results, imgs, results, output_format)
+    result_cache.put(key, output)
+    return output
 
-    results = []
-    for page, img in enumerate(imgs):
-        analyzer.img = img
-        result, _, _ = await analyzer.run(img)
-        results.append(result)
-        await ctx.report_progress(page + 1, len(imgs))
 
+def convert_results(imgs, results, output_format):
     if output_format == "json":
         return json.dumps(
             [
@@ -142,11 +279,6 @@ async def process_ocr(ctx: Context, filename: str, output_format: str) -> str:
                     writer.writerow([element["element"]])
                 writer.writerow([""])
         return output.getvalue()
-    else:
-        raise ValueError(
-            f"Unsupported output format: {output_format}."
-            " Supported formats are json, markdown, html or csv."
-        )
 
 
 @mcp.resource("file://list")
@@ -188,7 +320,41 @@ def main():
         default=None,
         help="Mount path for the MCP server (only used with SSE transport).",
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=1,
+        help="Number of document analyzers processing requests concurrently.",
+    )
+    parser.add_argument(
+        "--max_queue",
+        type=int,
+        default=8,
+        help="Maximum number of requests waiting for a free analyzer.",
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=int,
+        default=32,
+        help="Number of OCR results cached by file hash and output format. 0 disables the cache.",
+    )
+    parser.add_argument(
+        "--device",
+        "-d",
+        type=str,
+        default="cuda",
+        help="Device for running the models.",
+    )
     args = parser.parse_args()
+
+    global pool, result_cache
+    pool = AnalyzerPool(
+        num_workers=args.num_workers,
+        max_queue=args.max_queue,
+        device=args.device,
+    )
+    result_cache = ResultCache(max_size=args.cache_size)
+
     run_mcp_server(transport=args.transport, mount_path=args.mount_path)
 
 
@@ -0,0 +1,353 @@
+import json
+import threading
+import time
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+import torch
+
+from ..data.dataset import ParseqDataset
+from ..data.functions import validate_image
+from ..document_analyzer import DocumentAnalyzer, _split_text_across_cells
+from ..export import convert_json
+from ..ocr import ocr_aggregate
+from ..ruby import prune_ruby
+from ..schemas import (
+    DocumentAnalyzerSchema,
+    OCRSchema,
+    TextDetectorSchema,
+    TextRecognizerSchema,
+)
+from ..utils.batching import MicroBatcher
+from ..utils.logger import set_logger
+
+logger = set_logger(__name__, "INFO")
+
+
+class BatchingAnalyzer:
+    """
+    DocumentAnalyzer that merges the text detection and recognition of
+    concurrent requests into shared model batches.
+
+    Every request runs its own layout analysis, while the detection inputs of
+    the same size and the word images of all requests are queued and
+    processed together, waiting at most `max_wait` seconds for other requests.
+    """
+
+    def __init__(self, analyzer, det_batch_size=4, rec_batch_size=None, max_wait=0.01):
+        self.analyzer = analyzer
+        self.detector = analyzer.text_detector
+        self.recognizer = analyzer.text_recognizer
+
+        if rec_batch_size is None:
+            rec_batch_size = self.recognizer._cfg.data.batch_size
+
+        self.rec_batch_size = rec_batch_size
+        self.det_batcher = MicroBatcher(
+            self._detect_batch,
+            max_batch_size=det_batch_size,
+            max_wait=max_wait,
+            name="text_detector",
+        )
+        self.rec_batcher = MicroBatcher(
+            self._recognize_batch,
+            max_batch_size=rec_batch_size,
+            max_wait=max_wait,
+            size_fn=len,
+            name="text_recognizer",
+        )
+
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=1000)
+        self.num_requests = 0
+        self.num_active = 0
+
+    def _detect_batch(self, tensors):
+        # 入力サイズが同じ画像だけをまとめて推論する
+        groups = {}
+        for i, tensor in enumerate(tensors):
+            groups.setdefault(tuple(tensor.shape[2:]), []).append(i)
+
+        outputs = [None] * len(tensors)
+        for indices in groups.values():
+            batch = torch.cat([tensors[i] for i in indices], 0)
+            binary = self.detector.infer(batch)["binary"]
+            for j, i in enumerate(indices):
+                outputs[i] = binary[j : j + 1]
+
+        return outputs
+
+    def _recognize_batch(self, items):
+        sizes = [len(item) for item in items]
+        data = torch.cat(items, 0)
+
+        probs = []
+        for i in range(0, len(data), self.rec_batch_size):
+            probs.append(self.recognizer.infer(data[i : i + self.rec_batch_size]))
+        probs = torch.cat(probs, 0)
+
+        return list(torch.split(probs, sizes, 0))
+
+    def _detect_tiled(self, img):
+        # タイルはすべて同じ大きさなので、他のリクエストのタイルとまとめて推論できる
+        h, w = img.shape[:2]
+        binary = torch.zeros((1, 1, h, w), dtype=torch.float32)
+        positions = self.detector.tile_positions((h, w))
+        batch_size = self.detector._cfg.data.tile_batch_size
+
+        for i in range(0, len(positions), batch_size):
+            batch = positions[i : i + batch_size]
+            futures = [
+                self.det_batcher.submit(self.detector.preprocess_tile(img, p))
+                for p in batch
+            ]
+            for future, position in zip(futures, batch):
+                pred = future.result(timeout=self.det_batcher.timeout)
+                self.detector.stitch_tile(binary, pred, position)
+
+        return binary
+
+    def detect(self, img):
+        h, w = img.shape[:2]
+        if self.detector._cfg.data.tiling:
+            binary = self._detect_tiled(img)
+        else:
+            tensor = self.detector.preprocess(img)
+            binary = self.det_batcher(tensor)
+        quads, scores = self.detector.postprocess({"binary": binary}, (h, w))
+        return TextDetectorSchema(points=quads, scores=scores)
+
+    def recognize(self, img, points):
+        dataset = ParseqDataset(self.recognizer._cfg, img, points)
+
+        contents, scores, directions = [], [], []
+        if len(dataset) > 0:
+            data = dataset.collate(0, len(dataset))
+            p = self.rec_batcher(data)
+            contents, scores, directions = self.recognizer.postprocess(p, points)
+
+        return TextRecognizerSchema(
+            contents=contents,
+            scores=scores,
+            points=points,
+            directions=directions,
+        )
+
+    def __call__(self, img, layout_executor):
+        with self.lock:
+            self.num_requests += 1
+            self.num_active += 1
+
+        start = time.monotonic()
+        try:
+            return self.analyze(img, layout_executor)
+        finally:
+            with self.lock:
+                self.num_active -= 1
+                self.latencies.append(time.monotonic() - start)
+
+    def analyze(self, img, layout_executor):
+        layout_future = layout_executor.submit(self.analyzer.layout, img)
+        results_det = self.detect(img)
+        results_layout, _ = layout_future.result()
+
+        if self.analyzer.split_text_across_cells:
+            results_det = _split_text_across_cells(results_det, results_layout)
+
+        if self.analyzer.skip_ruby:
+            results_det = prune_ruby(results_det)
+
+        results_rec = self.recognize(img, results_det.points)
+
+        results_ocr = OCRSchema(words=ocr_aggregate(results_det, results_rec))
+        outputs = self.analyzer.aggregate(results_ocr, results_layout)
+        return DocumentAnalyzerSchema(**outputs)
+
+    def metrics(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            num_requests = self.num_requests
+            num_active = self.num_active
+
+        def percentile(q):
+            if not latencies:
+                return 0.0
+            return 1000 * latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+        return {
+            "requests": num_requests,
+            "active_requests": num_active,
+            "latency_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": 1000 * latencies[-1] if latencies else 0.0,
+            },
+            "text_detector": self.det_batcher.metrics(),
+            "text_recognizer": self.rec_batcher.metrics(),
+        }
+
+
+def decode_image(data):
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Invalid image data.")
+
+    validate_image(img)
+    return img
+
+
+def make_handler(analyzer, layout_executor):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif path == "/metrics":
+                self._send_json(200, analyzer.metrics())
+            else:
+                self._send_json(404, {"error": f"Not found: {path}"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/analyze":
+                self._send_json(404, {"error": f"Not found: {url.path}"})
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                img = decode_image(self.rfile.read(length))
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+
+            query = parse_qs(url.query)
+            ignore_line_break = query.get("ignore_line_break", ["false"])[0] == "true"
+
+            try:
+                result = analyzer(img, layout_executor)
+                result = convert_json(
+                    result,
+                    out_path=None,
+                    ignore_line_break=ignore_line_break,
+                    img=img,
+                    export_figure=False,
+                    figure_dir=None,
+                )
+            except Exception as e:
+                logger.error(f"Failed to analyze the image: {e}")
+                self._send_json(500, {"error": str(e)})
+                return
+
+            self._send_json(200, result.model_dump())
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+def run_server(
+    host="127.0.0.1",
+    port=8080,
+    device="cuda",
+    max_wait=0.01,
+    det_batch_size=4,
+    rec_batch_size=None,
+    num_threads=8,
+):
+    """
+    Run the HTTP inference server.
+
+    Endpoints:
+        POST /analyze: analyze the encoded page image in the request body
+        GET /health: health check
+        GET /metrics: queue depth, batch sizes and latency
+    """
+
+    analyzer = BatchingAnalyzer(
+        DocumentAnalyzer(visualize=False, device=device),
+        det_batch_size=det_batch_size,
+        rec_batch_size=rec_batch_size,
+        max_wait=max_wait,
+    )
+
+    with ThreadPoolExecutor(max_workers=num_threads) as layout_executor:
+        server = ThreadingHTTPServer(
+            (host, port), make_handler(analyzer, layout_executor)
+        )
+        logger.info(f"Serving on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def main():
+    parser = ArgumentParser(description="Run the local HTTP inference server.")
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Host to bind. Only localhost is bound by default.",
+    )
+    parser.add_argument(
+        "--port",
+        "-p",
+        type=int,
+        default=8080,
+        help="Port to listen on.",
+    )
+    parser.add_argument(
+        "--device",
+        "-d",
+        type=str,
+        default="cuda",
+        help="Device for running the models.",
+    )
+    parser.add_argument(
+        "--max_wait",
+        type=float,
+        default=10,
+        help="Maximum time in milliseconds a request waits for other requests to fill a batch.",
+    )
+    parser.add_argument(
+        "--det_batch_size",
+        type=int,
+        default=4,
+        help="Maximum number of pages in a batch of the text detector.",
+    )
+    parser.add_argument(
+        "--rec_batch_size",
+        type=int,
+        default=None,
+        help="Maximum number of words in a batch of the text recognizer. Defaults to the batch size of the config.",
+    )
+    args = parser.parse_args()
+
+    run_server(
+        host=args.host,
+        port=args.port,
+        device=args.device,
+        max_wait=args.max_wait / 1000,
+        det_batch_size=args.det_batch_size,
+        rec_batch_size=args.rec_batch_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
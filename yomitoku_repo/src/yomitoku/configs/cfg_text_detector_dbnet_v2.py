@@ -22,6 +22,13 @@ class Decoder:
 class Data:
     shortest_size: int = 1280
     limit_size: int = 1600
+    adaptive_resolution: bool = False
+    target_char_size: int = 20
+    min_shortest_size: int = 640
+    tiling: bool = False
+    tile_size: int = 1280
+    tile_overlap: int = 160
+    tile_batch_size: int = 4
 
 
 @dataclass
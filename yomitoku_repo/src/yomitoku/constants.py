@@ -1,7 +1,18 @@
 import os
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
-SUPPORT_OUTPUT_FORMAT = ["json", "csv", "html", "markdown", "md", "pdf"]
+SUPPORT_OUTPUT_FORMAT = [
+    "json",
+    "jsonl",
+    "parquet",
+    "csv",
+    "html",
+    "markdown",
+    "md",
+    "pdf",
+]
+# 1ページ1行の形式で、入力ファイルごとに常に1つのファイルにまとめて出力する
+STREAM_OUTPUT_FORMAT = ["jsonl", "parquet"]
 SUPPORT_INPUT_FORMAT = ["jpg", "jpeg", "png", "bmp", "tiff", "tif", "pdf"]
 MIN_IMAGE_SIZE = 32
 WARNING_IMAGE_SIZE = 720
@@ -1,8 +1,10 @@
+import numpy as np
+import torch
 from torch.utils.data import Dataset
-from torchvision import transforms as T
 
 from .functions import (
     extract_roi_with_perspective,
+    image_to_tensor,
     resize_with_padding,
     rotate_text_image,
     validate_quads,
@@ -10,6 +12,9 @@ from .functions import (
 
 from concurrent.futures import ThreadPoolExecutor
 
+MEAN = (0.5, 0.5, 0.5)
+STD = (0.5, 0.5, 0.5)
+
 
 class ParseqDataset(Dataset):
     def __init__(self, cfg, img, quads, num_workers=8):
@@ -17,12 +22,6 @@ class ParseqDataset(Dataset):
         self.quads = quads
         self.cfg = cfg
         self.img = img
-        self.transform = T.Compose(
-            [
-                T.ToTensor(),
-                T.Normalize(0.5, 0.5),
-            ]
-        )
 
         with ThreadPoolExecutor(max_workers=num_workers) as executor:
             data = list(executor.map(self.preprocess, self.quads))
@@ -47,4 +46,21 @@ class ParseqDataset(Dataset):
         return len(self.data)
 
     def __getitem__(self, index):
-        return self.transform(self.data[index])
+        return image_to_tensor(self.data[index], mean=MEAN, std=STD)[0]
+
+    def collate(self, start, end):
+        """
+        Write the word images in [start, end) directly into one batch tensor.
+
+        Returns:
+            torch.Tensor: (N, C, H, W) tensor
+        """
+        return self.collate_indices(range(start, end))
+
+    def collate_indices(self, indices):
+        """Write the word images of `indices` directly into one batch tensor."""
+        h, w = self.cfg.data.img_size
+        batch = np.empty((len(indices), 3, h, w), dtype=np.float32)
+        for i, index in enumerate(indices):
+            image_to_tensor(self.data[index], mean=MEAN, std=STD, out=batch[i])
+        return torch.from_numpy(batch)
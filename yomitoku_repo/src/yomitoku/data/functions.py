@@ -1,9 +1,9 @@
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import cv2
 from PIL import Image
 import numpy as np
-import torch
 import pypdfium2
 
 from ..constants import (
@@ -13,6 +13,9 @@ from ..constants import (
 )
 from ..utils.logger import set_logger
 
+if TYPE_CHECKING:
+    import torch
+
 logger = set_logger(__name__)
 
 
@@ -89,6 +92,21 @@ def load_pdf(pdf_path: str, dpi=200) -> list[np.ndarray]:
         list[np.ndarray]: list of image data(BGR)
     """
 
+    return list(iter_pdf(pdf_path, dpi=dpi))
+
+
+def iter_pdf(pdf_path: str, dpi=200):
+    """
+    Open a PDF file and render the pages one by one, so that only the page
+    being processed is kept in memory.
+
+    Args:
+        pdf_path (str): path to the PDF file
+
+    Yields:
+        np.ndarray: image data(BGR)
+    """
+
     pdf_path = Path(pdf_path)
     if not pdf_path.exists():
         raise FileNotFoundError(f"File not found: {pdf_path}")
@@ -106,37 +124,39 @@ def load_pdf(pdf_path: str, dpi=200) -> list[np.ndarray]:
 
     try:
         doc = pypdfium2.PdfDocument(pdf_path)
-        renderer = doc.render(
-            pypdfium2.PdfBitmap.to_pil,
-            scale=dpi / 72,
-        )
-        images = list(renderer)
-        images = [np.array(image.convert("RGB"))[:, :, ::-1] for image in images]
-
-        doc.close()
     except Exception as e:
         raise ValueError(f"Failed to open the PDF file: {pdf_path}") from e
 
-    return images
+    try:
+        for i in range(len(doc)):
+            try:
+                page = doc[i]
+                image = page.render(scale=dpi / 72).to_pil()
+                page.close()
+            except Exception as e:
+                raise ValueError(f"Failed to open the PDF file: {pdf_path}") from e
+
+            yield np.array(image.convert("RGB"))[:, :, ::-1]
+    finally:
+        doc.close()
 
 
-def resize_shortest_edge(
-    img: np.ndarray, shortest_edge_length: int, max_length: int
-) -> np.ndarray:
+def shortest_edge_size(
+    image_size: tuple, shortest_edge_length: int, max_length: int
+) -> tuple:
     """
-    Resize the shortest edge of the image to `shortest_edge_length` while keeping the aspect ratio.
-    if the longest edge is longer than `max_length`, resize the longest edge to `max_length` while keeping the aspect ratio.
+    Size of the image after `resize_shortest_edge`.
 
     Args:
-        img (np.ndarray): target image
+        image_size (tuple): (height, width) of the image
         shortest_edge_length (int): pixel length of the shortest edge after resizing
         max_length (int): pixel length of maximum edge after resizing
 
     Returns:
-        np.ndarray: resized image
+        tuple: (height, width) after resizing, rounded down to multiples of 32
     """
 
-    h, w = img.shape[:2]
+    h, w = image_size
     scale = shortest_edge_length / min(h, w)
     if h < w:
         new_h, new_w = shortest_edge_length, int(w * scale)
@@ -149,11 +169,74 @@ def resize_shortest_edge(
 
     neww = max(int(new_w / 32) * 32, 32)
     newh = max(int(new_h / 32) * 32, 32)
+    return newh, neww
+
 
+def resize_shortest_edge(
+    img: np.ndarray, shortest_edge_length: int, max_length: int
+) -> np.ndarray:
+    """
+    Resize the shortest edge of the image to `shortest_edge_length` while keeping the aspect ratio.
+    if the longest edge is longer than `max_length`, resize the longest edge to `max_length` while keeping the aspect ratio.
+
+    Args:
+        img (np.ndarray): target image
+        shortest_edge_length (int): pixel length of the shortest edge after resizing
+        max_length (int): pixel length of maximum edge after resizing
+
+    Returns:
+        np.ndarray: resized image
+    """
+
+    newh, neww = shortest_edge_size(img.shape[:2], shortest_edge_length, max_length)
     img = cv2.resize(img, (neww, newh), interpolation=cv2.INTER_AREA)
     return img
 
 
+def estimate_char_size(img: np.ndarray, max_size: int = 1600, min_components=20):
+    """
+    Estimate the typical character size of the page from the connected
+    components of the binarized image, without running any model.
+
+    Args:
+        img (np.ndarray): target image(BGR)
+        max_size (int): the image is reduced to this size before the analysis
+        min_components (int): minimum number of components needed for the estimate
+
+    Returns:
+        float: median size of the characters in pixels of the original image,
+            or None if the page has too few characters to estimate it
+    """
+    h, w = img.shape[:2]
+    scale = min(1.0, max_size / max(h, w))
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if scale < 1.0:
+        gray = cv2.resize(
+            gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA
+        )
+
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    num, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+
+    # 背景、ノイズ、罫線や図のような大きな成分を除く
+    stats = stats[1:]
+    sizes = np.maximum(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+    aspect = stats[:, cv2.CC_STAT_WIDTH] / stats[:, cv2.CC_STAT_HEIGHT]
+    valid = (
+        (stats[:, cv2.CC_STAT_AREA] >= 4)
+        & (sizes >= 3)
+        & (sizes <= 0.1 * min(gray.shape))
+        & (aspect >= 0.1)
+        & (aspect <= 10)
+    )
+
+    if valid.sum() < min_components:
+        return None
+
+    return float(np.median(sizes[valid])) / scale
+
+
 def standardization_image(
     img: np.ndarray, rgb=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)
 ) -> np.ndarray:
@@ -174,7 +257,7 @@ def standardization_image(
     return img
 
 
-def array_to_tensor(img: np.ndarray) -> torch.Tensor:
+def array_to_tensor(img: np.ndarray) -> "torch.Tensor":
     """
     Convert the image data to tensor.
     (H, W, C) -> (N, C, H, W)
@@ -185,12 +268,67 @@ def array_to_tensor(img: np.ndarray) -> torch.Tensor:
     Returns:
         torch.Tensor: (N, C, H, W) tensor
     """
+    import torch
+
     img = np.transpose(img, (2, 0, 1))
     tensor = torch.as_tensor(img, dtype=torch.float)
     tensor = tensor[None, :, :, :]
     return tensor
 
 
+def image_to_tensor(
+    img: np.ndarray,
+    size: tuple = None,
+    mean=(0.0, 0.0, 0.0),
+    std=(1.0, 1.0, 1.0),
+    swap_rb: bool = False,
+    interpolation: int = None,
+    out: np.ndarray = None,
+) -> "torch.Tensor":
+    """
+    Convert the uint8 image to the input tensor of a model.
+
+    The image is resized while it is still uint8. The channel flip, the
+    normalization ((x / 255 - mean) / std), the cast to float32 and the
+    (H, W, C) -> (C, H, W) transpose are done in one lookup per channel,
+    written directly into the output buffer.
+
+    Args:
+        img (np.ndarray): target image(H, W, C), uint8
+        size (tuple, optional): (height, width) after resizing. Not resized if None.
+        mean (tuple): mean of each output channel
+        std (tuple): standard deviation of each output channel
+        swap_rb (bool): reverse the order of the channels, e.g. BGR -> RGB
+        interpolation (int, optional): interpolation of cv2.resize. INTER_AREA
+            for shrinking and INTER_LINEAR for enlarging if None.
+        out (np.ndarray, optional): float32 (C, H, W) buffer to write into,
+            e.g. a slot of a batch. Allocated if None.
+
+    Returns:
+        torch.Tensor: (1, C, H, W) tensor sharing the memory with `out`
+    """
+    import torch
+
+    if size is not None and tuple(size) != img.shape[:2]:
+        h, w = size
+        if interpolation is None:
+            shrink = h * w < img.shape[0] * img.shape[1]
+            interpolation = cv2.INTER_AREA if shrink else cv2.INTER_LINEAR
+        img = cv2.resize(img, (w, h), interpolation=interpolation)
+
+    h, w, c = img.shape
+    if out is None:
+        out = np.empty((c, h, w), dtype=np.float32)
+
+    values = np.arange(256, dtype=np.float64) / 255.0
+    for i in range(c):
+        src = img[:, :, c - 1 - i] if swap_rb else img[:, :, i]
+        lut = ((values - mean[i]) / std[i]).astype(np.float32)
+        np.take(lut, src, out=out[i], mode="clip")
+
+    return torch.from_numpy(out)[None]
+
+
 def validate_quads(img: np.ndarray, quad: list[list[list[int]]]):
     """
     Validate the vertices of the quadrilateral.
@@ -1,5 +1,7 @@
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import List, Union
 
 import numpy as np
 
@@ -9,9 +11,62 @@ from yomitoku.text_recognizer import TextRecognizer
 from .layout_analyzer import LayoutAnalyzer
 from .ocr import OCRSchema, ocr_aggregate
 from .reading_order import prediction_reading_order
-from .utils.misc import calc_overlap_ratio, is_contained, quad_to_xyxy
-from .utils.visualizer import det_visualizer, reading_order_visualizer
-from .schemas import ParagraphSchema, FigureSchema, DocumentAnalyzerSchema
+from .ruby import prune_ruby
+from .triage import (
+    LayoutHistory,
+    TriageCounter,
+    has_ruled_lines,
+    is_blank_page,
+    page_signature,
+    page_statistics,
+)
+from .utils.misc import (
+    calc_overlap_ratio,
+    calc_overlap_ratios,
+    is_contained,
+    quad_to_xyxy,
+)
+from .utils.threads import ThreadBudget
+from .utils.visualizer import (
+    det_visualizer,
+    layout_visualizer,
+    reading_order_visualizer,
+    table_visualizer,
+)
+from .schemas import (
+    DocumentAnalyzerSchema,
+    FigureSchema,
+    LayoutAnalyzerSchema,
+    LayoutParserSchema,
+    ParagraphSchema,
+    TextRecognizerSchema,
+)
+from .word_array import DIRECTIONS, WordArray
+
+
+@dataclass(slots=True)
+class ParagraphElement:
+    """
+    Paragraph or word handled inside `aggregate`. Unlike ParagraphSchema, it
+    is not validated on construction or on the `order` assignments of the
+    reading order prediction.
+    """
+
+    box: List[int]
+    contents: Union[str, None]
+    direction: Union[str, None]
+    order: Union[int, None]
+    role: Union[str, None]
+
+
+@dataclass(slots=True)
+class FigureElement:
+    """Figure handled inside `aggregate`. See ParagraphElement."""
+
+    box: List[int]
+    order: Union[int, None]
+    paragraphs: List[ParagraphElement]
+    direction: Union[str, None]
 
 
 def combine_flags(flag1, flag2):
@@ -58,37 +113,47 @@ def extract_paragraph_within_figure(paragraphs, figures):
             contained_paragraphs, reading_order
         )
         figure["paragraphs"] = sorted(figure_paragraphs, key=lambda x: x.order)
-        figure = FigureSchema(**figure)
+        figure = FigureElement(**figure)
         new_figures.append(figure)
 
     return new_figures, check_list
 
 
 def extract_words_within_element(pred_words, element):
-    contained_words = []
-    word_sum_width = 0
-    word_sum_height = 0
-    check_list = [False] * len(pred_words)
-
-    for i, word in enumerate(pred_words):
-        word_box = quad_to_xyxy(word.points)
-        if is_contained(element.box, word_box, threshold=0.5):
-            word_sum_width += word_box[2] - word_box[0]
-            word_sum_height += word_box[3] - word_box[1]
-            check_list[i] = True
-
-            word_element = ParagraphSchema(
-                box=word_box,
-                contents=word.content,
-                direction=word.direction,
-                order=0,
-                role=None,
-            )
-            contained_words.append(word_element)
-
-    if len(contained_words) == 0:
+    """
+    Extract the words contained in the element and join them in the reading
+    order.
+
+    Args:
+        pred_words (WordArray | list[WordPrediction]): words of the page
+        element: paragraph or table cell with `box`
+
+    Returns:
+        str: contents of the contained words, or None if there are none
+        str: direction of the element
+        list[bool]: True for the contained words
+    """
+    if not isinstance(pred_words, WordArray):
+        pred_words = WordArray.from_schema(pred_words)
+
+    word_boxes = pred_words.xyxy()
+    contained = calc_overlap_ratios(element.box, word_boxes) > 0.5
+    check_list = contained.tolist()
+
+    if not contained.any():
         return None, None, check_list
 
+    contained_words = [
+        ParagraphElement(
+            box=word_boxes[i].tolist(),
+            contents=pred_words.contents[i],
+            direction=DIRECTIONS[pred_words.vertical[i]],
+            order=0,
+            role=None,
+        )
+        for i in np.flatnonzero(contained)
+    ]
+
     word_direction = [word.direction for word in contained_words]
     cnt_horizontal = word_direction.count("horizontal")
     cnt_vertical = word_direction.count("vertical")
@@ -103,20 +168,22 @@ def extract_words_within_element(pred_words, element):
     return (contained_words, element_direction, check_list)
 
 
-def is_vertical(quad, thresh_aspect=2):
-    quad = np.array(quad)
-    width = np.linalg.norm(quad[0] - quad[1])
-    height = np.linalg.norm(quad[1] - quad[2])
+def _quad_size(quad):
+    # (4, 2)の四角形、または(N, 4, 2)の配列の幅と高さ
+    quad = np.asarray(quad)
+    width = np.linalg.norm(quad[..., 0, :] - quad[..., 1, :], axis=-1)
+    height = np.linalg.norm(quad[..., 1, :] - quad[..., 2, :], axis=-1)
+    return width, height
 
+
+def is_vertical(quad, thresh_aspect=2):
+    width, height = _quad_size(quad)
     return height > width * thresh_aspect
 
 
 def is_noise(quad, thresh=15):
-    quad = np.array(quad)
-    width = np.linalg.norm(quad[0] - quad[1])
-    height = np.linalg.norm(quad[1] - quad[2])
-
-    return width < thresh or height < thresh
+    width, height = _quad_size(quad)
+    return (width < thresh) | (height < thresh)
 
 
 def recursive_update(original, new_data):
@@ -138,15 +205,18 @@ def _extract_words_within_table(words, table, check_list):
     horizontal_words = []
     vertical_words = []
 
-    for i, (points, score) in enumerate(zip(words.points, words.scores)):
-        word_box = quad_to_xyxy(points)
-        if is_contained(table.box, word_box, threshold=0.5):
-            if is_vertical(points):
-                vertical_words.append({"points": points, "score": score})
-            else:
-                horizontal_words.append({"points": points, "score": score})
+    quads = np.asarray(words.points, dtype=np.int32).reshape(-1, 4, 2)
+    contained = calc_overlap_ratios(table.box, quad_to_xyxy(quads)) > 0.5
+    vertical = is_vertical(quads)
 
-            check_list[i] = True
+    for i in np.flatnonzero(contained):
+        word = {"points": words.points[i], "score": words.scores[i]}
+        if vertical[i]:
+            vertical_words.append(word)
+        else:
+            horizontal_words.append(word)
+
+        check_list[i] = True
 
     return (horizontal_words, vertical_words, check_list)
 
@@ -289,6 +359,41 @@ def _split_text_across_cells(results_det, results_layout):
     return results_det
 
 
+def _build_thread_budget(thread_budget, pin_threads):
+    """
+    Build the thread budget of the text detector and the layout analyzer,
+    which run at the same time.
+
+    Args:
+        thread_budget (str | dict): "auto" to split the intra-op threads of
+            PyTorch evenly, or the number of threads of each stage, e.g.
+            {"text_detector": 6, "layout_analyzer": 2}
+        pin_threads (bool): pin each stage to its own cores
+    """
+    stages = ["text_detector", "layout_analyzer"]
+
+    if thread_budget == "auto":
+        import torch
+
+        # --jobsのワーカーではプロセスごとに減らしたスレッド数を分け合う
+        return ThreadBudget(
+            {stage: 1 for stage in stages},
+            num_threads=torch.get_num_threads(),
+            pin=pin_threads,
+        )
+
+    if not isinstance(thread_budget, dict) or set(thread_budget) != set(stages):
+        raise ValueError(
+            f"thread_budget must be 'auto' or a dict with the keys {stages}."
+        )
+
+    return ThreadBudget(
+        thread_budget,
+        num_threads=sum(thread_budget.values()),
+        pin=pin_threads,
+    )
+
+
 class DocumentAnalyzer:
     def __init__(
         self,
@@ -298,6 +403,13 @@ class DocumentAnalyzer:
         ignore_meta=False,
         reading_order="auto",
         split_text_across_cells=False,
+        skip_ruby=False,
+        thread_budget="auto",
+        pin_threads=False,
+        skip_blank=False,
+        layout_policy="always",
+        reuse_layout=False,
+        reuse_threshold=0.9,
     ):
         default_configs = {
             "ocr": {
@@ -324,6 +436,11 @@ class DocumentAnalyzer:
 
         self.reading_order = reading_order
 
+        if layout_policy not in ["always", "auto"]:
+            raise ValueError(
+                f"Invalid layout_policy: {layout_policy}. Supported policies are ['always', 'auto']"
+            )
+
         if isinstance(configs, dict):
             recursive_update(default_configs, configs)
         else:
@@ -331,6 +448,20 @@ class DocumentAnalyzer:
                 "configs must be a dict. See the https://kotaro-kinoshita.github.io/yomitoku/module/#config"
             )
 
+        self.thread_budget = None
+        if thread_budget is not None:
+            self.thread_budget = _build_thread_budget(thread_budget, pin_threads)
+
+            # onnxruntimeのスレッド数はセッションの作成時に決まるため、configで渡す
+            for group, name, stage in [
+                ("ocr", "text_detector", "text_detector"),
+                ("layout_analyzer", "layout_parser", "layout_analyzer"),
+                ("layout_analyzer", "table_structure_recognizer", "layout_analyzer"),
+            ]:
+                default_configs[group][name].setdefault(
+                    "num_threads", self.thread_budget.threads(stage)
+                )
+
         self.text_detector = TextDetector(
             **default_configs["ocr"]["text_detector"],
         )
@@ -345,14 +476,26 @@ class DocumentAnalyzer:
 
         self.ignore_meta = ignore_meta
         self.split_text_across_cells = split_text_across_cells
+        self.skip_ruby = skip_ruby
+        self.skip_blank = skip_blank
+        self.layout_policy = layout_policy
+        self.triage = TriageCounter()
+        self.layout_history = None
+        if reuse_layout:
+            self.layout_history = LayoutHistory(threshold=reuse_threshold)
+        self.img = None
 
     def aggregate(self, ocr_res, layout_res):
         paragraphs = []
         check_list = [False] * len(ocr_res.words)
+
+        # 単語の座標は配列にまとめ、要素ごとの包含判定をベクトル化する
+        words_array = WordArray.from_schema(ocr_res)
+        word_boxes = words_array.xyxy().tolist()
         for table in layout_res.tables:
             for cell in table.cells:
                 words, direction, flags = extract_words_within_element(
-                    ocr_res.words, cell
+                    words_array, cell
                 )
 
                 if words is None:
@@ -363,7 +506,7 @@ class DocumentAnalyzer:
 
         for paragraph in layout_res.paragraphs:
             words, direction, flags = extract_words_within_element(
-                ocr_res.words, paragraph
+                words_array, paragraph
             )
 
             if words is None:
@@ -378,7 +521,7 @@ class DocumentAnalyzer:
             }
 
             check_list = combine_flags(check_list, flags)
-            paragraph = ParagraphSchema(**paragraph)
+            paragraph = ParagraphElement(**paragraph)
             paragraphs.append(paragraph)
 
         for i, word in enumerate(ocr_res.words):
@@ -386,13 +529,13 @@ class DocumentAnalyzer:
             if not check_list[i]:
                 paragraph = {
                     "contents": word.content,
-                    "box": quad_to_xyxy(word.points),
+                    "box": word_boxes[i],
                     "direction": direction,
                     "order": 0,
                     "role": None,
                 }
 
-                paragraph = ParagraphSchema(**paragraph)
+                paragraph = ParagraphElement(**paragraph)
                 paragraphs.append(paragraph)
 
         figures, check_list = extract_paragraph_within_figure(
@@ -447,32 +590,117 @@ class DocumentAnalyzer:
         figures = sorted(figures, key=lambda x: x.order)
         tables = sorted(layout_res.tables, key=lambda x: x.order)
 
+        # 検証済みのスキーマはここで一度だけ作成する
         outputs = {
-            "paragraphs": paragraphs,
+            "paragraphs": [ParagraphSchema(**asdict(p)) for p in paragraphs],
             "tables": tables,
-            "figures": figures,
+            "figures": [FigureSchema(**asdict(f)) for f in figures],
             "words": ocr_res.words,
         }
 
         return outputs
 
+    def _run_stage(self, name, module, img):
+        if self.thread_budget is None:
+            return module(img)
+
+        with self.thread_budget.stage(name):
+            return module(img)
+
+    def _triage_page(self, img):
+        """
+        Decide the stages to run on the page from cheap statistics of a
+        thumbnail.
+
+        Returns:
+            tuple: (blank, run_layout)
+        """
+        self.triage["pages"] += 1
+        if not self.skip_blank and self.layout_policy == "always":
+            return False, True
+
+        stats = page_statistics(img)
+        if self.skip_blank and is_blank_page(stats):
+            self.triage["blank"] += 1
+            return True, False
+
+        # 表の罫線がないページではレイアウト解析を省略する
+        run_layout = self.layout_policy == "always" or has_ruled_lines(stats)
+        if not run_layout:
+            self.triage["layout_skipped"] += 1
+
+        return False, run_layout
+
+    def _analyze_layout(self, img):
+        """
+        Run the layout analysis, or reuse the results of a recent page with
+        a similar signature.
+        """
+        if self.layout_history is None:
+            return self._run_stage("layout_analyzer", self.layout, img)
+
+        signature = page_signature(img)
+        results = self.layout_history.find(img, signature)
+        if results is None:
+            results, vis = self._run_stage("layout_analyzer", self.layout, img)
+            self.layout_history.add(img, signature, results)
+            return results, vis
+
+        self.triage["layout_reused"] += 1
+        vis = None
+        if self.visualize:
+            vis = layout_visualizer(
+                LayoutParserSchema(
+                    paragraphs=results.paragraphs, tables=[], figures=results.figures
+                ),
+                img,
+            )
+            for table in results.tables:
+                vis = table_visualizer(vis, table)
+
+        return results, vis
+
+    def _empty_results(self, img):
+        vis = img.copy() if self.visualize else None
+        results = DocumentAnalyzerSchema(paragraphs=[], tables=[], words=[], figures=[])
+        return results, vis, vis
+
     async def run(self, img):
+        blank, run_layout = self._triage_page(img)
+        if blank:
+            return self._empty_results(img)
+
         with ThreadPoolExecutor(max_workers=2) as executor:
             loop = asyncio.get_running_loop()
             tasks = [
                 # loop.run_in_executor(executor, self.ocr, img),
-                loop.run_in_executor(executor, self.text_detector, img),
-                loop.run_in_executor(executor, self.layout, img),
+                loop.run_in_executor(
+                    executor, self._run_stage, "text_detector", self.text_detector, img
+                ),
             ]
+            if run_layout:
+                tasks.append(loop.run_in_executor(executor, self._analyze_layout, img))
 
             results = await asyncio.gather(*tasks)
+            if self.thread_budget is not None:
+                self.thread_budget.restore()
 
             results_det, _ = results[0]
-            results_layout, layout = results[1]
+            if run_layout:
+                results_layout, layout = results[1]
+            else:
+                results_layout = LayoutAnalyzerSchema(
+                    paragraphs=[], tables=[], figures=[]
+                )
+                layout = img.copy() if self.visualize else None
 
             if self.split_text_across_cells:
                 results_det = _split_text_across_cells(results_det, results_layout)
 
+            # ルビは認識前に形状だけで判定して除外する
+            if self.skip_ruby:
+                results_det = prune_ruby(results_det)
+
             vis_det = None
             if self.visualize:
                 vis_det = det_visualizer(
@@ -480,7 +708,17 @@ class DocumentAnalyzer:
                     results_det.points,
                 )
 
-            results_rec, ocr = self.text_recognizer(img, results_det.points, vis_det)
+            if len(results_det.points) > 0:
+                results_rec, ocr = self.text_recognizer(
+                    img, results_det.points, vis_det
+                )
+            else:
+                # 文字が検出されなかったページは認識を省略する
+                self.triage["no_text"] += 1
+                results_rec = TextRecognizerSchema(
+                    contents=[], directions=[], scores=[], points=[]
+                )
+                ocr = vis_det
 
             outputs = {"words": ocr_aggregate(results_det, results_rec)}
             results_ocr = OCRSchema(**outputs)
@@ -1,7 +1,16 @@
 from .export_csv import export_csv, save_csv, convert_csv
 from .export_html import export_html, save_html, convert_html
-from .export_json import export_json, save_json, convert_json
+from .export_json import export_json, save_json, convert_json, convert_jsonl
 from .export_markdown import export_markdown, save_markdown, convert_markdown
+from .figure_writer import FigureWriter, get_figure_writer, save_figures
+from .stream_writer import (
+    CsvStreamWriter,
+    JsonLinesStreamWriter,
+    JsonStreamWriter,
+    StreamWriter,
+    TextStreamWriter,
+    open_stream_writer,
+)
 
 __all__ = [
     "export_html",
@@ -16,4 +25,14 @@ __all__ = [
     "convert_markdown",
     "convert_csv",
     "convert_json",
+    "convert_jsonl",
+    "StreamWriter",
+    "JsonStreamWriter",
+    "JsonLinesStreamWriter",
+    "CsvStreamWriter",
+    "TextStreamWriter",
+    "open_stream_writer",
+    "FigureWriter",
+    "get_figure_writer",
+    "save_figures",
 ]
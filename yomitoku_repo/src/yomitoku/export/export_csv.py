@@ -1,7 +1,6 @@
 import csv
-import os
 
-from ..utils.misc import save_image
+from .figure_writer import get_figure_writer, save_figures
 
 
 def table_to_csv(table, ignore_line_break):
@@ -42,19 +41,7 @@ def save_figure(
     out_path,
     figure_dir="figures",
 ):
-    assert img is not None, "img is required for saving figures"
-
-    for i, figure in enumerate(figures):
-        x1, y1, x2, y2 = map(int, figure.box)
-        figure_img = img[y1:y2, x1:x2, :]
-        save_dir = os.path.dirname(out_path)
-        save_dir = os.path.join(save_dir, figure_dir)
-        os.makedirs(save_dir, exist_ok=True)
-
-        filename = os.path.splitext(os.path.basename(out_path))[0]
-        figure_name = f"{filename}_figure_{i}.png"
-        figure_path = os.path.join(save_dir, figure_name)
-        save_image(figure_img, figure_path)
+    save_figures(figures, img, out_path, figure_dir=figure_dir)
 
 
 def convert_csv(
@@ -138,6 +125,8 @@ def export_csv(
     )
 
     save_csv(elements, out_path, encoding)
+    # 図の画像の書き込みは並行して進めて最後に待つ
+    get_figure_writer().wait()
     return elements
 
 
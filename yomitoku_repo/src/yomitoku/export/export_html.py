@@ -1,9 +1,7 @@
-import os
 import re
 from html import escape
-from lxml import etree, html
 
-from ..utils.misc import save_image
+from .figure_writer import get_figure_writer, save_figures
 
 
 def convert_text_to_html(text):
@@ -109,21 +107,10 @@ def figure_to_html(
     figure_dir="figures",
     width=200,
 ):
-    assert img is not None, "img is required for saving figures"
+    figure_names = save_figures(figures, img, out_path, figure_dir=figure_dir)
 
     elements = []
-    for i, figure in enumerate(figures):
-        x1, y1, x2, y2 = map(int, figure.box)
-        figure_img = img[y1:y2, x1:x2, :]
-        save_dir = os.path.dirname(out_path)
-        save_dir = os.path.join(save_dir, figure_dir)
-        os.makedirs(save_dir, exist_ok=True)
-
-        filename = os.path.splitext(os.path.basename(out_path))[0]
-        figure_name = f"{filename}_figure_{i}.png"
-        figure_path = os.path.join(save_dir, figure_name)
-        save_image(figure_img, figure_path)
-
+    for figure, figure_name in zip(figures, figure_names):
         elements.append(
             {
                 "order": figure.order,
@@ -181,6 +168,8 @@ def convert_html(
 
     html_string = "".join([element["html"] for element in elements])
     if not len(html_string) == 0:
+        from lxml import etree, html
+
         parsed_html = html.fromstring(html_string)
         formatted_html = etree.tostring(
             parsed_html, pretty_print=True, encoding="unicode"
@@ -214,6 +203,8 @@ def export_html(
     )
 
     save_html(formatted_html, out_path, encoding)
+    # 図の画像の書き込みは並行して進めて最後に待つ
+    get_figure_writer().wait()
 
     return formatted_html
 
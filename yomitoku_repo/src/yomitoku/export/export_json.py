@@ -1,7 +1,8 @@
 import json
-import os
 
-from ..utils.misc import save_image
+from pydantic import BaseModel
+
+from .figure_writer import get_figure_writer, save_figures
 
 
 def paragraph_to_json(paragraph, ignore_line_break):
@@ -21,19 +22,7 @@ def save_figure(
     out_path,
     figure_dir="figures",
 ):
-    assert img is not None, "img is required for saving figures"
-
-    for i, figure in enumerate(figures):
-        x1, y1, x2, y2 = map(int, figure.box)
-        figure_img = img[y1:y2, x1:x2, :]
-        save_dir = os.path.dirname(out_path)
-        save_dir = os.path.join(save_dir, figure_dir)
-        os.makedirs(save_dir, exist_ok=True)
-
-        filename = os.path.splitext(os.path.basename(out_path))[0]
-        figure_name = f"{filename}_figure_{i}.png"
-        figure_path = os.path.join(save_dir, figure_name)
-        save_image(figure_img, figure_path)
+    save_figures(figures, img, out_path, figure_dir=figure_dir)
 
 
 def convert_json(inputs, out_path, ignore_line_break, img, export_figure, figure_dir):
@@ -81,10 +70,48 @@ def export_json(
         out_path,
         encoding,
     )
+    # 図の画像の書き込みは並行して進めて最後に待つ
+    get_figure_writer().wait()
 
     return inputs
 
 
+def dumps_compact(data):
+    """
+    Compact single-line JSON without the indentation and the key sorting of
+    `save_json`.
+
+    Schemas are serialized directly by pydantic without building a dict tree.
+    Plain dicts are encoded with orjson if it is installed.
+    """
+    if isinstance(data, BaseModel):
+        return data.model_dump_json()
+
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    return orjson.dumps(data).decode("utf-8")
+
+
+def convert_jsonl(inputs, out_path, ignore_line_break, img, export_figure, figure_dir):
+    """
+    Convert the result of a page to one line of JSON-lines. The line has no
+    trailing line break.
+    """
+    inputs = convert_json(
+        inputs,
+        out_path,
+        ignore_line_break,
+        img,
+        export_figure,
+        figure_dir,
+    )
+
+    return dumps_compact(inputs)
+
+
 def save_json(data, out_path, encoding):
     with open(out_path, "w", encoding=encoding, errors="ignore") as f:
         json.dump(
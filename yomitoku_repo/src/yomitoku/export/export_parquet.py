@@ -0,0 +1,129 @@
+from pydantic import BaseModel
+
+from .stream_writer import StreamWriter
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            "The parquet output requires pyarrow. "
+            "Install it with `pip install yomitoku[parquet]`."
+        ) from e
+
+    return pa, pq
+
+
+def page_schema():
+    """Arrow schema of one row, which holds the DocumentAnalyzerSchema of a page."""
+    pa, _ = _import_pyarrow()
+
+    box = pa.list_(pa.int32(), 4)
+    points = pa.list_(pa.list_(pa.int32(), 2), 4)
+
+    paragraph = pa.struct(
+        [
+            ("box", box),
+            ("contents", pa.string()),
+            ("direction", pa.string()),
+            ("order", pa.int32()),
+            ("role", pa.string()),
+        ]
+    )
+    line = pa.struct([("box", box), ("score", pa.float32())])
+    cell = pa.struct(
+        [
+            ("col", pa.int32()),
+            ("row", pa.int32()),
+            ("col_span", pa.int32()),
+            ("row_span", pa.int32()),
+            ("box", box),
+            ("contents", pa.string()),
+        ]
+    )
+    table = pa.struct(
+        [
+            ("box", box),
+            ("n_row", pa.int32()),
+            ("n_col", pa.int32()),
+            ("rows", pa.list_(line)),
+            ("cols", pa.list_(line)),
+            ("spans", pa.list_(line)),
+            ("cells", pa.list_(cell)),
+            ("order", pa.int32()),
+        ]
+    )
+    word = pa.struct(
+        [
+            ("points", points),
+            ("content", pa.string()),
+            ("direction", pa.string()),
+            ("rec_score", pa.float32()),
+            ("det_score", pa.float32()),
+        ]
+    )
+    figure = pa.struct(
+        [
+            ("box", box),
+            ("order", pa.int32()),
+            ("paragraphs", pa.list_(paragraph)),
+            ("direction", pa.string()),
+        ]
+    )
+
+    return pa.schema(
+        [
+            ("page", pa.int32()),
+            ("paragraphs", pa.list_(paragraph)),
+            ("tables", pa.list_(table)),
+            ("words", pa.list_(word)),
+            ("figures", pa.list_(figure)),
+        ]
+    )
+
+
+class ParquetStreamWriter(StreamWriter):
+    """
+    Writes one row per page to a Parquet file. The pages are buffered and
+    flushed as a row group every `row_group_size` pages, so memory does not
+    grow with the number of pages.
+    """
+
+    mode = "wb"
+
+    def __init__(self, f, row_group_size=64):
+        super().__init__(f)
+        pa, pq = _import_pyarrow()
+
+        self.pa = pa
+        self.row_group_size = row_group_size
+        self.schema = page_schema()
+        self.rows = []
+        self.writer = pq.ParquetWriter(f, self.schema)
+
+    def write_page(self, data):
+        if isinstance(data, BaseModel):
+            data = data.model_dump()
+
+        self.rows.append({"page": self.num_pages, **data})
+
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+
+        table = self.pa.Table.from_pylist(self.rows, schema=self.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def finalize(self):
+        self.flush()
+        self.writer.close()
+
+    def abort(self):
+        self.rows = []
+        self.writer.close()
@@ -0,0 +1,148 @@
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utils.misc import save_image
+from ..utils.threads import available_cores
+
+
+FIGURE_FORMATS = ["png", "jpg"]
+
+
+def figure_path(out_path, figure_dir, index, figure_format="png"):
+    """
+    Name and path of the image of the `index`-th figure of a page. The name
+    only depends on the stem of `out_path`, so every output format of a page
+    refers to the same image.
+    """
+    filename = os.path.splitext(os.path.basename(out_path))[0]
+    figure_name = f"{filename}_figure_{index}.{figure_format}"
+    save_dir = os.path.join(os.path.dirname(out_path), figure_dir)
+    return figure_name, os.path.join(save_dir, figure_name)
+
+
+class FigureWriter:
+    """
+    Crops, encodes and writes the figure images in a thread pool.
+
+    `save` returns as soon as the figure is queued, and `wait` blocks until
+    every queued figure is written. A figure requested again with the same
+    image, box and path, e.g. by another output format of the same page, is
+    encoded only once. The output directories are created once.
+
+    Args:
+        max_workers (int, optional): number of threads. Defaults to the number
+            of available cores, up to 4.
+        figure_format (str): "png", lossless, or "jpg", smaller and faster to
+            encode but lossy for line art
+    """
+
+    def __init__(self, max_workers=None, figure_format="png"):
+        if max_workers is None:
+            max_workers = min(4, len(available_cores()))
+
+        self.max_workers = max_workers
+        self.set_figure_format(figure_format)
+        self.lock = threading.RLock()
+        self.executor = None
+        self.pid = None
+        self.pending = []
+        self.saved = {}
+        self.dirs = set()
+
+    def set_figure_format(self, figure_format):
+        """Image format of the figures saved by `save_figures` from now on."""
+        if figure_format not in FIGURE_FORMATS:
+            raise ValueError(
+                f"Invalid figure_format: {figure_format}. Supported formats are {FIGURE_FORMATS}"
+            )
+
+        self.figure_format = figure_format
+
+    def _get_executor(self):
+        # fork後の子プロセスには親のスレッドが引き継がれないので作り直す
+        if self.executor is None or self.pid != os.getpid():
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="figure_writer"
+            )
+            self.pid = os.getpid()
+            self.pending = []
+            self.saved = {}
+            self.dirs = set()
+        return self.executor
+
+    def _forget(self, path, ref):
+        with self.lock:
+            entry = self.saved.get(path)
+            if entry is not None and entry[0] is ref:
+                del self.saved[path]
+
+    def save(self, img, box, path):
+        """
+        Queue the crop `box` ([x1, y1, x2, y2]) of `img` to be saved at `path`.
+        The format follows the extension of `path`.
+        """
+        box = tuple(map(int, box))
+
+        with self.lock:
+            executor = self._get_executor()
+
+            entry = self.saved.get(path)
+            if entry is not None and entry[0]() is img and entry[1] == box:
+                return entry[2]
+
+            save_dir = os.path.dirname(path)
+            if save_dir not in self.dirs:
+                os.makedirs(save_dir, exist_ok=True)
+                self.dirs.add(save_dir)
+
+            x1, y1, x2, y2 = box
+            future = executor.submit(save_image, img[y1:y2, x1:x2, :], path)
+            # 画像が解放されたら重複判定の記録も消す
+            ref = weakref.ref(img, lambda ref: self._forget(path, ref))
+            self.saved[path] = (ref, box, future)
+            self.pending.append(future)
+
+        return future
+
+    def wait(self):
+        """Block until every queued figure is written and raise its error, if any."""
+        with self.lock:
+            pending, self.pending = self.pending, []
+
+        for future in pending:
+            future.result()
+
+    def close(self):
+        self.wait()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+_figure_writer = None
+
+
+def get_figure_writer():
+    """FigureWriter shared by every exporter."""
+    global _figure_writer
+    if _figure_writer is None:
+        _figure_writer = FigureWriter()
+    return _figure_writer
+
+
+def save_figures(figures, img, out_path, figure_dir="figures"):
+    """Queue the images of the figures of a page and return their names."""
+    assert img is not None, "img is required for saving figures"
+
+    writer = get_figure_writer()
+    names = []
+    for i, figure in enumerate(figures):
+        figure_name, path = figure_path(
+            out_path, figure_dir, i, figure_format=writer.figure_format
+        )
+        writer.save(img, figure.box, path)
+        names.append(figure_name)
+
+    return names
@@ -0,0 +1,166 @@
+import csv
+import json
+import os
+from contextlib import contextmanager
+
+from .export_json import dumps_compact
+
+
+class StreamWriter:
+    """
+    Writer that appends each page to a merged output file as soon as the page
+    is processed, instead of keeping the results of every page in memory.
+
+    The writer only writes to the file it is given. Use `open_stream_writer`,
+    which writes to a temporary file and moves it to the output path only if
+    every page and the end of the output were written.
+    """
+
+    mode = "w"
+    newline = None
+
+    def __init__(self, f):
+        self.f = f
+        self.num_pages = 0
+
+    def write(self, data):
+        self.write_page(data)
+        self.num_pages += 1
+
+    def write_page(self, data):
+        raise NotImplementedError
+
+    def finalize(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class JsonStreamWriter(StreamWriter):
+    """Writes a JSON array of page objects, formatted the same as `save_json`."""
+
+    def write_page(self, data):
+        page = json.dumps(
+            data,
+            ensure_ascii=False,
+            indent=4,
+            sort_keys=True,
+            separators=(",", ": "),
+        )
+        page = "    " + page.replace("\n", "\n    ")
+
+        if self.num_pages == 0:
+            self.f.write("[\n" + page)
+        else:
+            self.f.write(",\n" + page)
+
+    def finalize(self):
+        if self.num_pages == 0:
+            self.f.write("[]")
+        else:
+            self.f.write("\n]")
+
+
+class JsonLinesStreamWriter(StreamWriter):
+    """
+    Writes one compact JSON object per line. Each page is accepted as a
+    serialized line, a schema or a dict.
+    """
+
+    def write_page(self, data):
+        if not isinstance(data, str):
+            data = dumps_compact(data)
+        self.f.write(data + "\n")
+
+
+class CsvStreamWriter(StreamWriter):
+    """Appends the elements of each page, formatted the same as `save_csv`."""
+
+    newline = ""
+
+    def __init__(self, f):
+        super().__init__(f)
+        self.writer = csv.writer(self.f, quoting=csv.QUOTE_MINIMAL)
+
+    def write_page(self, elements):
+        for element in elements:
+            if element["type"] == "table":
+                self.writer.writerows(element["element"])
+            else:
+                self.writer.writerow([element["element"]])
+
+            self.writer.writerow([""])
+
+
+class TextStreamWriter(StreamWriter):
+    """Appends the HTML or Markdown of each page separated by a line break."""
+
+    def write_page(self, text):
+        if self.num_pages > 0:
+            self.f.write("\n")
+        self.f.write(text)
+
+
+STREAM_WRITERS = {
+    "json": JsonStreamWriter,
+    "jsonl": JsonLinesStreamWriter,
+    "csv": CsvStreamWriter,
+    "html": TextStreamWriter,
+    "md": TextStreamWriter,
+    "markdown": TextStreamWriter,
+}
+
+
+def get_stream_writer(format):
+    if format == "parquet":
+        from .export_parquet import ParquetStreamWriter
+
+        return ParquetStreamWriter
+
+    if format not in STREAM_WRITERS:
+        raise ValueError(f"Unsupported output format for stream writer: {format}")
+
+    return STREAM_WRITERS[format]
+
+
+@contextmanager
+def open_stream_writer(format, out_path, encoding="utf-8"):
+    """
+    Open the stream writer of `format` as a context manager.
+
+    The pages are written to `{out_path}.part`, which is moved to `out_path`
+    when the block exits. If the block, or finishing the output, raises an
+    error, the temporary file is removed and no output file is left behind.
+
+    Args:
+        format (str): output format
+        out_path (str): path of the merged output file
+        encoding (str): encoding of the text formats
+    """
+    writer_class = get_stream_writer(format)
+    tmp_path = f"{out_path}.part"
+    if "b" in writer_class.mode:
+        encoding = None
+
+    try:
+        with open(
+            tmp_path,
+            writer_class.mode,
+            encoding=encoding,
+            errors=None if encoding is None else "ignore",
+            newline=writer_class.newline,
+        ) as f:
+            writer = writer_class(f)
+            try:
+                yield writer
+                writer.finalize()
+            except BaseException:
+                writer.abort()
+                raise
+
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -1,15 +1,11 @@
-import cv2
 import os
-import onnx
-import onnxruntime
 import torch
-import torchvision.transforms as T
-from PIL import Image
 
 from .constants import ROOT_DIR
 
-from .base import BaseModelCatalog, BaseModule
+from .base import BaseModelCatalog, BaseModule, create_onnx_session, to_float
 from .configs import LayoutParserRTDETRv2Config, LayoutParserRTDETRv2V2Config
+from .data.functions import image_to_tensor
 from .models import RTDETRv2
 from .postprocessor import RTDETRPostProcessor
 from .utils.misc import filter_by_flag, is_contained
@@ -85,6 +81,10 @@ class LayoutParser(BaseModule):
         visualize=False,
         from_pretrained=True,
         infer_onnx=False,
+        precision="fp32",
+        channels_last=False,
+        compile=False,
+        num_threads=None,
     ):
         super().__init__()
         self.load_model(model_name, path_cfg, from_pretrained)
@@ -98,13 +98,6 @@ class LayoutParser(BaseModule):
             num_top_queries=self._cfg.RTDETRTransformerv2.num_queries,
         )
 
-        self.transforms = T.Compose(
-            [
-                T.Resize(self._cfg.data.img_size),
-                T.ToTensor(),
-            ]
-        )
-
         self.thresh_score = self._cfg.thresh_score
 
         self.label_mapper = {
@@ -121,17 +114,21 @@ class LayoutParser(BaseModule):
 
             self.model = None
 
+            import onnx
+
             model = onnx.load(path_onnx)
-            if torch.cuda.is_available() and device == "cuda":
-                self.sess = onnxruntime.InferenceSession(
-                    model.SerializeToString(), providers=["CUDAExecutionProvider"]
-                )
-            else:
-                self.sess = onnxruntime.InferenceSession(model.SerializeToString())
+            self.sess = create_onnx_session(model, device, num_threads)
 
         if self.model is not None:
             self.model.to(self.device)
 
+        self.setup_execution(
+            precision=precision,
+            channels_last=channels_last,
+            compile=compile,
+            example_input=torch.zeros(1, 3, *self._cfg.data.img_size),
+        )
+
     def convert_onnx(self, path_onnx):
         dynamic_axes = {
             "input": {0: "batch_size"},
@@ -152,10 +149,7 @@ class LayoutParser(BaseModule):
         )
 
     def preprocess(self, img):
-        cv_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(cv_img)
-        img_tensor = self.transforms(img)[None]
-        return img_tensor
+        return image_to_tensor(img, self._cfg.data.img_size, swap_rb=True)
 
     def postprocess(self, preds, image_size):
         h, w = image_size
@@ -215,9 +209,8 @@ class LayoutParser(BaseModule):
             }
 
         else:
-            with torch.inference_mode():
-                img_tensor = img_tensor.to(self.device)
-                preds = self.model(img_tensor)
+            with torch.inference_mode(), self.autocast():
+                preds = to_float(self.model(self.to_input(img_tensor)))
 
         results = self.postprocess(preds, (ori_h, ori_w))
 
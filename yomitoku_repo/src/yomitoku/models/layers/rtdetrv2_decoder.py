@@ -664,7 +664,7 @@ class RTDETRTransformerv2(nn.Module):
         spatial_shapes=None,
         grid_size=0.05,
         dtype=torch.float32,
-        device="cpu",
+        device=None,
     ):
         if spatial_shapes is None:
             spatial_shapes = []
@@ -683,7 +683,9 @@ class RTDETRTransformerv2(nn.Module):
             lvl_anchors = torch.concat([grid_xy, wh], dim=-1).reshape(-1, h * w, 4)
             anchors.append(lvl_anchors)
 
-        anchors = torch.concat(anchors, dim=1).to(device)
+        anchors = torch.concat(anchors, dim=1)
+        if device is not None:
+            anchors = anchors.to(device)
         valid_mask = ((anchors > self.eps) * (anchors < 1 - self.eps)).all(
             -1, keepdim=True
         )
@@ -83,6 +83,11 @@ class PARSeq(nn.Module, PyTorchModelHubMixin):
 
         self.export_onnx = False
 
+        # Hybrid decoding: decode NAR, then re-decode AR only the sequences below this confidence.
+        self.ar_fallback_threshold = None
+        self.num_decoded = 0
+        self.num_fallback = 0
+
     @property
     def _device(self) -> torch.device:
         return next(self.head.parameters(recurse=False)).device
@@ -122,6 +127,128 @@ class PARSeq(nn.Module, PyTorchModelHubMixin):
             tgt_padding_mask,
         )
 
+    def _masks(self, num_steps: int):
+        # Special case for the forward permutation. Faster than using `generate_attn_masks()`
+        tgt_mask = query_mask = torch.triu(
+            torch.ones((num_steps, num_steps), dtype=torch.bool, device=self._device),
+            1,
+        )
+        return tgt_mask, query_mask
+
+    def _decode_ar(
+        self,
+        memory: Tensor,
+        pos_queries: Tensor,
+        tgt_mask: Tensor,
+        query_mask: Tensor,
+        testing: bool,
+    ) -> Tensor:
+        bs, num_steps = pos_queries.shape[:2]
+        tgt_in = torch.full(
+            (bs, num_steps),
+            self.tokenizer.pad_id,
+            dtype=torch.long,
+            device=self._device,
+        )
+        tgt_in[:, 0] = self.tokenizer.bos_id
+
+        logits = []
+        for i in range(num_steps):
+            j = i + 1  # next token index
+            # Efficient decoding:
+            # Input the context up to the ith token. We use only one query (at poad masking effect of the canonical (forward) AR context.
+            # Past tokens have no access to future tokens, hence are fixed once computed.sition = i) at a time.
+            # This works because of the lookahe
+            tgt_out = self.decode(
+                tgt_in[:, :j],
+                memory,
+                tgt_mask[:j, :j],
+                tgt_query=pos_queries[:, i:j],
+                tgt_query_mask=query_mask[i:j, :j],
+            )
+            # the next token probability is in the output's ith token position
+            p_i = self.head(tgt_out)
+            logits.append(p_i)
+            if j < num_steps:
+                # greedy decode. add the next token index to the target input
+                tgt_in[:, j] = p_i.squeeze().argmax(-1)
+                # Efficient batch decoding: If all output words have at least one EOS token, end decoding.
+                if (
+                    not self.export_onnx
+                    and testing
+                    and (tgt_in == self.tokenizer.eos_id).any(dim=-1).all()
+                ):
+                    break
+
+        return torch.cat(logits, dim=1)
+
+    def _decode_nar(self, memory: Tensor, pos_queries: Tensor) -> Tensor:
+        # No prior context, so input is just <bos>. We query all positions.
+        tgt_in = torch.full(
+            (pos_queries.shape[0], 1),
+            self.tokenizer.bos_id,
+            dtype=torch.long,
+            device=self._device,
+        )
+        tgt_out = self.decode(tgt_in, memory, tgt_query=pos_queries)
+        return self.head(tgt_out)
+
+    def _refine(
+        self,
+        logits: Tensor,
+        memory: Tensor,
+        pos_queries: Tensor,
+        tgt_mask: Tensor,
+        query_mask: Tensor,
+    ) -> Tensor:
+        bs, num_steps = pos_queries.shape[:2]
+        # For iterative refinement, we always use a 'cloze' mask.
+        # We can derive it from the AR forward mask by unmasking the token context to the right.
+        query_mask[
+            torch.triu(
+                torch.ones(
+                    num_steps,
+                    num_steps,
+                    dtype=torch.int64,
+                    device=self._device,
+                ),
+                2,
+            )
+        ] = 0
+        bos = torch.full(
+            (bs, 1),
+            self.tokenizer.bos_id,
+            dtype=torch.long,
+            device=self._device,
+        )
+        for i in range(self.refine_iters):
+            # Prior context is the previous output.
+            tgt_in = torch.cat([bos, logits[:, :-1].argmax(-1)], dim=1)
+            # Mask tokens beyond the first EOS token.
+            tgt_padding_mask = (tgt_in == self.tokenizer.eos_id).int().cumsum(-1) > 0
+            tgt_out = self.decode(
+                tgt_in,
+                memory,
+                tgt_mask,
+                tgt_padding_mask,
+                pos_queries,
+                query_mask[:, : tgt_in.shape[1]],
+            )
+            logits = self.head(tgt_out)
+
+        return logits
+
+    def confidence(self, logits: Tensor) -> Tensor:
+        """
+        Lowest probability of the greedy tokens up to the first <eos> of each
+        sequence. Shape: N
+        """
+        probs, ids = logits.float().softmax(-1).max(-1)
+        # Tokens after the first <eos> are discarded by the tokenizer.
+        eos = (ids == self.tokenizer.eos_id).int()
+        after_eos = eos.cumsum(-1) - eos > 0
+        return probs.masked_fill(after_eos, 1.0).min(-1).values
+
     def forward(
         self,
         images: Tensor,
@@ -140,97 +267,37 @@ class PARSeq(nn.Module, PyTorchModelHubMixin):
 
         # Query positions up to `num_steps`
         pos_queries = self.pos_queries[:, :num_steps].expand(bs, -1, -1)
+        tgt_mask, query_mask = self._masks(num_steps)
 
-        # Special case for the forward permutation. Faster than using `generate_attn_masks()`
-        tgt_mask = query_mask = torch.triu(
-            torch.ones((num_steps, num_steps), dtype=torch.bool, device=self._device),
-            1,
+        hybrid = (
+            self.ar_fallback_threshold is not None and not self.export_onnx and testing
         )
-
-        if self.decode_ar:
-            tgt_in = torch.full(
-                (bs, num_steps),
-                self.tokenizer.pad_id,
-                dtype=torch.long,
-                device=self._device,
-            )
-            tgt_in[:, 0] = self.tokenizer.bos_id
-
-            logits = []
-            for i in range(num_steps):
-                j = i + 1  # next token index
-                # Efficient decoding:
-                # Input the context up to the ith token. We use only one query (at poad masking effect of the canonical (forward) AR context.
-                # Past tokens have no access to future tokens, hence are fixed once computed.sition = i) at a time.
-                # This works because of the lookahe
-                tgt_out = self.decode(
-                    tgt_in[:, :j],
-                    memory,
-                    tgt_mask[:j, :j],
-                    tgt_query=pos_queries[:, i:j],
-                    tgt_query_mask=query_mask[i:j, :j],
-                )
-                # the next token probability is in the output's ith token position
-                p_i = self.head(tgt_out)
-                logits.append(p_i)
-                if j < num_steps:
-                    # greedy decode. add the next token index to the target input
-                    tgt_in[:, j] = p_i.squeeze().argmax(-1)
-                    # Efficient batch decoding: If all output words have at least one EOS token, end decoding.
-                    if (
-                        not self.export_onnx
-                        and testing
-                        and (tgt_in == self.tokenizer.eos_id).any(dim=-1).all()
-                    ):
-                        break
-
-            logits = torch.cat(logits, dim=1)
+        if self.decode_ar and not hybrid:
+            logits = self._decode_ar(memory, pos_queries, tgt_mask, query_mask, testing)
         else:
-            # No prior context, so input is just <bos>. We query all positions.
-            tgt_in = torch.full(
-                (bs, 1),
-                self.tokenizer.bos_id,
-                dtype=torch.long,
-                device=self._device,
-            )
-            tgt_out = self.decode(tgt_in, memory, tgt_query=pos_queries)
-            logits = self.head(tgt_out)
+            logits = self._decode_nar(memory, pos_queries)
 
         if self.refine_iters:
-            # For iterative refinement, we always use a 'cloze' mask.
-            # We can derive it from the AR forward mask by unmasking the token context to the right.
-            query_mask[
-                torch.triu(
-                    torch.ones(
-                        num_steps,
-                        num_steps,
-                        dtype=torch.int64,
-                        device=self._device,
-                    ),
-                    2,
-                )
-            ] = 0
-            bos = torch.full(
-                (bs, 1),
-                self.tokenizer.bos_id,
-                dtype=torch.long,
-                device=self._device,
-            )
-            for i in range(self.refine_iters):
-                # Prior context is the previous output.
-                tgt_in = torch.cat([bos, logits[:, :-1].argmax(-1)], dim=1)
-                # Mask tokens beyond the first EOS token.
-                tgt_padding_mask = (tgt_in == self.tokenizer.eos_id).int().cumsum(
-                    -1
-                ) > 0
-                tgt_out = self.decode(
-                    tgt_in,
-                    memory,
-                    tgt_mask,
-                    tgt_padding_mask,
-                    pos_queries,
-                    query_mask[:, : tgt_in.shape[1]],
+            logits = self._refine(logits, memory, pos_queries, tgt_mask, query_mask)
+
+        if hybrid:
+            # Re-decode the low confidence sequences autoregressively, reusing their encoder outputs.
+            low = self.confidence(logits) < self.ar_fallback_threshold
+            self.num_decoded += bs
+            self.num_fallback += int(low.sum())
+            if low.any():
+                tgt_mask, query_mask = self._masks(num_steps)
+                memory, pos_queries = memory[low], pos_queries[low]
+                fallback = self._decode_ar(
+                    memory, pos_queries, tgt_mask, query_mask, testing
                 )
-                logits = self.head(tgt_out)
+                if self.refine_iters:
+                    fallback = self._refine(
+                        fallback, memory, pos_queries, tgt_mask, query_mask
+                    )
+
+                # AR decoding stops early only once every sequence has an <eos>, so the positions after it are never read.
+                logits = logits.clone()
+                logits[low, : fallback.shape[1]] = fallback.to(logits.dtype)
 
         return logits
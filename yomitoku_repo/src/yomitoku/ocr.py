@@ -1,5 +1,6 @@
 from yomitoku.text_detector import TextDetector
 from yomitoku.text_recognizer import TextRecognizer
+from .ruby import prune_ruby
 from .schemas import OCRSchema
 
 
@@ -25,7 +26,7 @@ def ocr_aggregate(det_outputs, rec_outputs):
 
 
 class OCR:
-    def __init__(self, configs={}, device="cuda", visualize=False):
+    def __init__(self, configs={}, device="cuda", visualize=False, skip_ruby=False):
         text_detector_kwargs = {
             "device": device,
             "visualize": visualize,
@@ -47,6 +48,7 @@ class OCR:
 
         self.detector = TextDetector(**text_detector_kwargs)
         self.recognizer = TextRecognizer(**text_recognizer_kwargs)
+        self.skip_ruby = skip_ruby
 
     def __call__(self, img):
         """_summary_
@@ -56,6 +58,9 @@ class OCR:
         """
 
         det_outputs, vis = self.detector(img)
+        if self.skip_ruby:
+            det_outputs = prune_ruby(det_outputs)
+
         rec_outputs, vis = self.recognizer(img, det_outputs.points, vis=vis)
 
         outputs = {"words": ocr_aggregate(det_outputs, rec_outputs)}
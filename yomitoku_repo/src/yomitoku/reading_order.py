@@ -198,11 +198,19 @@ def _create_graph_left2right(nodes, x_weight=1, y_weight=5):
         node.children = sorted(node.children, key=lambda x: x.prop["box"][1])
 
 
+def _node_prop(element):
+    # スキーマ全体を辞書に変換せず、グラフの作成に必要な値だけを渡す
+    prop = {"box": element.box}
+    if hasattr(element, "contents"):
+        prop["contents"] = element.contents
+    return prop
+
+
 def prediction_reading_order(elements, direction, img=None):
     if len(elements) < 2:
         return elements
 
-    nodes = [Node(i, element.dict()) for i, element in enumerate(elements)]
+    nodes = [Node(i, _node_prop(element)) for i, element in enumerate(elements)]
     if direction == "top2bottom":
         _create_graph_top2bottom(nodes)
     elif direction == "right2left":
@@ -0,0 +1,135 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .utils.logger import set_logger
+
+logger = set_logger(__name__, "INFO")
+
+CACHE_VERSION = 1
+
+
+class RecognitionCache:
+    """
+    LRU cache of the text recognition results keyed by a hash of the word
+    image, after it is cropped, rotated and resized to the input size of the
+    model.
+
+    Running headers, page numbers and form labels repeat on many pages, so
+    their words can skip the recognition model. Only the same pixels hit,
+    which is the case for pages rendered from EPUB or PDF. Words of scanned
+    pages differ by the noise, and a looser match could return the text of a
+    similar looking word, e.g. another page number.
+
+    Args:
+        max_size (int): maximum number of the cached words
+        path (str, optional): JSON file to load the cache from and save it to
+        model (str, optional): name of the recognition model. A saved cache of
+            another model is ignored.
+    """
+
+    def __init__(self, max_size=4096, path=None, model=None):
+        if max_size < 1:
+            raise ValueError("max_size must be positive.")
+
+        self.max_size = max_size
+        self.path = path
+        self.model = model
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if path is not None:
+            self.load()
+            atexit.register(self.save)
+
+    def key(self, img):
+        """
+        Hash of a word image.
+
+        Args:
+            img (np.ndarray): (H, W, C) uint8 word image resized to the input
+                size of the model
+        """
+        img = np.ascontiguousarray(img)
+        digest = hashlib.blake2b(img.tobytes(), digest_size=16)
+        digest.update(str(img.shape).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Cached (text, score) of the key, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, text, score):
+        with self.lock:
+            self.entries[key] = (text, float(score))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load the recognition cache {self.path}: {e}")
+            return
+
+        if data.get("version") != CACHE_VERSION or data.get("model") != self.model:
+            logger.warning(f"Ignore the recognition cache {self.path} of another model")
+            return
+
+        for key, text, score in data["entries"][-self.max_size :]:
+            self.entries[key] = (text, score)
+
+    def save(self):
+        """Save the cache to `path`, replacing the file at once."""
+        if self.path is None:
+            return
+
+        with self.lock:
+            data = {
+                "version": CACHE_VERSION,
+                "model": self.model,
+                "entries": [
+                    [key, text, score] for key, (text, score) in self.entries.items()
+                ],
+            }
+
+        tmp_path = f"{self.path}.{os.getpid()}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
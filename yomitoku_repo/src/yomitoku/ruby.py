@@ -0,0 +1,283 @@
+import re
+
+import numpy as np
+
+from .schemas import TextDetectorSchema
+from .utils.logger import set_logger
+
+logger = set_logger(__name__)
+
+# ひらがな、カタカナ、小書きの仮名、日本語の句読点、空白
+KANA_PATTERN = re.compile(r"^[\u3040-\u309F\u30A0-\u30FF\u3001-\u303F\s]+$")
+
+
+def _to_xyxy_array(points):
+    if len(points) == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+
+    quads = np.asarray(points, dtype=np.float32)
+    return np.concatenate([quads.min(axis=1), quads.max(axis=1)], axis=1)
+
+
+def _search_base(
+    boxes,
+    order,
+    keys,
+    i,
+    axis,
+    max_ratio,
+    min_ratio,
+    max_gap,
+    overlap_ratio,
+):
+    """
+    Search the base line of the i-th box among the lines sorted by `keys`.
+
+    For vertical text (axis=0) the ruby is on the right of the base line, so
+    the right edge of the base is compared with the left edge of the ruby.
+    For horizontal text (axis=1) the ruby is above the base line, so the top
+    edge of the base is compared with the bottom edge of the ruby.
+    """
+
+    x1, y1, x2, y2 = boxes[i]
+    if axis == 0:
+        thickness, start, end, edge = x2 - x1, y1, y2, x1
+    else:
+        thickness, start, end, edge = y2 - y1, x1, x2, y2
+
+    if thickness <= 0:
+        return -1
+
+    # ルビの太さから親文字の太さの範囲が決まるので、探索範囲も絞り込める
+    max_thickness = thickness / min_ratio
+    if axis == 0:
+        lo = np.searchsorted(keys, edge - max_gap * max_thickness, side="left")
+        hi = np.searchsorted(keys, edge + 0.25 * max_thickness, side="right")
+    else:
+        lo = np.searchsorted(keys, edge - 0.25 * max_thickness, side="left")
+        hi = np.searchsorted(keys, edge + max_gap * max_thickness, side="right")
+
+    candidates = order[lo:hi]
+    candidates = candidates[candidates != i]
+    if len(candidates) == 0:
+        return -1
+
+    cand = boxes[candidates]
+    if axis == 0:
+        base_thickness = cand[:, 2] - cand[:, 0]
+        base_length = cand[:, 3] - cand[:, 1]
+        base_start, base_end = cand[:, 1], cand[:, 3]
+        gap = edge - cand[:, 2]
+    else:
+        base_thickness = cand[:, 3] - cand[:, 1]
+        base_length = cand[:, 2] - cand[:, 0]
+        base_start, base_end = cand[:, 0], cand[:, 2]
+        gap = cand[:, 1] - edge
+
+    overlap = np.minimum(end, base_end) - np.maximum(start, base_start)
+
+    valid = (
+        (base_length >= base_thickness)
+        & (thickness <= max_ratio * base_thickness)
+        & (thickness >= min_ratio * base_thickness)
+        & (gap >= -0.25 * base_thickness)
+        & (gap <= max_gap * base_thickness)
+        & (overlap >= overlap_ratio * (end - start))
+    )
+
+    if not valid.any():
+        return -1
+
+    index = np.argmin(np.where(valid, np.abs(gap), np.inf))
+    return int(candidates[index])
+
+
+def find_ruby_candidates(
+    points,
+    max_ratio=0.7,
+    min_ratio=0.2,
+    max_gap=0.5,
+    overlap_ratio=0.8,
+):
+    """
+    Find ruby(furigana) boxes only from the geometry of the detected text
+    boxes, so that they can be handled before the recognition.
+
+    A box is a ruby candidate if it is thinner than an adjacent, parallel base
+    line and runs alongside it: on the right of a vertical line, or above a
+    horizontal line. The boxes are sorted by the edge facing the ruby, and
+    only the lines within the reachable range are compared, so a page with
+    thousands of boxes does not need a pairwise comparison.
+
+    Args:
+        points (list): quadrilaterals of the detected text boxes
+        max_ratio (float): maximum thickness of the ruby relative to the base line
+        min_ratio (float): minimum thickness of the ruby relative to the base line
+        max_gap (float): maximum gap between the ruby and the base line relative to
+            the thickness of the base line
+        overlap_ratio (float): minimum ratio of the ruby length that has to run
+            alongside the base line
+
+    Returns:
+        np.ndarray: bool array, True if the box is a ruby candidate
+        np.ndarray: index of the base line of each box, -1 if the box is not a ruby
+    """
+
+    boxes = _to_xyxy_array(points)
+    n = len(boxes)
+    bases = np.full(n, -1, dtype=np.int64)
+
+    if n < 2:
+        return bases >= 0, bases
+
+    # 縦書き: 親文字の右端でソート、横書き: 親文字の上端でソート
+    indices = {}
+    for axis, key in [(0, boxes[:, 2]), (1, boxes[:, 1])]:
+        order = np.argsort(key, kind="stable")
+        indices[axis] = (order, key[order])
+
+    for i in range(n):
+        for axis in [0, 1]:
+            order, keys = indices[axis]
+            base = _search_base(
+                boxes,
+                order,
+                keys,
+                i,
+                axis,
+                max_ratio,
+                min_ratio,
+                max_gap,
+                overlap_ratio,
+            )
+
+            if base >= 0:
+                bases[i] = base
+                break
+
+    return bases >= 0, bases
+
+
+def prune_ruby(det_outputs, **kwargs):
+    """
+    Remove the ruby candidates from the detection results, so that the ruby
+    crops are not passed to the text recognizer.
+
+    Args:
+        det_outputs (TextDetectorSchema): outputs of the text detector
+        **kwargs: parameters of `find_ruby_candidates`
+
+    Returns:
+        TextDetectorSchema: detection results without the ruby candidates
+    """
+
+    is_ruby, _ = find_ruby_candidates(det_outputs.points, **kwargs)
+
+    logger.debug(f"Pruned {int(is_ruby.sum())} / {len(is_ruby)} ruby boxes")
+
+    return TextDetectorSchema(
+        points=[p for p, r in zip(det_outputs.points, is_ruby) if not r],
+        scores=[s for s, r in zip(det_outputs.scores, is_ruby) if not r],
+    )
+
+
+def is_kana_only(text):
+    """
+    Check if text contains only hiragana, katakana, and Japanese punctuation.
+    """
+    return bool(KANA_PATTERN.match(text))
+
+
+def _base_span(base_box, ruby_box, num_chars, axis):
+    """
+    Estimate the characters of the base line covered by the ruby, assuming
+    the characters are evenly spaced along the line.
+    """
+    if axis == 0:
+        start, end = base_box[1], base_box[3]
+        ruby_start, ruby_end = ruby_box[1], ruby_box[3]
+    else:
+        start, end = base_box[0], base_box[2]
+        ruby_start, ruby_end = ruby_box[0], ruby_box[2]
+
+    pitch = max(end - start, 1) / num_chars
+    centers = start + (np.arange(num_chars) + 0.5) * pitch
+    covered = np.where((centers >= ruby_start) & (centers <= ruby_end))[0]
+
+    if len(covered) == 0:
+        index = int(np.argmin(np.abs(centers - (ruby_start + ruby_end) / 2)))
+        return index, index + 1
+
+    return int(covered[0]), int(covered[-1]) + 1
+
+
+def pair_ruby(words, **kwargs):
+    """
+    Pair each ruby(furigana) with the characters of the base line it belongs to.
+
+    The pairs are found with `find_ruby_candidates`, and only kana-only ruby
+    candidates are kept. The characters under the ruby are estimated from the
+    position of the ruby along the base line.
+
+    Args:
+        words (list[WordPrediction]): recognized words of a page
+        **kwargs: parameters of `find_ruby_candidates`
+
+    Returns:
+        list[dict]: pairs of {"base": index of the base word, "ruby": index of
+            the ruby word, "span": [start, end] of the characters of the base
+            word covered by the ruby}, sorted by the base word and span
+    """
+
+    points = [word.points for word in words]
+    is_ruby, bases = find_ruby_candidates(points, **kwargs)
+    boxes = _to_xyxy_array(points)
+
+    pairs = []
+    for i in np.where(is_ruby)[0]:
+        base = int(bases[i])
+        ruby_text = words[i].content
+        base_text = words[base].content
+
+        if not ruby_text or not base_text or not is_kana_only(ruby_text):
+            continue
+
+        base_box = boxes[base]
+        # 親文字の行方向: 縦長なら縦書き
+        axis = 0 if base_box[3] - base_box[1] >= base_box[2] - base_box[0] else 1
+        start, end = _base_span(base_box, boxes[i], len(base_text), axis)
+
+        pairs.append({"base": base, "ruby": int(i), "span": [start, end]})
+
+    return sorted(pairs, key=lambda x: (x["base"], x["span"][0]))
+
+
+def split_ruby_segments(text, spans):
+    """
+    Split the text of a base word into segments with and without ruby.
+
+    Args:
+        text (str): content of the base word
+        spans (list): list of ([start, end], ruby text) sorted by start
+
+    Returns:
+        list[tuple]: list of (text, ruby text or None)
+    """
+
+    segments = []
+    pos = 0
+    for (start, end), ruby in spans:
+        # 前のルビと重なる場合は前のルビを優先する
+        if start < pos or end > len(text):
+            continue
+
+        if start > pos:
+            segments.append((text[pos:start], None))
+
+        segments.append((text[start:end], ruby))
+        pos = end
+
+    if pos < len(text):
+        segments.append((text[pos:], None))
+
+    return segments
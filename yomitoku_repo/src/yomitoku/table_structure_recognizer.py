@@ -1,15 +1,11 @@
-import cv2
 import os
-import onnx
-import onnxruntime
 import torch
-import torchvision.transforms as T
-from PIL import Image
 
 from .constants import ROOT_DIR
 
-from .base import BaseModelCatalog, BaseModule
+from .base import BaseModelCatalog, BaseModule, create_onnx_session, to_float
 from .configs import TableStructureRecognizerRTDETRv2Config
+from .data.functions import image_to_tensor
 from .layout_parser import filter_contained_rectangles_within_category
 from .models import RTDETRv2
 from .postprocessor import RTDETRPostProcessor
@@ -96,6 +92,10 @@ class TableStructureRecognizer(BaseModule):
         visualize=False,
         from_pretrained=True,
         infer_onnx=False,
+        precision="fp32",
+        channels_last=False,
+        compile=False,
+        num_threads=None,
     ):
         super().__init__()
         self.load_model(
@@ -114,13 +114,6 @@ class TableStructureRecognizer(BaseModule):
             num_top_queries=self._cfg.RTDETRTransformerv2.num_queries,
         )
 
-        self.transforms = T.Compose(
-            [
-                T.Resize(self._cfg.data.img_size),
-                T.ToTensor(),
-            ]
-        )
-
         self.thresh_score = self._cfg.thresh_score
 
         self.label_mapper = {
@@ -136,17 +129,21 @@ class TableStructureRecognizer(BaseModule):
 
             self.model = None
 
+            import onnx
+
             model = onnx.load(path_onnx)
-            if torch.cuda.is_available() and device == "cuda":
-                self.sess = onnxruntime.InferenceSession(
-                    model.SerializeToString(), providers=["CUDAExecutionProvider"]
-                )
-            else:
-                self.sess = onnxruntime.InferenceSession(model.SerializeToString())
+            self.sess = create_onnx_session(model, device, num_threads)
 
         if self.model is not None:
             self.model.to(self.device)
 
+        self.setup_execution(
+            precision=precision,
+            channels_last=channels_last,
+            compile=compile,
+            example_input=torch.zeros(1, 3, *self._cfg.data.img_size),
+        )
+
     def convert_onnx(self, path_onnx):
         dynamic_axes = {
             "input": {0: "batch_size"},
@@ -167,15 +164,14 @@ class TableStructureRecognizer(BaseModule):
         )
 
     def preprocess(self, img, boxes):
-        cv_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
         table_imgs = []
         for box in boxes:
             x1, y1, x2, y2 = map(int, box)
-            table_img = cv_img[y1:y2, x1:x2, :]
+            table_img = img[y1:y2, x1:x2, :]
             th, hw = table_img.shape[:2]
-            table_img = Image.fromarray(table_img)
-            img_tensor = self.transforms(table_img)[None]
+            img_tensor = image_to_tensor(
+                table_img, self._cfg.data.img_size, swap_rb=True
+            )
             table_imgs.append(
                 {
                     "tensor": img_tensor,
@@ -268,9 +264,8 @@ class TableStructureRecognizer(BaseModule):
                 }
 
             else:
-                with torch.inference_mode():
-                    data["tensor"] = data["tensor"].to(self.device)
-                    pred = self.model(data["tensor"])
+                with torch.inference_mode(), self.autocast():
+                    pred = to_float(self.model(self.to_input(data["tensor"])))
 
             table = self.postprocess(pred, data)
 
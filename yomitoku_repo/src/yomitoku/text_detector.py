@@ -1,16 +1,17 @@
+import cv2
 import numpy as np
 import torch
 import os
 
-from .base import BaseModelCatalog, BaseModule
+from .base import BaseModelCatalog, BaseModule, create_onnx_session, to_float
 from .configs import (
     TextDetectorDBNetConfig,
     TextDetectorDBNetV2Config,
 )
 from .data.functions import (
-    array_to_tensor,
-    resize_shortest_edge,
-    standardization_image,
+    estimate_char_size,
+    image_to_tensor,
+    shortest_edge_size,
 )
 from .models import DBNet
 from .postprocessor import DBnetPostProcessor
@@ -18,8 +19,16 @@ from .utils.visualizer import det_visualizer
 from .constants import ROOT_DIR
 from .schemas import TextDetectorSchema
 
-import onnx
-import onnxruntime
+# これまでの前処理と同じく、BGRの画像のままこの順序の平均と標準偏差で正規化する
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+
+def _tile_starts(length, tile_size, stride):
+    starts = list(range(0, max(length - tile_size, 0) + 1, stride))
+    if starts[-1] + tile_size < length:
+        starts.append(length - tile_size)
+    return starts
 
 
 class TextDetectorModelCatalog(BaseModelCatalog):
@@ -40,6 +49,10 @@ class TextDetector(BaseModule):
         visualize=False,
         from_pretrained=True,
         infer_onnx=False,
+        precision="fp32",
+        channels_last=False,
+        compile=False,
+        num_threads=None,
     ):
         super().__init__()
         self.load_model(
@@ -63,19 +76,22 @@ class TextDetector(BaseModule):
 
             self.model = None
 
+            import onnx
+
             model = onnx.load(path_onnx)
-            if torch.cuda.is_available() and device == "cuda":
-                self.sess = onnxruntime.InferenceSession(
-                    model.SerializeToString(), providers=["CUDAExecutionProvider"]
-                )
-            else:
-                self.sess = onnxruntime.InferenceSession(model.SerializeToString())
+            self.sess = create_onnx_session(model, device, num_threads)
 
             self.model = None
 
         if self.model is not None:
             self.model.to(self.device)
 
+        self.setup_execution(
+            precision=precision,
+            channels_last=channels_last,
+            compile=compile,
+        )
+
     def convert_onnx(self, path_onnx):
         dynamic_axes = {
             "input": {0: "batch_size", 2: "height", 3: "width"},
@@ -94,19 +110,145 @@ class TextDetector(BaseModule):
             dynamic_axes=dynamic_axes,
         )
 
+    def input_size(self, img):
+        """
+        Length of the shortest edge of the detector input for the image.
+
+        With `adaptive_resolution`, the character size is estimated from the
+        connected components of the page, and pages with large characters are
+        reduced until the characters are `target_char_size` pixels at the
+        detector input. Pages with small characters keep `shortest_size`.
+        """
+        cfg = self._cfg.data
+        if not cfg.adaptive_resolution:
+            return cfg.shortest_size
+
+        char_size = estimate_char_size(img)
+        if char_size is None:
+            return cfg.shortest_size
+
+        h, w = img.shape[:2]
+        scale = cfg.shortest_size / min(h, w)
+        if max(h, w) * scale > cfg.limit_size:
+            scale = cfg.limit_size / max(h, w)
+
+        if char_size * scale <= cfg.target_char_size:
+            return cfg.shortest_size
+
+        shortest = int(min(h, w) * cfg.target_char_size / char_size)
+        return max(shortest, min(cfg.min_shortest_size, cfg.shortest_size))
+
     def preprocess(self, img):
-        img = img.copy()
-        img = img[:, :, ::-1].astype(np.float32)
-        resized = resize_shortest_edge(
-            img, self._cfg.data.shortest_size, self._cfg.data.limit_size
+        size = shortest_edge_size(
+            img.shape[:2], self.input_size(img), self._cfg.data.limit_size
         )
-        normalized = standardization_image(resized)
-        tensor = array_to_tensor(normalized)
-        return tensor
+        return image_to_tensor(
+            img, size, mean=MEAN, std=STD, interpolation=cv2.INTER_AREA
+        )
+
+    def tile_positions(self, image_size):
+        """
+        Top left corners of the overlapping tiles covering the image at its
+        native scale.
+
+        Args:
+            image_size (tuple): (height, width) of the image
+
+        Returns:
+            list[tuple]: (x, y) of each tile
+        """
+        tile_size = self._cfg.data.tile_size
+        overlap = self._cfg.data.tile_overlap
+        if tile_size % 32 != 0:
+            raise ValueError("tile_size must be a multiple of 32.")
+        if not 0 <= overlap < tile_size:
+            raise ValueError("tile_overlap must be in [0, tile_size).")
+
+        h, w = image_size
+        stride = tile_size - overlap
+        return [
+            (x, y)
+            for y in _tile_starts(h, tile_size, stride)
+            for x in _tile_starts(w, tile_size, stride)
+        ]
+
+    def preprocess_tile(self, img, position):
+        """
+        Crop a tile of `tile_size` from the image without resizing. Tiles
+        running over the edge of the image are padded.
+
+        Returns:
+            torch.Tensor: (1, C, tile_size, tile_size) tensor
+        """
+        tile_size = self._cfg.data.tile_size
+        x, y = position
+        crop = img[y : y + tile_size, x : x + tile_size]
+
+        h, w = crop.shape[:2]
+        buffer = np.zeros((3, tile_size, tile_size), dtype=np.float32)
+        image_to_tensor(crop, mean=MEAN, std=STD, out=buffer[:, :h, :w])
+        return torch.from_numpy(buffer)[None]
+
+    def stitch_tile(self, binary, pred, position):
+        """
+        Merge the prediction of a tile into the probability map of the whole
+        image. The overlapping areas keep the maximum, so a text line cut at
+        the edge of one tile is completed by the neighbouring tile.
+
+        Args:
+            binary (torch.Tensor): (1, 1, H, W) probability map of the image
+            pred (torch.Tensor): (1, 1, tile_size, tile_size) prediction of the tile
+            position (tuple): (x, y) of the tile
+        """
+        x, y = position
+        h, w = binary.shape[2:]
+        th, tw = min(h - y, pred.shape[2]), min(w - x, pred.shape[3])
+        region = binary[:, :, y : y + th, x : x + tw]
+        torch.maximum(region, pred[:, :, :th, :tw].cpu(), out=region)
+
+    def infer_tiled(self, img):
+        """
+        Apply the detection model to overlapping tiles of the image at its
+        native scale, and stitch the predictions into one probability map.
+
+        Returns:
+            dict: predictions with `binary` of shape (1, 1, H, W)
+        """
+        h, w = img.shape[:2]
+        binary = torch.zeros((1, 1, h, w), dtype=torch.float32)
+        positions = self.tile_positions((h, w))
+        batch_size = self._cfg.data.tile_batch_size
+
+        for i in range(0, len(positions), batch_size):
+            batch = positions[i : i + batch_size]
+            tensor = torch.cat([self.preprocess_tile(img, p) for p in batch], 0)
+            preds = self.infer(tensor)["binary"]
+            for j, position in enumerate(batch):
+                self.stitch_tile(binary, preds[j : j + 1], position)
+
+        return {"binary": binary}
 
     def postprocess(self, preds, image_size):
         return self.post_processor(preds, image_size)
 
+    def infer(self, tensor):
+        """
+        Apply the detection model to a batch of preprocessed images of the same size.
+
+        Args:
+            tensor (torch.Tensor): (N, C, H, W) tensor
+
+        Returns:
+            dict: predictions with `binary` of shape (N, 1, H, W)
+        """
+        if self.infer_onnx:
+            input = tensor.numpy()
+            results = self.sess.run(["output"], {"input": input})
+            return {"binary": torch.tensor(results[0])}
+
+        with torch.inference_mode(), self.autocast():
+            return to_float(self.model(self.to_input(tensor)))
+
     def __call__(self, img):
         """apply the detection model to the input image.
 
@@ -115,16 +257,11 @@ class TextDetector(BaseModule):
         """
 
         ori_h, ori_w = img.shape[:2]
-        tensor = self.preprocess(img)
-
-        if self.infer_onnx:
-            input = tensor.numpy()
-            results = self.sess.run(["output"], {"input": input})
-            preds = {"binary": torch.tensor(results[0])}
+        if self._cfg.data.tiling:
+            preds = self.infer_tiled(img)
         else:
-            with torch.inference_mode():
-                tensor = tensor.to(self.device)
-                preds = self.model(tensor)
+            tensor = self.preprocess(img)
+            preds = self.infer(tensor)
 
         quads, scores = self.postprocess(preds, (ori_h, ori_w))
         outputs = {"points": quads, "scores": scores}
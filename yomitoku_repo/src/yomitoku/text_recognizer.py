@@ -3,7 +3,7 @@ import torch
 import os
 import unicodedata
 
-from .base import BaseModelCatalog, BaseModule
+from .base import BaseModelCatalog, BaseModule, create_onnx_session
 from .configs import (
     TextRecognizerPARSeqConfig,
     TextRecognizerPARSeqSmallConfig,
@@ -16,11 +16,9 @@ from .utils.misc import load_charset
 from .utils.visualizer import rec_visualizer
 
 from .constants import ROOT_DIR
+from .recognition_cache import RecognitionCache
 from .schemas import TextRecognizerSchema
 
-import onnx
-import onnxruntime
-
 
 class TextRecognizerModelCatalog(BaseModelCatalog):
     def __init__(self):
@@ -41,6 +39,16 @@ class TextRecognizer(BaseModule):
         visualize=False,
         from_pretrained=True,
         infer_onnx=False,
+        precision="fp32",
+        channels_last=False,
+        compile=False,
+        num_threads=None,
+        cache_size=0,
+        cache_path=None,
+        cascade_model=None,
+        cascade_threshold=0.9,
+        decode_mode=None,
+        ar_fallback_threshold=0.9,
     ):
         super().__init__()
         self.load_model(
@@ -56,30 +64,128 @@ class TextRecognizer(BaseModule):
         self.model.tokenizer = self.tokenizer
         self.model.eval()
 
+        self.set_decode_mode(decode_mode, ar_fallback_threshold)
+
         self.visualize = visualize
 
         self.infer_onnx = infer_onnx
 
         if infer_onnx:
+            if decode_mode == "hybrid":
+                raise ValueError(
+                    "decode_mode 'hybrid' is not supported with infer_onnx."
+                )
+
             name = self._cfg.hf_hub_repo.split("/")[-1]
+            if decode_mode == "nar":
+                name = f"{name}-nar"
             path_onnx = f"{ROOT_DIR}/onnx/{name}.onnx"
             if not os.path.exists(path_onnx):
                 self.convert_onnx(path_onnx)
 
             self.model = None
 
+            import onnx
+
             model = onnx.load(path_onnx)
-            if torch.cuda.is_available() and device == "cuda":
-                self.sess = onnxruntime.InferenceSession(
-                    model.SerializeToString(), providers=["CUDAExecutionProvider"]
-                )
-            else:
-                self.sess = onnxruntime.InferenceSession(model.SerializeToString())
+            self.sess = create_onnx_session(model, device, num_threads)
 
         if self.model is not None:
             self.model.to(self.device)
 
+        self.setup_execution(
+            precision=precision,
+            channels_last=channels_last,
+            compile=compile,
+        )
+
+        # 低いスコアの単語だけを大きいモデルで認識し直す
+        self.cascade = None
+        self.cascade_threshold = cascade_threshold
+        self.num_words = 0
+        self.num_escalated = 0
+        cache_model = self._cfg.hf_hub_repo
+        if decode_mode in ["nar", "hybrid"]:
+            cache_model = f"{cache_model}#{decode_mode}"
+            if decode_mode == "hybrid":
+                cache_model = f"{cache_model}@{ar_fallback_threshold}"
+        if cascade_model is not None:
+            self.cascade = TextRecognizer(
+                model_name=cascade_model,
+                device=device,
+                from_pretrained=from_pretrained,
+                infer_onnx=infer_onnx,
+                precision=precision,
+                channels_last=channels_last,
+                compile=compile,
+                num_threads=num_threads,
+            )
+
+            if list(self.cascade._cfg.data.img_size) != list(self._cfg.data.img_size):
+                raise ValueError(
+                    "The cascade model must have the same input size as the text recognizer."
+                )
+
+            cache_model = (
+                f"{cache_model}>{self.cascade._cfg.hf_hub_repo}@{cascade_threshold}"
+            )
+
+        self.cache = None
+        if cache_size > 0:
+            self.cache = RecognitionCache(
+                max_size=cache_size,
+                path=cache_path,
+                model=cache_model,
+            )
+
+    def set_decode_mode(self, decode_mode, ar_fallback_threshold=0.9):
+        """
+        Select how the PARSeq decoder reads the word images.
+
+        Args:
+            decode_mode (str, optional): "ar" decodes one character at a time
+                conditioned on the previous ones, "nar" decodes every
+                position in one decoder pass, and "hybrid" decodes with "nar"
+                and decodes again with "ar" only the words with a character
+                probability below `ar_fallback_threshold`. Every mode is
+                followed by the `refine_iters` refinement passes of the
+                config. None keeps `decode_ar` of the config.
+            ar_fallback_threshold (float): used with "hybrid"
+        """
+        if decode_mode not in [None, "ar", "nar", "hybrid"]:
+            raise ValueError(
+                f"Invalid decode_mode: {decode_mode}. Choose from 'ar', 'nar' or 'hybrid'."
+            )
+
+        if decode_mode is None:
+            self.model.decode_ar = self._cfg.decode_ar
+        else:
+            self.model.decode_ar = int(decode_mode == "ar")
+
+        self.model.ar_fallback_threshold = (
+            ar_fallback_threshold if decode_mode == "hybrid" else None
+        )
+
+    def decoding_stats(self):
+        """Number of the words decoded with "hybrid" and of the words decoded again with "ar"."""
+        if self.model is None:
+            return {"words": 0, "fallback": 0, "fallback_rate": 0.0}
+
+        words = self.model.num_decoded
+        fallback = self.model.num_fallback
+        return {
+            "words": words,
+            "fallback": fallback,
+            "fallback_rate": fallback / words if words > 0 else 0.0,
+        }
+
     def preprocess(self, img, polygons):
+        dataset, polygons = self._make_dataset(img, polygons)
+        dataloader = self._make_mini_batch(dataset)
+
+        return dataloader, polygons
+
+    def _make_dataset(self, img, polygons):
         if polygons is None:
             h, w = img.shape[:2]
             polygons = [
@@ -92,25 +198,14 @@ class TextRecognizer(BaseModule):
             ]
 
         dataset = ParseqDataset(self._cfg, img, polygons)
-        dataloader = self._make_mini_batch(dataset)
-
-        return dataloader, polygons
+        return dataset, polygons
 
     def _make_mini_batch(self, dataset):
-        mini_batches = []
-        mini_batch = []
-        for data in dataset:
-            data = torch.unsqueeze(data, 0)
-            mini_batch.append(data)
-
-            if len(mini_batch) == self._cfg.data.batch_size:
-                mini_batches.append(torch.cat(mini_batch, 0))
-                mini_batch = []
-        else:
-            if len(mini_batch) > 0:
-                mini_batches.append(torch.cat(mini_batch, 0))
-
-        return mini_batches
+        batch_size = self._cfg.data.batch_size
+        return [
+            dataset.collate(start, min(start + batch_size, len(dataset)))
+            for start in range(0, len(dataset), batch_size)
+        ]
 
     def convert_onnx(self, path_onnx):
         img_size = self._cfg.data.img_size
@@ -132,10 +227,34 @@ class TextRecognizer(BaseModule):
             dynamic_axes=dynamic_axes,
         )
 
+    def infer(self, data):
+        """
+        Apply the recognition model to a batch of preprocessed word images.
+
+        Args:
+            data (torch.Tensor): (N, C, H, W) tensor
+
+        Returns:
+            torch.Tensor: probabilities of the characters
+        """
+        if self.infer_onnx:
+            input = data.numpy()
+            results = self.sess.run(["output"], {"input": input})
+            return torch.tensor(results[0])
+
+        with torch.inference_mode(), self.autocast():
+            return self.model(self.to_input(data)).float().softmax(-1)
+
     def postprocess(self, p, points):
+        pred, score = self.decode(p)
+        return pred, score, self.directions(points)
+
+    def decode(self, p):
         pred, score = self.tokenizer.decode(p)
         pred = [unicodedata.normalize("NFKC", x) for x in pred]
+        return pred, score
 
+    def directions(self, points):
         directions = []
         for point in points:
             point = np.array(point)
@@ -145,7 +264,50 @@ class TextRecognizer(BaseModule):
             direction = "vertical" if h > w * 2 else "horizontal"
             directions.append(direction)
 
-        return pred, score, directions
+        return directions
+
+    def _run_batches(self, dataset, indices):
+        preds, scores = [], []
+        batch_size = self._cfg.data.batch_size
+        for start in range(0, len(indices), batch_size):
+            data = dataset.collate_indices(indices[start : start + batch_size])
+            pred, score = self.decode(self.infer(data))
+            preds.extend(pred)
+            scores.extend(score)
+
+        return preds, scores
+
+    def _recognize(self, dataset, indices):
+        """
+        Recognize the word images of `indices`. With the cascade, the words
+        scored below `cascade_threshold` are recognized again by the cascade
+        model from the same preprocessed word images, and its results are
+        used instead.
+        """
+        preds, scores = self._run_batches(dataset, indices)
+        if self.cascade is None:
+            return preds, scores
+
+        low = [i for i, score in enumerate(scores) if score < self.cascade_threshold]
+        self.num_words += len(indices)
+        self.num_escalated += len(low)
+
+        if len(low) > 0:
+            pred, score = self.cascade._run_batches(dataset, [indices[i] for i in low])
+            for i, text, prob in zip(low, pred, score):
+                preds[i], scores[i] = text, prob
+
+        return preds, scores
+
+    def cascade_stats(self):
+        """Number of the recognized words and of the words escalated to the cascade model."""
+        return {
+            "words": self.num_words,
+            "escalated": self.num_escalated,
+            "escalation_rate": self.num_escalated / self.num_words
+            if self.num_words > 0
+            else 0.0,
+        }
 
     def __call__(self, img, points=None, vis=None):
         """
@@ -157,24 +319,34 @@ class TextRecognizer(BaseModule):
             vis (np.ndarray, optional): rendering image. Defaults to None.
         """
 
-        dataloader, points = self.preprocess(img, points)
-        preds = []
-        scores = []
-        directions = []
-        for data in dataloader:
-            if self.infer_onnx:
-                input = data.numpy()
-                results = self.sess.run(["output"], {"input": input})
-                p = torch.tensor(results[0])
+        dataset, points = self._make_dataset(img, points)
+        preds = [None] * len(dataset)
+        scores = [None] * len(dataset)
+
+        # キャッシュにない単語画像だけをモデルに渡す。同じ画像は一度だけ認識する
+        pending = {}
+        for i in range(len(dataset)):
+            key = i if self.cache is None else self.cache.key(dataset.data[i])
+            if key in pending:
+                pending[key].append(i)
+                continue
+
+            hit = None if self.cache is None else self.cache.get(key)
+            if hit is None:
+                pending[key] = [i]
             else:
-                with torch.inference_mode():
-                    data = data.to(self.device)
-                    p = self.model(data).softmax(-1)
+                preds[i], scores[i] = hit
 
-            pred, score, direction = self.postprocess(p, points)
-            preds.extend(pred)
-            scores.extend(score)
-            directions.extend(direction)
+        keys = list(pending)
+        pred, score = self._recognize(dataset, [pending[key][0] for key in keys])
+        for key, text, prob in zip(keys, pred, score):
+            for i in pending[key]:
+                preds[i], scores[i] = text, prob
+
+            if self.cache is not None:
+                self.cache.put(key, text, prob)
+
+        directions = self.directions(points)
 
         outputs = {
             "contents": preds,
@@ -0,0 +1,178 @@
+from collections import Counter, deque
+
+import cv2
+import numpy as np
+
+THUMBNAIL_SIZE = 512
+SIGNATURE_SIZE = 32
+TRIAGE_KEYS = ("pages", "blank", "no_text", "layout_skipped", "layout_reused")
+
+
+def _pool(gray, size):
+    """
+    Shrink the image to at most `size` on the longer side, keeping the darkest
+    and the brightest pixel of each block. Unlike the area interpolation, thin
+    strokes of small text survive the shrinking.
+    """
+    h, w = gray.shape
+    k = max(1, int(np.ceil(max(h, w) / size)))
+    if k == 1:
+        return gray, gray
+
+    # 収縮・膨張の後に間引くと、ブロックごとの最小値・最大値になる
+    kernel = np.ones((k, k), np.uint8)
+    dark = cv2.erode(gray, kernel)[k // 2 :: k, k // 2 :: k]
+    bright = cv2.dilate(gray, kernel)[k // 2 :: k, k // 2 :: k]
+    return dark, bright
+
+
+def page_statistics(img, size=THUMBNAIL_SIZE, ink_thresh=24):
+    """
+    Cheap statistics of a page on a thumbnail.
+
+    Args:
+        img (np.ndarray): cv2 image(BGR)
+        size (int): longer side of the thumbnail
+        ink_thresh (int): difference from the background to count as ink
+
+    Returns:
+        dict: "ink_ratio", ratio of the thumbnail pixels that differ from the
+            background, "std", standard deviation of the difference from the
+            background, and "ink", the (H, W) bool ink mask of the thumbnail
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    dark, bright = _pool(gray, size)
+
+    # 白地に黒文字でも黒地に白文字でも、背景から離れた画素をインクとみなす
+    # 背景は紙の濃淡やグラデーションに追従するよう局所的な中央値で求める
+    base = bright if np.mean(dark) > 127 else dark
+    h, w = base.shape
+    small = cv2.resize(
+        base, (max(1, w // 4), max(1, h // 4)), interpolation=cv2.INTER_AREA
+    )
+    background = cv2.resize(
+        cv2.medianBlur(small, 5), (w, h), interpolation=cv2.INTER_LINEAR
+    ).astype(np.int16)
+    deviation = np.maximum(
+        np.abs(dark.astype(np.int16) - background),
+        np.abs(bright.astype(np.int16) - background),
+    )
+    ink = deviation > ink_thresh
+
+    return {
+        "ink_ratio": float(ink.mean()),
+        "std": float(deviation.std()),
+        "ink": ink,
+    }
+
+
+def is_blank_page(stats, max_ink_ratio=0.0005):
+    """
+    Whether the page has almost no ink, e.g. a blank scan or a page with only
+    a page number.
+    """
+    return stats["ink_ratio"] <= max_ink_ratio
+
+
+def has_ruled_lines(stats, min_length=0.1, min_lines=2):
+    """
+    Whether the page has the horizontal and vertical rules of a table.
+
+    Args:
+        stats (dict): output of `page_statistics`
+        min_length (float): length of a rule relative to the thumbnail
+        min_lines (int): number of the rules required in each direction
+    """
+    ink = stats["ink"].astype(np.uint8)
+    h, w = ink.shape
+
+    num_lines = []
+    for kernel in [
+        np.ones((1, max(2, int(w * min_length))), np.uint8),
+        np.ones((max(2, int(h * min_length)), 1), np.uint8),
+    ]:
+        lines = cv2.morphologyEx(ink, cv2.MORPH_OPEN, kernel)
+        num, _ = cv2.connectedComponents(lines, connectivity=8)
+        num_lines.append(num - 1)
+
+    return all(num >= min_lines for num in num_lines)
+
+
+def page_signature(img, size=SIGNATURE_SIZE):
+    """
+    Coarse signature of the page layout. At this size the text lines blur
+    into gray blocks, so pages of the same template match even if their text
+    differs.
+
+    Args:
+        img (np.ndarray): cv2 image(BGR)
+        size (int): longer side of the thumbnail
+
+    Returns:
+        np.ndarray: zero-mean thumbnail with the unit norm
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    h, w = gray.shape
+    scale = size / max(h, w)
+    thumbnail = cv2.resize(
+        gray,
+        (max(1, round(w * scale)), max(1, round(h * scale))),
+        interpolation=cv2.INTER_AREA,
+    ).astype(np.float32)
+
+    thumbnail -= thumbnail.mean()
+    norm = np.linalg.norm(thumbnail)
+    return thumbnail / norm if norm > 0 else thumbnail
+
+
+def signature_similarity(a, b):
+    """Correlation of two page signatures, from -1 to 1."""
+    if a.shape != b.shape:
+        return -1.0
+    return float(np.sum(a * b))
+
+
+class LayoutHistory:
+    """
+    Layout analysis results of the recent pages, reused on a following page
+    of the same template, e.g. forms, slides and EPUB pages.
+
+    The boxes of the results are in pixels, so only the pages of the same
+    size match.
+
+    Args:
+        threshold (float): minimum similarity of the page signatures
+        max_pages (int): number of the pages to compare with
+    """
+
+    def __init__(self, threshold=0.9, max_pages=4):
+        self.threshold = threshold
+        self.pages = deque(maxlen=max_pages)
+
+    def find(self, img, signature):
+        """Copy of the layout analysis results of the most similar page, or None."""
+        best, best_similarity = None, self.threshold
+        for shape, other, layout in self.pages:
+            if shape != img.shape[:2]:
+                continue
+
+            similarity = signature_similarity(signature, other)
+            if similarity >= best_similarity:
+                best, best_similarity = layout, similarity
+
+        # 後段の処理で表のセルに文字列が書き込まれるため複製して返す
+        return None if best is None else best.model_copy(deep=True)
+
+    def add(self, img, signature, layout):
+        self.pages.appendleft((img.shape[:2], signature, layout.model_copy(deep=True)))
+
+
+class TriageCounter(Counter):
+    """Number of the pages and the stages skipped by the triage."""
+
+    def snapshot(self):
+        return {key: self[key] for key in TRIAGE_KEYS}
+
+    def since(self, snapshot):
+        """Counts added after `snapshot`, e.g. the pages of one file."""
+        return {key: self[key] - snapshot.get(key, 0) for key in TRIAGE_KEYS}
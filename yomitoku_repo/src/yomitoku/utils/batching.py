@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from .logger import set_logger
+
+logger = set_logger(__name__, "INFO")
+
+
+class MicroBatcher:
+    """
+    Merge work items submitted from several threads into shared batches.
+
+    A background thread takes the queued items and calls `func` with a list of
+    items once `max_batch_size` is reached, or once the oldest item has waited
+    `max_wait` seconds. `func` must return one output per item.
+
+    Args:
+        func (callable): function processing a list of items
+        max_batch_size (int): target size of a batch
+        max_wait (float): maximum time in seconds an item waits for other items
+        size_fn (callable, optional): size of an item in the batch. Each item
+            counts as 1 by default.
+        name (str): name of the batcher used in the metrics
+        timeout (float, optional): maximum time in seconds `__call__` waits for
+            the result. Waits forever if None.
+    """
+
+    def __init__(
+        self,
+        func,
+        max_batch_size,
+        max_wait=0.01,
+        size_fn=None,
+        name="",
+        timeout=300,
+    ):
+        self.func = func
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.size_fn = size_fn if size_fn is not None else lambda _: 1
+        self.name = name
+
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.num_batches = 0
+        self.num_items = 0
+        self.total_size = 0
+        self.wait_times = deque(maxlen=1000)
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self.queue.put((item, self.size_fn(item), future, time.monotonic()))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result(timeout=self.timeout)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        size = first[1]
+        deadline = first[3] + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    entry = self.queue.get(timeout=timeout)
+                else:
+                    entry = self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if entry is None:
+                self.queue.put(None)
+                break
+
+            batch.append(entry)
+            size += entry[1]
+
+        return batch, size
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                break
+
+            batch, size = self._collect(first)
+
+            start = time.monotonic()
+            with self.lock:
+                self.num_batches += 1
+                self.num_items += len(batch)
+                self.total_size += size
+                self.wait_times.extend(start - entry[3] for entry in batch)
+
+            try:
+                outputs = list(self.func([entry[0] for entry in batch]))
+                if len(outputs) != len(batch):
+                    raise ValueError(
+                        f"{self.name} batch returned {len(outputs)} outputs "
+                        f"for {len(batch)} items"
+                    )
+            except Exception as e:
+                logger.error(f"Error occurred in {self.name} batch: {e}")
+                for entry in batch:
+                    entry[2].set_exception(e)
+                continue
+
+            for entry, output in zip(batch, outputs):
+                entry[2].set_result(output)
+
+    def metrics(self):
+        with self.lock:
+            wait_times = list(self.wait_times)
+            return {
+                "queue_depth": self.queue.qsize(),
+                "batches": self.num_batches,
+                "items": self.num_items,
+                "mean_batch_size": (
+                    self.total_size / self.num_batches if self.num_batches else 0.0
+                ),
+                "mean_wait_ms": (
+                    1000 * sum(wait_times) / len(wait_times) if wait_times else 0.0
+                ),
+            }
@@ -1,4 +1,7 @@
+import os
+
 import cv2
+import numpy as np
 
 
 def load_charset(charset_path):
@@ -12,11 +15,19 @@ def filter_by_flag(elements, flags):
     return [element for element, flag in zip(elements, flags) if flag]
 
 
-def save_image(img, path):
-    success, buffer = cv2.imencode(".jpg", img)
+def encode_image(img, ext=".jpg"):
+    success, buffer = cv2.imencode(ext, img)
     if not success:
         raise ValueError("Failed to encode image")
 
+    return buffer
+
+
+def save_image(img, path):
+    """Save the image in the format of the extension of `path`, JPEG if it has none."""
+    ext = os.path.splitext(path)[1].lower() or ".jpg"
+    buffer = encode_image(img, ext)
+
     with open(path, "wb") as f:
         f.write(buffer.tobytes())
 
@@ -39,6 +50,31 @@ def calc_overlap_ratio(rect_a, rect_b):
     return overlap_ratio, intersection
 
 
+def calc_overlap_ratios(rect_a, rects_b):
+    """
+    Vectorized `calc_overlap_ratio` of one rectangle A against N rectangles B.
+
+    Args:
+        rect_a (list): x1, y1, x2, y2
+        rects_b (np.ndarray): (N, 4) rectangles
+
+    Returns:
+        np.ndarray: (N,) ratio of the area of each B overlapped by A
+    """
+    ax1, ay1, ax2, ay2 = map(int, rect_a)
+    rects_b = np.asarray(rects_b, dtype=np.int64).reshape(-1, 4)
+    bx1, by1, bx2, by2 = rects_b.T
+
+    overlap_width = np.maximum(0, np.minimum(ax2, bx2) - np.maximum(ax1, bx1))
+    overlap_height = np.maximum(0, np.minimum(ay2, by2) - np.maximum(ay1, by1))
+    overlap_area = overlap_width * overlap_height
+
+    b_area = (bx2 - bx1) * (by2 - by1)
+    ratios = np.zeros(len(rects_b), dtype=np.float64)
+    np.divide(overlap_area, b_area, out=ratios, where=overlap_area > 0)
+    return ratios
+
+
 def is_contained(rect_a, rect_b, threshold=0.8):
     """二つの矩形A, Bが与えられたとき、矩形Bが矩形Aに含まれるかどうかを判定する。
     ずれを許容するため、重複率求め、thresholdを超える場合にTrueを返す。
@@ -115,6 +151,10 @@ def is_intersected_vertical(rect_a, rect_b):
 
 
 def quad_to_xyxy(quad):
+    # (N, 4, 2)の配列はまとめて(N, 4)の矩形に変換する
+    if isinstance(quad, np.ndarray) and quad.ndim == 3:
+        return np.concatenate([quad.min(axis=1), quad.max(axis=1)], axis=1)
+
     x1 = min([x for x, _ in quad])
     y1 = min([y for _, y in quad])
     x2 = max([x for x, _ in quad])
@@ -1,9 +1,10 @@
-import os
-import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 
 from PIL import Image
-from io import BytesIO
 
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase import pdfmetrics
@@ -11,8 +12,10 @@ from reportlab.pdfbase.pdfmetrics import stringWidth
 
 import numpy as np
 import jaconv
+import pypdfium2
 
 from ..constants import ROOT_DIR
+from ..ruby import pair_ruby
 
 FONT_PATH = ROOT_DIR + "/resource/MPLUS1p-Medium.ttf"
 
@@ -31,20 +34,18 @@ def _poly2rect(points):
     return [x_min, y_min, x_max, y_max]
 
 
+FONT_SIZE_RATES = np.arange(0.5, 1.0, 0.01)
+
+
 def _calc_font_size(content, bbox_height, bbox_width):
-    rates = np.arange(0.5, 1.0, 0.01)
+    # stringWidth is proportional to the font size, so the width at every
+    # candidate size is derived from the width at size 1 in a single call.
+    unit_width = stringWidth(content, "MPLUS1p-Medium", 1)
 
-    min_diff = np.inf
-    best_font_size = None
-    for rate in rates:
-        font_size = bbox_height * rate
-        text_w = stringWidth(content, "MPLUS1p-Medium", font_size)
-        diff = abs(text_w - bbox_width)
-        if diff < min_diff:
-            min_diff = diff
-            best_font_size = font_size
+    font_sizes = bbox_height * FONT_SIZE_RATES
+    diffs = np.abs(font_sizes * unit_width - bbox_width)
 
-    return best_font_size
+    return font_sizes[np.argmin(diffs)]
 
 
 def to_full_width(text):
@@ -62,104 +63,386 @@ def to_full_width(text):
     return jaconv_text
 
 
-def _is_kana_only(text):
+def _layout_text_layer(ocr_result, page_height):
+    """
+    Fit the font size and filter furigana for each word of a page.
+
+    Returns:
+        list: drawing operations of the invisible text layer
+            (text, direction, font_size, x, y) in PDF coordinates
+    """
+    h = page_height
+    operations = []
+
+    # Skip furigana from the accessible text layer
+    # Furigana will remain visible in the image layer but won't be read by screen readers
+    ruby = {pair["ruby"] for pair in pair_ruby(ocr_result.words)}
+
+    for i, word in enumerate(ocr_result.words):
+        if i in ruby:
+            continue
+
+        text = word.content
+        bbox = _poly2rect(word.points)
+        direction = word.direction
+
+        x1, y1, x2, y2 = bbox
+        bbox_height = y2 - y1
+        bbox_width = x2 - x1
+
+        if direction == "vertical":
+            text = to_full_width(text)
+
+        if direction == "horizontal":
+            font_size = _calc_font_size(text, bbox_height, bbox_width)
+        else:
+            font_size = _calc_font_size(text, bbox_width, bbox_height)
+
+        if direction == "vertical":
+            base_y = h - y2 + (bbox_height - font_size)
+        else:
+            base_y = h - y2 + (bbox_height - font_size) * 0.5
+
+        operations.append((text, direction, font_size, x1, base_y))
+
+    return operations
+
+
+EXIF_ORIENTATION = 0x0112
+
+
+def _exif_orientation(source):
+    """EXIF orientation of an encoded image, 1 if the image has none."""
+    try:
+        with Image.open(source) as img:
+            return img.getexif().get(EXIF_ORIENTATION, 1)
+    except Exception:
+        return 1
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
+
+
+def _load_page_image(image, source=None):
     """
-    Check if text contains only hiragana, katakana, and Japanese punctuation.
-    Returns True if the text is likely furigana.
+    Wrap the page image for reportlab without writing it to a temporary file.
+
+    If `source` is the encoded JPEG the page was decoded from, its bytes are
+    embedded as is (DCTDecode) instead of being re-compressed losslessly.
+    JPEGs with an EXIF orientation are re-encoded from the decoded page,
+    which is already rotated, because PDF viewers ignore the EXIF tag.
+    """
+    h, w = image.shape[:2]
+
+    if source is not None:
+        if isinstance(source, bytes):
+            source = BytesIO(source)
+
+        try:
+            if _exif_orientation(source) != 1:
+                raise ValueError("The source image is rotated by EXIF.")
+
+            reader = ImageReader(source)
+            if reader.jpeg_fh() is not None and reader.getSize() == (w, h):
+                return reader
+        except Exception:
+            pass
+
+    reader = ImageReader(Image.fromarray(image[:, :, ::-1]))  # Convert BGR to RGB
+
+    # ImageReader caches the raw data, so decoding happens here (possibly in a
+    # worker thread) instead of when the canvas serializes the page.
+    reader.getRGBData()
+    return reader
+
+
+def _prepare_page(image, ocr_result, source=None):
+    h, w = image.shape[:2]
+    reader = _load_page_image(image, source)
+    operations = _layout_text_layer(ocr_result, h)
+    return reader, (w, h), operations
+
+
+def _draw_text_layer(c, operations):
+    c.setFillColorRGB(1, 1, 1, alpha=0)  # 透明
+    for text, direction, font_size, x, y in operations:
+        if direction == "vertical":
+            # 縦書きは1行を1つのテキストオブジェクトにまとめる。
+            # テキスト行列で-90度回転し、1文字ごとに1文字分ずつ下へ送る。
+            # 回転した文字はベースラインから右へ伸びるので、ディセント分だけ
+            # ずらして文字の左端を単語の左端に揃える
+            descent = pdfmetrics.getDescent("MPLUS1p-Medium", font_size)
+            t = c.beginText()
+            t.setFont("MPLUS1p-Medium", font_size)
+            t.setTextTransform(0, -1, 1, 0, x - descent, y + font_size)
+            for j, ch in enumerate(text):
+                if j > 0:
+                    t.moveCursor(font_size, 0)
+                t.textOut(ch)
+            c.drawText(t)
+        else:
+            c.setFont("MPLUS1p-Medium", font_size)
+            c.drawString(x, y, text)
+
+
+def _text_layer_matrix(page):
+    """
+    Matrix mapping the text layer, drawn in the coordinates of the page as
+    displayed (rotation and crop box applied, origin at the bottom left), to
+    the user space of the page.
     """
-    # Pattern: hiragana, katakana, small kana, Japanese punctuation, whitespace
-    kana_pattern = re.compile(r'^[\u3040-\u309F\u30A0-\u30FF\u3001-\u303F\s]+$')
-    return bool(kana_pattern.match(text))
+    left, bottom, right, top = page.get_cropbox()
+    cw, ch = right - left, top - bottom
 
+    rotation = page.get_rotation()
+    if rotation == 90:
+        matrix = pypdfium2.PdfMatrix(0, 1, -1, 0, cw, 0)
+    elif rotation == 180:
+        matrix = pypdfium2.PdfMatrix(-1, 0, 0, -1, cw, ch)
+    elif rotation == 270:
+        matrix = pypdfium2.PdfMatrix(0, -1, 1, 0, 0, ch)
+    else:
+        matrix = pypdfium2.PdfMatrix()
 
-def _is_furigana(text, font_size, bbox_height, bbox_width):
+    return matrix.translate(left, bottom)
+
+
+class SearchablePDFWriter:
     """
-    Determine if a text element is furigana based on multiple criteria:
-    1. Font size is small (< 8pt)
-    2. Text contains only kana characters
-    3. Bounding box is small relative to typical text
-    
+    Writer that adds each page to the searchable PDF as soon as the page is
+    processed, so that page images do not have to be kept until the end.
+
+    The page images and text layers are prepared in a thread pool while the
+    caller processes the next pages, and the canvas serializes the prepared
+    pages in order. At most `2 * num_workers` pages are kept in memory at a
+    time.
+
     Args:
-        text: The text content
-        font_size: Calculated font size
-        bbox_height: Height of bounding box
-        bbox_width: Width of bounding box
-    
-    Returns:
-        bool: True if the text is likely furigana
-    """
-    # Criterion 1: Small font size (typical furigana is < 8pt)
-    if font_size >= 8:
-        return False
-    
-    # Criterion 2: Must be kana-only
-    if not _is_kana_only(text):
-        return False
-    
-    # Criterion 3: Small bounding box (furigana is typically small)
-    # For horizontal text, height < 12px; for vertical, width < 12px
-    if bbox_height < 12 or bbox_width < 12:
-        return True
-    
-    return False
-
-
-def create_searchable_pdf(images, ocr_results, output_path, font_path=None):
-    if font_path is None:
-        font_path = FONT_PATH
-
-    pdfmetrics.registerFont(TTFont("MPLUS1p-Medium", font_path))
-
-    packet = BytesIO()
-    c = canvas.Canvas(packet)
-
-    for i, (image, ocr_result) in enumerate(zip(images, ocr_results)):
-        image = Image.fromarray(image[:, :, ::-1])  # Convert BGR to RGB
-        image_path = f"tmp_{i}.png"
-        image.save(image_path)
-        w, h = image.size
+        output_path (str): path of the output PDF
+        font_path (str, optional): path of the font file(.ttf) for the text layer
+        num_workers (int): number of threads to prepare the pages
+    """
+
+    def __init__(self, output_path, font_path=None, num_workers=4):
+        if font_path is None:
+            font_path = FONT_PATH
+
+        pdfmetrics.registerFont(TTFont("MPLUS1p-Medium", font_path))
+
+        self.output_path = output_path
+        self.num_pages = 0
+        self.canvas = canvas.Canvas(output_path)
+        self.num_workers = num_workers
+        self.executor = ThreadPoolExecutor(max_workers=num_workers)
+        self.pending = deque()
+
+    def add_page(self, image, ocr_result, source=None):
+        """
+        Queue a page. The page is prepared in the background, so `image` and
+        `ocr_result` must not be modified afterwards.
+
+        Args:
+            image (np.ndarray): page image(BGR)
+            ocr_result: OCR result of the page with `words`
+            source (str or bytes, optional): path or bytes of the encoded image
+                the page was loaded from. JPEG sources are embedded without re-encoding.
+        """
+        self.pending.append(
+            self.executor.submit(_prepare_page, image, ocr_result, source)
+        )
+
+        if len(self.pending) >= 2 * self.num_workers:
+            self.add_prepared_page(*self.pending.popleft().result())
+
+    def add_prepared_page(self, reader, size, operations):
+        c = self.canvas
+        w, h = size
 
         c.setPageSize((w, h))
-        c.drawImage(image_path, 0, 0, width=w, height=h)
-        os.remove(image_path)  # Clean up temporary image file
+        c.drawImage(reader, 0, 0, width=w, height=h)
+        _draw_text_layer(c, operations)
+        c.showPage()
+        self.num_pages += 1
+
+    def flush(self):
+        """Add every queued page to the canvas in order."""
+        while self.pending:
+            self.add_prepared_page(*self.pending.popleft().result())
+
+    def close(self):
+        try:
+            self.flush()
+        except BaseException:
+            self.abort()
+            raise
+
+        self.executor.shutdown()
+        self.canvas.save()
+
+    def abort(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown()
+        self.canvas = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def create_searchable_pdf(
+    images,
+    ocr_results,
+    output_path,
+    font_path=None,
+    sources=None,
+    num_workers=4,
+):
+    """
+    Create a searchable PDF with an invisible text layer over the page images.
+    See `SearchablePDFWriter` for the preparation in a thread pool.
 
-        for word in ocr_result.words:
-            text = word.content
-            bbox = _poly2rect(word.points)
-            direction = word.direction
+    Args:
+        images (list[np.ndarray]): page images(BGR)
+        ocr_results (list): OCR results of the pages
+        output_path (str): path of the output PDF
+        font_path (str, optional): path of the font file(.ttf) for the text layer
+        sources (list, optional): path or bytes of the encoded image of each page
+        num_workers (int): number of threads to prepare the pages
+    """
+    if sources is None:
+        sources = [None] * len(images)
 
-            x1, y1, x2, y2 = bbox
-            bbox_height = y2 - y1
-            bbox_width = x2 - x1
+    with SearchablePDFWriter(
+        output_path, font_path=font_path, num_workers=num_workers
+    ) as writer:
+        for image, ocr_result, source in zip(images, ocr_results, sources):
+            writer.add_page(image, ocr_result, source)
 
-            if direction == "vertical":
-                text = to_full_width(text)
 
-            if direction == "horizontal":
-                font_size = _calc_font_size(text, bbox_height, bbox_width)
-            else:
-                font_size = _calc_font_size(text, bbox_width, bbox_height)
+class SearchablePDFOverlayWriter:
+    """
+    Writer that keeps the pages of the source PDF as they are and only overlays
+    the invisible text layer, instead of embedding the rendered page images.
+    Vector content, fonts and the original image compression are preserved,
+    and the pages are never re-rasterized.
 
-            # Skip furigana from the accessible text layer
-            # Furigana will remain visible in the image layer but won't be read by screen readers
-            if _is_furigana(text, font_size, bbox_height, bbox_width):
-                continue
+    The OCR results are given in the pixel coordinates of the rendered page
+    images and are scaled to the page size in points.
+    """
 
-            c.setFont("MPLUS1p-Medium", font_size)
-            c.setFillColorRGB(1, 1, 1, alpha=0)  # 透明
-            if direction == "vertical":
-                base_y = h - y2 + (bbox_height - font_size)
-                for j, ch in enumerate(text):
-                    c.saveState()
-                    c.translate(x1 + font_size * 0.5, base_y - (j - 1) * font_size)
-                    c.rotate(-90)
-                    c.drawString(0, 0, ch)
-                    c.restoreState()
-            else:
-                base_y = h - y2 + (bbox_height - font_size) * 0.5
-                c.drawString(x1, base_y, text)
+    def __init__(self, pdf_path, output_path, font_path=None, pages=None):
+        """
+        Args:
+            pdf_path (str): path of the source PDF
+            output_path (str): path of the output PDF
+            font_path (str, optional): path of the font file(.ttf) for the text layer
+            pages (list[int], optional): indices of the source pages in the order
+                they are added. All pages by default.
+        """
+        if font_path is None:
+            font_path = FONT_PATH
+
+        pdfmetrics.registerFont(TTFont("MPLUS1p-Medium", font_path))
+
+        self.output_path = output_path
+        self.num_pages = 0
+
+        self.pdf = pypdfium2.PdfDocument(pdf_path)
+        self.pages = list(range(len(self.pdf))) if pages is None else list(pages)
+        self.page_sizes = []
+
+        self.buffer = BytesIO()
+        self.canvas = canvas.Canvas(self.buffer)
+
+    def add_page(self, image, ocr_result, source=None):
+        """
+        Args:
+            image (np.ndarray): rendered image(BGR) of the next source page
+            ocr_result: OCR result of the page with `words`
+            source: unused, accepted for compatibility with `SearchablePDFWriter`
+        """
+        if self.num_pages >= len(self.pages):
+            raise ValueError("More pages were added than the source PDF has.")
+
+        page = self.pdf[self.pages[self.num_pages]]
+        page_w, page_h = page.get_size()
+        page.close()
+
+        h, w = image.shape[:2]
+        operations = _layout_text_layer(ocr_result, h)
+
+        c = self.canvas
+        c.setPageSize((page_w, page_h))
+        c.scale(page_w / w, page_h / h)
+        _draw_text_layer(c, operations)
         c.showPage()
-    c.save()
+        self.num_pages += 1
+
+    def close(self):
+        self.canvas.save()
+
+        text_pdf = pypdfium2.PdfDocument(self.buffer.getvalue())
+        dest = pypdfium2.PdfDocument.new()
+        try:
+            dest.import_pages(self.pdf, pages=self.pages[: self.num_pages])
+
+            for i in range(self.num_pages):
+                page = dest[i]
+                layer = text_pdf.page_as_xobject(i, dest).as_pageobject()
+                layer.transform(_text_layer_matrix(page))
+                page.insert_obj(layer)
+                page.gen_content()
+                page.close()
+
+            dest.save(self.output_path)
+        finally:
+            dest.close()
+            text_pdf.close()
+            self.pdf.close()
+
+    def abort(self):
+        self.canvas = None
+        self.pdf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def create_searchable_pdf_overlay(
+    pdf_path,
+    images,
+    ocr_results,
+    output_path,
+    font_path=None,
+    pages=None,
+):
+    """
+    Create a searchable PDF by overlaying an invisible text layer on the
+    original pages of `pdf_path`.
 
-    with open(output_path, "wb") as f:
-        f.write(packet.getvalue())
+    Args:
+        pdf_path (str): path of the source PDF
+        images (list[np.ndarray]): rendered page images(BGR) the OCR ran on
+        ocr_results (list): OCR results of the pages
+        output_path (str): path of the output PDF
+        font_path (str, optional): path of the font file(.ttf) for the text layer
+        pages (list[int], optional): indices of the source pages of `images`
+    """
+    with SearchablePDFOverlayWriter(
+        pdf_path, output_path, font_path=font_path, pages=pages
+    ) as writer:
+        for image, ocr_result in zip(images, ocr_results):
+            writer.add_page(image, ocr_result)
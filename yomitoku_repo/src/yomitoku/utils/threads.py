@@ -0,0 +1,148 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from .logger import set_logger
+
+logger = set_logger(__name__, "INFO")
+
+
+def available_cores():
+    """CPU cores the process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def set_thread_num_threads(num_threads):
+    """
+    Set the intra-op threads of PyTorch in the calling thread only.
+
+    With the OpenMP backend, `torch.set_num_threads` sets the count of the
+    calling thread and also a process-wide count. Each thread initializes
+    its own count from the process-wide one lazily, on its first call to
+    `torch.get_num_threads` or its first parallel operation. If a fresh
+    thread set its count before that, the initialization would later
+    overwrite it with the count last set by any other thread. Initialize the
+    thread explicitly first.
+    """
+    import torch
+
+    torch.get_num_threads()
+    torch.set_num_threads(num_threads)
+
+
+class ThreadBudget:
+    """
+    Split the CPU cores between the stages running at the same time.
+
+    Each stage gets a contiguous set of cores in proportion to its weight, and
+    at least one core. Inside `stage(name)`, the intra-op threads of PyTorch
+    in the calling thread are limited to the cores of the stage, and the
+    thread is pinned to them if `pin` is set. The intra-op threads of PyTorch
+    with the OpenMP backend are set per calling thread, so concurrent stages
+    do not override each other.
+
+    Args:
+        stages (dict): weight of each stage, e.g. {"text_detector": 1, "layout_analyzer": 1}
+        num_threads (int, optional): number of threads to split. Defaults to
+            the number of available cores.
+        pin (bool): pin the thread running a stage to the cores of the stage
+    """
+
+    def __init__(self, stages, num_threads=None, pin=False):
+        if len(stages) == 0:
+            raise ValueError("stages must not be empty.")
+
+        if any(weight <= 0 for weight in stages.values()):
+            raise ValueError("The weight of a stage must be positive.")
+
+        cores = available_cores()
+        if num_threads is None:
+            num_threads = len(cores)
+
+        if num_threads < len(stages):
+            logger.warning(
+                f"{num_threads} threads are fewer than the {len(stages)} stages. "
+                "Each stage uses 1 thread."
+            )
+            num_threads = len(stages)
+
+        import torch
+
+        self.pin = pin
+        self.num_threads = num_threads
+        self.default_threads = torch.get_num_threads()
+        self.allocation = self._split(stages, num_threads)
+
+        self.core_sets = {}
+        start = 0
+        for name, n in self.allocation.items():
+            # コア数より多くのスレッドを割り当てる場合はコアを循環させる
+            self.core_sets[name] = sorted(
+                {cores[(start + i) % len(cores)] for i in range(n)}
+            )
+            start += n
+
+        logger.info(f"Thread budget: {self.allocation}, cores: {self.core_sets}")
+
+    @staticmethod
+    def _split(stages, num_threads):
+        total = sum(stages.values())
+
+        # 最大剰余法でスレッドを重みに比例して配分する。各ステージに最低1スレッドを割り当てる
+        quotas = {name: num_threads * weight / total for name, weight in stages.items()}
+        allocation = {name: max(1, int(quota)) for name, quota in quotas.items()}
+
+        rest = num_threads - sum(allocation.values())
+        order = sorted(quotas, key=lambda name: int(quotas[name]) - quotas[name])
+        for name in order[: max(rest, 0)]:
+            allocation[name] += 1
+
+        while rest < 0:
+            name = max(allocation, key=allocation.get)
+            allocation[name] -= 1
+            rest += 1
+
+        return allocation
+
+    def threads(self, name):
+        return self.allocation[name]
+
+    def cores(self, name):
+        return self.core_sets[name]
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Run a stage in the calling thread with its threads and cores. The
+        intra-op threads are left set on exit, so call it from a thread
+        dedicated to the stage, e.g. a worker of an executor, and call
+        `restore` from the owner thread once the stages finish.
+        """
+        set_thread_num_threads(self.allocation[name])
+
+        prev_cores = None
+        if self.pin and hasattr(os, "sched_setaffinity"):
+            tid = threading.get_native_id()
+            prev_cores = os.sched_getaffinity(tid)
+            os.sched_setaffinity(tid, self.core_sets[name])
+
+        try:
+            yield
+        finally:
+            if prev_cores is not None:
+                os.sched_setaffinity(tid, prev_cores)
+
+    def restore(self):
+        """
+        Reset the number of threads that new threads start with to the value
+        when the budget was created. Call from the thread that owns the
+        budget, whose own setting is not changed.
+        """
+        import torch
+
+        torch.set_num_threads(self.default_threads)
+
+    def __repr__(self):
+        return f"ThreadBudget({self.allocation}, pin={self.pin})"
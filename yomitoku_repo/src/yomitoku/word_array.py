@@ -0,0 +1,109 @@
+import numpy as np
+
+from .schemas import OCRSchema
+from .utils.misc import quad_to_xyxy
+
+DIRECTIONS = ("horizontal", "vertical")
+
+
+class WordArray:
+    """
+    Struct-of-arrays representation of the OCR words.
+
+    The geometry of all words is held in one array, so the containment and
+    size checks of the pipeline run vectorized instead of once per word.
+    `to_schema` gives the OCRSchema view of the same words.
+
+    Attributes:
+        points (np.ndarray): (N, 4, 2) int32 quadrilaterals
+        det_scores (np.ndarray): (N,) confidence scores of the detection
+        rec_scores (np.ndarray): (N,) confidence scores of the recognition
+        vertical (np.ndarray): (N,) bool, True if the word is vertical
+        contents (list[str]): recognized text of each word
+    """
+
+    __slots__ = ("points", "det_scores", "rec_scores", "vertical", "contents")
+
+    def __init__(self, points, det_scores, rec_scores, directions, contents):
+        self.points = np.asarray(points, dtype=np.int32).reshape(-1, 4, 2)
+        self.det_scores = np.asarray(det_scores, dtype=np.float64)
+        self.rec_scores = np.asarray(rec_scores, dtype=np.float64)
+        self.contents = list(contents)
+
+        unknown = set(directions) - set(DIRECTIONS)
+        if unknown:
+            raise ValueError(f"Invalid direction: {unknown}")
+        self.vertical = np.array([d == "vertical" for d in directions], dtype=bool)
+
+        n = len(self.points)
+        if not (
+            len(self.det_scores) == len(self.rec_scores) == len(self.contents) == n
+        ):
+            raise ValueError("The number of the words must match in every field.")
+
+    @classmethod
+    def from_outputs(cls, det_outputs, rec_outputs):
+        """Build from the outputs of TextDetector and TextRecognizer."""
+        return cls(
+            points=det_outputs.points,
+            det_scores=det_outputs.scores,
+            rec_scores=rec_outputs.scores,
+            directions=rec_outputs.directions,
+            contents=rec_outputs.contents,
+        )
+
+    @classmethod
+    def from_schema(cls, ocr):
+        """Build from an OCRSchema or a list of WordPrediction."""
+        words = ocr.words if isinstance(ocr, OCRSchema) else ocr
+        return cls(
+            points=[word.points for word in words],
+            det_scores=[word.det_score for word in words],
+            rec_scores=[word.rec_score for word in words],
+            directions=[word.direction for word in words],
+            contents=[word.content for word in words],
+        )
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, index):
+        """Subset of the words selected by a boolean mask or indices."""
+        indices = np.arange(len(self))[index]
+        subset = WordArray.__new__(WordArray)
+        subset.points = self.points[indices]
+        subset.det_scores = self.det_scores[indices]
+        subset.rec_scores = self.rec_scores[indices]
+        subset.vertical = self.vertical[indices]
+        subset.contents = [self.contents[i] for i in np.atleast_1d(indices)]
+        return subset
+
+    @property
+    def directions(self):
+        return [DIRECTIONS[int(v)] for v in self.vertical]
+
+    def xyxy(self):
+        """(N, 4) bounding boxes of the words in the format [x1, y1, x2, y2]."""
+        return quad_to_xyxy(self.points)
+
+    def to_words(self):
+        """Words in the format of `ocr_aggregate`."""
+        return [
+            {
+                "points": points,
+                "content": content,
+                "direction": direction,
+                "det_score": det_score,
+                "rec_score": rec_score,
+            }
+            for points, content, direction, det_score, rec_score in zip(
+                self.points.tolist(),
+                self.contents,
+                self.directions,
+                self.det_scores.tolist(),
+                self.rec_scores.tolist(),
+            )
+        ]
+
+    def to_schema(self):
+        return OCRSchema(words=self.to_words())
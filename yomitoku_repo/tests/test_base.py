@@ -1,12 +1,18 @@
 from unittest.mock import patch
 
+import cv2
 import pytest
+import torch
 
+from yomitoku import LayoutParser, TextDetector
 from yomitoku.base import (
     BaseModelCatalog,
     BaseModule,
+    _bf16_supported,
     load_config,
+    load_pretrained,
     load_yaml_config,
+    to_float,
 )
 from yomitoku.configs import LayoutParserRTDETRv2Config
 from yomitoku.models import RTDETRv2
@@ -113,3 +119,112 @@ def test_invalid_base_model():
 
     with pytest.raises(ValueError):
         InvalidModel()
+
+
+def test_load_pretrained(tmp_path):
+    cfg = load_config(LayoutParserRTDETRv2Config)
+    torch.manual_seed(0)
+    model = RTDETRv2(cfg=cfg).eval()
+    model.save_pretrained(tmp_path)
+
+    cfg.hf_hub_repo = str(tmp_path)
+    with patch.object(
+        RTDETRv2, "from_pretrained", side_effect=AssertionError
+    ) as from_pretrained:
+        loaded = load_pretrained(RTDETRv2, cfg)
+
+    from_pretrained.assert_not_called()
+    assert not loaded.training
+
+    expected = model.state_dict()
+    for key, value in loaded.state_dict().items():
+        assert not value.is_meta
+        assert torch.equal(value, expected[key])
+
+    # 重みファイルに含まれないテンソルがあれば通常の読み込みに切り替える
+    state_dict = {k: v for k, v in expected.items() if k != "decoder.anchors"}
+    with patch("safetensors.torch.load_file", return_value=state_dict):
+        with patch.object(
+            RTDETRv2, "from_pretrained", return_value=model
+        ) as from_pretrained:
+            assert load_pretrained(RTDETRv2, cfg) is model
+    from_pretrained.assert_called_once()
+
+
+def test_load_pretrained_fp16(tmp_path):
+    from safetensors.torch import save_file
+
+    cfg = load_config(LayoutParserRTDETRv2Config)
+    torch.manual_seed(0)
+    model = RTDETRv2(cfg=cfg).eval()
+    state_dict = {
+        k: v.half() if v.is_floating_point() else v
+        for k, v in model.state_dict().items()
+    }
+    save_file(state_dict, tmp_path / "model.safetensors")
+
+    # fp16 で保存された重みもモデルの dtype (fp32) で読み込まれる
+    cfg.hf_hub_repo = str(tmp_path)
+    loaded = load_pretrained(RTDETRv2, cfg)
+    for key, value in loaded.state_dict().items():
+        assert value.dtype == model.state_dict()[key].dtype
+        assert torch.equal(value, state_dict[key].to(value.dtype))
+
+
+@pytest.mark.parametrize("module", [TextDetector, LayoutParser])
+@pytest.mark.parametrize(
+    "precision, channels_last, tolerance",
+    [
+        ("fp32", True, 1e-4),
+        ("bf16", False, 5e-2),
+        ("bf16", True, 5e-2),
+    ],
+)
+def test_execution_parity(module, precision, channels_last, tolerance):
+    if precision == "bf16" and not _bf16_supported(torch.device("cpu")):
+        pytest.skip("bf16 is not supported on this CPU")
+
+    torch.manual_seed(0)
+    reference = module(from_pretrained=False, device="cpu")
+    target = module(
+        from_pretrained=False,
+        device="cpu",
+        precision=precision,
+        channels_last=channels_last,
+    )
+    target.model.load_state_dict(reference.model.state_dict())
+    assert target.precision == precision
+
+    img = cv2.imread("tests/data/test.jpg")
+    tensor = reference.preprocess(img)
+
+    # 事前学習済みの重みを使わないため、しきい値処理の前のバックボーンの出力を比較する
+    with torch.inference_mode():
+        expected = reference.model.backbone(tensor)
+        with target.autocast():
+            outputs = target.model.backbone(target.to_input(tensor))
+
+    if isinstance(expected, dict):
+        expected, outputs = list(expected.values()), list(outputs.values())
+
+    for e, o in zip(expected, outputs):
+        assert o.is_contiguous(memory_format=torch.channels_last) == channels_last
+        error = (e - o.float()).norm() / e.norm()
+        assert error < tolerance
+
+
+def test_execution_invalid_precision():
+    with pytest.raises(ValueError):
+        TextDetector(from_pretrained=False, device="cpu", precision="fp16")
+
+
+def test_to_float():
+    outputs = to_float(
+        {
+            "binary": torch.ones(1, dtype=torch.bfloat16),
+            "list": [torch.ones(1, dtype=torch.bfloat16), torch.ones(1).long()],
+        }
+    )
+    assert outputs["binary"].dtype == torch.float32
+    assert outputs["list"][0].dtype == torch.float32
+    assert outputs["list"][1].dtype == torch.int64
@@ -1,11 +1,12 @@
 import os
+from argparse import Namespace
 from pathlib import Path
 
 import pytest
 
 from yomitoku.cli import main
 from yomitoku.utils.logger import set_logger
-from yomitoku.cli.main import validate_encoding
+from yomitoku.cli.main import collect_target_files, is_processed, validate_encoding
 
 logger = set_logger(__name__, "DEBUG")
 
@@ -239,3 +240,38 @@ def test_validate_encoding():
     assert validate_encoding("shift-jis")
     assert validate_encoding("euc-jp")
     assert validate_encoding("cp932")
+
+
+def test_collect_target_files(tmp_path):
+    args = Namespace(outdir=str(tmp_path), combine=False, skip_existing=False)
+    files = collect_target_files(args, Path("tests/data"), "json")
+
+    assert Path("tests/data/test.txt") not in files
+    assert Path("tests/data/subdir/test.jpg") in files
+
+    sizes = [f.stat().st_size for f in files]
+    assert sizes == sorted(sizes, reverse=True)
+
+    path = Path("tests/data/test.pdf")
+    assert not is_processed(args, path, "json")
+
+    open(tmp_path / "data_test_p1.json", "w").close()
+    assert not is_processed(args, path, "json")
+
+    open(tmp_path / "data_test_p2.json", "w").close()
+    assert is_processed(args, path, "json")
+
+    args.skip_existing = True
+    files = collect_target_files(args, Path("tests/data"), "json")
+    assert path not in files
+
+    args.combine = True
+    assert not is_processed(args, path, "json")
+    open(tmp_path / "data_test.json", "w").close()
+    assert is_processed(args, path, "json")
+
+    # jsonlはcombineの指定がなくても1ファイルにまとめて出力する
+    args.combine = False
+    assert not is_processed(args, path, "jsonl")
+    open(tmp_path / "data_test.jsonl", "w").close()
+    assert is_processed(args, path, "jsonl")
@@ -1,13 +1,18 @@
+import cv2
 import numpy as np
 import pytest
+import torch
 
 from yomitoku.data.functions import (
     array_to_tensor,
+    estimate_char_size,
+    image_to_tensor,
     load_image,
     load_pdf,
     resize_shortest_edge,
     resize_with_padding,
     rotate_text_image,
+    shortest_edge_size,
     standardization_image,
     validate_quads,
 )
@@ -101,6 +106,19 @@ def test_resize_shortest_edge():
     assert w % 32 == 0
 
 
+def test_estimate_char_size():
+    for size in [20, 60]:
+        img = np.full((1200, 900, 3), 255, dtype=np.uint8)
+        for y in range(50, 1100, size * 2):
+            for x in range(50, 850, size * 2):
+                cv2.rectangle(img, (x, y), (x + size, y + size), (0, 0, 0), -1)
+
+        assert abs(estimate_char_size(img) - size) <= 2
+
+    img = np.full((1200, 900, 3), 255, dtype=np.uint8)
+    assert estimate_char_size(img) is None
+
+
 def test_standardization_image():
     img = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
     normalized = standardization_image(img)
@@ -114,6 +132,39 @@ def test_array_to_tensor():
     assert tensor.shape == (1, 3, 100, 50)
 
 
+def test_image_to_tensor():
+    img = np.random.randint(0, 255, (100, 50, 3), dtype=np.uint8)
+
+    # これまでの文字検出の前処理(float32に変換してから正規化)と一致する
+    expected = array_to_tensor(standardization_image(img[:, :, ::-1]))
+    tensor = image_to_tensor(img, mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225))
+    assert tensor.shape == (1, 3, 100, 50)
+    assert tensor.dtype == torch.float32
+    assert torch.allclose(tensor, expected, atol=1e-5)
+
+    tensor = image_to_tensor(img, swap_rb=True)
+    expected = torch.from_numpy(img[:, :, ::-1].transpose(2, 0, 1) / 255.0)
+    assert torch.allclose(tensor[0], expected.float(), atol=1e-6)
+
+    tensor = image_to_tensor(img, (64, 32))
+    assert tensor.shape == (1, 3, 64, 32)
+
+    # 出力先のバッファの一部に直接書き込む
+    buffer = np.zeros((2, 3, 120, 60), dtype=np.float32)
+    tensor = image_to_tensor(img, out=buffer[1, :, :100, :50])
+    assert np.shares_memory(tensor.numpy(), buffer)
+    assert np.allclose(buffer[1, :, :100, :50], img.transpose(2, 0, 1) / 255.0)
+    assert not buffer[0].any()
+    assert not buffer[1, :, 100:].any()
+
+
+def test_shortest_edge_size():
+    img = np.zeros((1280, 1920, 3), dtype=np.uint8)
+    for shortest, limit in [(1280, 1600), (1000, 1000), (640, 4000)]:
+        resized = resize_shortest_edge(img, shortest, limit)
+        assert shortest_edge_size(img.shape[:2], shortest, limit) == resized.shape[:2]
+
+
 def test_rotate_image():
     img = np.random.randint(0, 255, (100, 30, 3), dtype=np.uint8)
     rotated = rotate_text_image(img, thresh_aspect=2)
@@ -22,6 +22,8 @@ from yomitoku.schemas import (
     DocumentAnalyzerSchema,
     ParagraphSchema,
     FigureSchema,
+    LayoutAnalyzerSchema,
+    OCRSchema,
     TextDetectorSchema,
     TableStructureRecognizerSchema,
     TableLineSchema,
@@ -605,3 +607,44 @@ def test_split_text_across_cells():
     assert len(results.scores) == 2
     assert results.points[0] == [[0, 0], [50, 0], [50, 20], [0, 20]]
     assert results.points[1] == [[50, 0], [100, 0], [100, 20], [50, 20]]
+
+
+def test_aggregate():
+    analyzer = DocumentAnalyzer.__new__(DocumentAnalyzer)
+    analyzer.ignore_meta = False
+    analyzer.reading_order = "auto"
+    analyzer.img = None
+
+    def word(x, y, content):
+        return WordPrediction(
+            points=[[x, y], [x + 40, y], [x + 40, y + 10], [x, y + 10]],
+            content=content,
+            direction="horizontal",
+            rec_score=0.9,
+            det_score=0.9,
+        )
+
+    ocr = OCRSchema(
+        words=[
+            word(10, 10, "first"),
+            word(10, 30, "second"),
+            word(200, 200, "figure"),
+            word(400, 400, "alone"),
+        ]
+    )
+    layout = LayoutAnalyzerSchema(
+        paragraphs=[{"box": [0, 0, 100, 50], "score": 0.9, "role": None}],
+        tables=[],
+        figures=[{"box": [150, 150, 300, 300], "score": 0.9, "role": None}],
+    )
+
+    outputs = analyzer.aggregate(ocr, layout)
+    results = DocumentAnalyzerSchema(**outputs)
+
+    # 内部の軽量な型は出力の時点で検証済みのスキーマになる
+    assert all(isinstance(p, ParagraphSchema) for p in outputs["paragraphs"])
+    assert all(isinstance(f, FigureSchema) for f in outputs["figures"])
+    assert [p.contents for p in results.paragraphs] == ["first\nsecond", "alone"]
+    assert [p.order for p in results.paragraphs] == [0, 2]
+    assert results.figures[0].order == 1
+    assert results.figures[0].paragraphs[0].contents == "figure"
@@ -1,16 +1,25 @@
 import os
 import json
+from unittest.mock import patch
 
-
+import cv2
 import numpy as np
+import pytest
 
-from yomitoku.export.export_csv import paragraph_to_csv, table_to_csv
+from yomitoku.export.export_csv import paragraph_to_csv, save_csv, table_to_csv
 from yomitoku.export.export_html import (
     convert_text_to_html,
     paragraph_to_html,
     table_to_html,
 )
-from yomitoku.export.export_json import paragraph_to_json, table_to_json
+from yomitoku.export.export_json import (
+    convert_jsonl,
+    dumps_compact,
+    paragraph_to_json,
+    save_json,
+    table_to_json,
+)
+from yomitoku.export.stream_writer import JsonStreamWriter, open_stream_writer
 from yomitoku.export.export_markdown import (
     escape_markdown_special_chars,
     paragraph_to_md,
@@ -634,3 +643,215 @@ def test_export(tmp_path):
     assert os.path.exists(tmp_path / "document_analyzer.csv")
     assert os.path.exists(tmp_path / "document_analyzer.html")
     assert os.path.exists(tmp_path / "document_analyzer.md")
+
+
+def test_stream_writer(tmp_path):
+    pages = [
+        {"paragraphs": [{"contents": "テスト\n", "order": 0}], "tables": []},
+        {"paragraphs": [], "tables": []},
+    ]
+
+    save_json(pages, tmp_path / "expected.json", "utf-8")
+    with open_stream_writer("json", tmp_path / "merged.json") as writer:
+        for page in pages:
+            writer.write(page)
+
+    assert not os.path.exists(f"{tmp_path / 'merged.json'}.part")
+    with open(tmp_path / "merged.json", "r") as f:
+        merged = f.read()
+    with open(tmp_path / "expected.json", "r") as f:
+        assert merged == f.read()
+    assert json.loads(merged) == pages
+
+    elements = [
+        {"type": "table", "element": [["a", "b"], ["c", "d"]]},
+        {"type": "paragraph", "element": "dummy"},
+    ]
+    save_csv(elements + elements, tmp_path / "expected.csv", "utf-8")
+    with open_stream_writer("csv", tmp_path / "merged.csv") as writer:
+        writer.write(elements)
+        writer.write(elements)
+
+    with open(tmp_path / "merged.csv", "r") as f:
+        merged = f.read()
+    with open(tmp_path / "expected.csv", "r") as f:
+        assert merged == f.read()
+
+    with pytest.raises(RuntimeError):
+        with open_stream_writer("md", tmp_path / "merged.md") as writer:
+            writer.write("# page1")
+            raise RuntimeError
+
+    assert not os.path.exists(tmp_path / "merged.md")
+    assert not os.path.exists(f"{tmp_path / 'merged.md'}.part")
+
+
+def test_stream_writer_failure(tmp_path):
+    # ページの書き込みに失敗した場合は一時ファイルも出力ファイルも残さない
+    out_path = tmp_path / "merged.csv"
+    with pytest.raises(KeyError):
+        with open_stream_writer("csv", out_path) as writer:
+            writer.write([{"type": "paragraph", "element": "dummy"}])
+            writer.write([{"type": "paragraph"}])
+
+    assert not os.path.exists(out_path)
+    assert not os.path.exists(f"{out_path}.part")
+
+    # 出力の終端の書き込みに失敗した場合も同様
+    out_path = tmp_path / "merged.json"
+    with patch.object(JsonStreamWriter, "finalize", side_effect=OSError):
+        with pytest.raises(OSError):
+            with open_stream_writer("json", out_path) as writer:
+                writer.write({"page": 1})
+
+    assert not os.path.exists(out_path)
+    assert not os.path.exists(f"{out_path}.part")
+
+    # 出力ファイルへの置き換えに失敗した場合も一時ファイルを消す
+    out_path = tmp_path / "merged.md"
+    os.makedirs(out_path)
+    with pytest.raises(OSError):
+        with open_stream_writer("md", out_path) as writer:
+            writer.write("# page1")
+
+    assert os.path.isdir(out_path)
+    assert not os.path.exists(f"{out_path}.part")
+
+    with pytest.raises(ValueError):
+        with open_stream_writer("xml", tmp_path / "merged.xml"):
+            pass
+    assert not os.path.exists(f"{tmp_path / 'merged.xml'}.part")
+
+
+def make_document_analyzer(contents):
+    paragraph = ParagraphSchema(
+        box=[0, 0, 10, 10],
+        contents=contents,
+        direction="horizontal",
+        order=0,
+        role=None,
+    )
+    cell = TableCellSchema(
+        col=1, row=1, col_span=1, row_span=1, box=[0, 0, 5, 5], contents=contents
+    )
+    line = TableLineSchema(box=[0, 0, 10, 1], score=0.9)
+    table = TableStructureRecognizerSchema(
+        box=[0, 0, 10, 10],
+        n_row=1,
+        n_col=1,
+        rows=[line],
+        cols=[line],
+        spans=[],
+        cells=[cell],
+        order=1,
+    )
+    word = WordPrediction(
+        points=[[0, 0], [10, 0], [10, 10], [0, 10]],
+        content=contents or "",
+        direction="horizontal",
+        rec_score=0.9,
+        det_score=0.8,
+    )
+    figure = FigureSchema(
+        box=[0, 0, 10, 10], order=2, paragraphs=[paragraph], direction="horizontal"
+    )
+    return DocumentAnalyzerSchema(
+        paragraphs=[paragraph], tables=[table], words=[word], figures=[figure]
+    )
+
+
+def test_jsonl_stream_writer(tmp_path):
+    pages = [make_document_analyzer("テスト\n1"), make_document_analyzer(None)]
+
+    line = dumps_compact(pages[0])
+    assert "\n" not in line.replace("\\n", "")
+    assert json.loads(line) == pages[0].model_dump()
+    assert json.loads(dumps_compact({"a": "テスト"})) == {"a": "テスト"}
+
+    with open_stream_writer("jsonl", tmp_path / "merged.jsonl") as writer:
+        writer.write(convert_jsonl(pages[0], "page.jsonl", True, None, False, None))
+        writer.write(pages[1])
+        writer.write({"page": 3})
+
+    with open(tmp_path / "merged.jsonl", "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    assert len(lines) == 3
+    assert json.loads(lines[0])["paragraphs"][0]["contents"] == "テスト1"
+    assert json.loads(lines[0])["tables"][0]["cells"][0]["contents"] == "テスト1"
+    assert json.loads(lines[1]) == pages[1].model_dump()
+    assert json.loads(lines[2]) == {"page": 3}
+
+
+def test_parquet_stream_writer(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    pages = [make_document_analyzer("テスト"), make_document_analyzer(None)]
+    with open_stream_writer("parquet", tmp_path / "merged.parquet") as writer:
+        writer.row_group_size = 1
+        for page in pages:
+            writer.write(page)
+
+    assert not os.path.exists(f"{tmp_path / 'merged.parquet'}.part")
+    rows = pq.read_table(tmp_path / "merged.parquet").to_pylist()
+    assert [row["page"] for row in rows] == [0, 1]
+    for row, page in zip(rows, pages):
+        expected = page.model_dump()
+        assert row["paragraphs"] == expected["paragraphs"]
+        assert row["tables"][0]["cells"] == expected["tables"][0]["cells"]
+        assert row["words"][0]["content"] == expected["words"][0]["content"]
+
+
+def test_figure_writer(tmp_path, monkeypatch):
+    from yomitoku.export import figure_writer
+
+    calls = []
+    save_image = figure_writer.save_image
+
+    def counting_save_image(img, path):
+        calls.append(path)
+        save_image(img, path)
+
+    monkeypatch.setattr(figure_writer, "save_image", counting_save_image)
+
+    img = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
+    document_analyzer = make_document_analyzer("テスト")
+
+    document_analyzer.to_html(tmp_path / "page.html", img=img)
+    document_analyzer.to_markdown(tmp_path / "page.md", img=img)
+    document_analyzer.to_json(tmp_path / "page.json", img=img, export_figure=True)
+
+    # 出力形式が異なっても同じ図は一度だけ書き込む
+    path = tmp_path / "figures" / "page_figure_0.png"
+    assert calls == [str(path)]
+    with open(path, "rb") as f:
+        assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+
+    with open(tmp_path / "page.md", "r", encoding="utf-8") as f:
+        assert "figures/page_figure_0.png" in f.read()
+
+    # 別の画像は書き直す
+    document_analyzer.to_html(tmp_path / "page.html", img=img.copy())
+    assert len(calls) == 2
+
+    # JPEGは指定した場合のみ
+    writer = figure_writer.get_figure_writer()
+    writer.set_figure_format("jpg")
+    try:
+        document_analyzer.to_markdown(tmp_path / "page.md", img=img)
+    finally:
+        writer.set_figure_format("png")
+
+    with open(tmp_path / "figures" / "page_figure_0.jpg", "rb") as f:
+        assert f.read(2) == b"\xff\xd8"
+    with open(tmp_path / "page.md", "r", encoding="utf-8") as f:
+        assert "figures/page_figure_0.jpg" in f.read()
+
+    with pytest.raises(ValueError):
+        writer.set_figure_format("gif")
+
+    writer = figure_writer.FigureWriter(max_workers=2)
+    writer.save(img, [0, 0, 10, 10], str(tmp_path / "figures" / "invalid.xyz"))
+    with pytest.raises(cv2.error):
+        writer.wait()
+    writer.close()
@@ -0,0 +1,81 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = {
+    "torch",
+    "torchvision",
+    "timm",
+    "onnx",
+    "onnxruntime",
+    "reportlab",
+    "shapely",
+    "pyclipper",
+    "lxml",
+    "huggingface_hub",
+}
+
+
+def imported_modules(statement):
+    """
+    Return the top-level modules imported by `statement` in a fresh interpreter,
+    mapped to the yomitoku module whose import pulled them in.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # -X importtime は子モジュールを親より先に、深いほど字下げして出力する
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        field = line.split("|")[-1]
+        name = field.strip()
+        entries.append((len(field) - len(field.lstrip()), name))
+
+    modules = {}
+    for i, (depth, name) in enumerate(entries):
+        importer = None
+        for parent_depth, parent in entries[i + 1 :]:
+            if parent_depth >= depth:
+                continue
+            if parent.startswith("yomitoku"):
+                importer = parent
+                break
+            depth = parent_depth
+        modules.setdefault(name.split(".")[0], importer)
+    return modules
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import yomitoku",
+        "import yomitoku.ruby",
+        "import yomitoku.schemas",
+        "import yomitoku.export",
+        "import yomitoku.cli.main",
+    ],
+)
+def test_import_is_lazy(statement):
+    modules = imported_modules(statement)
+    heavy = {name: modules[name] for name in HEAVY_MODULES & modules.keys()}
+    assert not heavy, f"{statement!r} imports heavy modules (module: importer): {heavy}"
+
+
+def test_lazy_attributes():
+    modules = imported_modules("from yomitoku import OCR")
+    assert "torch" in modules
+    assert "onnx" not in modules
+    assert "onnxruntime" not in modules
+
+    import yomitoku
+
+    assert "DocumentAnalyzer" in dir(yomitoku)
+    with pytest.raises(AttributeError):
+        getattr(yomitoku, "Unknown")
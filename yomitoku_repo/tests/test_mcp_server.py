@@ -0,0 +1,112 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("mcp")
+
+
+@pytest.fixture
+def mcp_server(monkeypatch, tmp_path):
+    monkeypatch.setenv("RESOURCE_DIR", str(tmp_path))
+    from yomitoku.cli import mcp_server
+
+    return mcp_server
+
+
+class DummyContext:
+    def __init__(self):
+        self.progress = []
+
+    async def info(self, message):
+        pass
+
+    async def report_progress(self, progress, total=None):
+        self.progress.append((progress, total))
+
+
+class DummyAnalyzer:
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, img):
+        self.event.wait(timeout=5)
+        return img, None, None
+
+
+def test_analyzer_pool(mcp_server, monkeypatch):
+    event = threading.Event()
+    pool = mcp_server.AnalyzerPool(num_workers=1, max_queue=1, device="cpu")
+    monkeypatch.setattr(pool, "_load_analyzer", lambda: DummyAnalyzer(event))
+
+    async def run():
+        ctx = DummyContext()
+        first = asyncio.create_task(pool.analyze(ctx, [1, 2]))
+        await asyncio.sleep(0.1)
+
+        # 解析中でもイベントループはブロックされない
+        second = asyncio.create_task(pool.analyze(DummyContext(), [3]))
+        await asyncio.sleep(0.1)
+
+        with pytest.raises(mcp_server.ServerBusyError):
+            await pool.analyze(DummyContext(), [4])
+
+        second.cancel()
+        event.set()
+
+        assert await first == [1, 2]
+        assert ctx.progress == [(1, 2), (2, 2)]
+
+        with pytest.raises(asyncio.CancelledError):
+            await second
+
+        assert await pool.analyze(DummyContext(), [5]) == [5]
+        assert len(pool.analyzers) == 1
+
+    asyncio.run(run())
+
+
+def test_analyzer_pool_load_failure(mcp_server, monkeypatch):
+    event = threading.Event()
+    pool = mcp_server.AnalyzerPool(num_workers=1, max_queue=1, device="cpu")
+    num_loads = []
+
+    def load_analyzer():
+        num_loads.append(1)
+        if len(num_loads) == 1:
+            event.wait(timeout=5)
+            raise RuntimeError("failed to load")
+        return DummyAnalyzer(event)
+
+    monkeypatch.setattr(pool, "_load_analyzer", load_analyzer)
+
+    async def run():
+        first = asyncio.create_task(pool.analyze(DummyContext(), [1]))
+        await asyncio.sleep(0.1)
+
+        # 読み込み中のリクエストを待っている
+        second = asyncio.create_task(pool.analyze(DummyContext(), [2]))
+        await asyncio.sleep(0.1)
+        event.set()
+
+        with pytest.raises(RuntimeError):
+            await first
+
+        # 待っていたリクエストが読み込みを再試行する
+        assert await asyncio.wait_for(second, timeout=5) == [2]
+        assert len(num_loads) == 2
+        assert len(pool.analyzers) == 1
+
+    asyncio.run(run())
+
+
+def test_result_cache(mcp_server):
+    cache = mcp_server.ResultCache(max_size=2)
+    cache.put(("a", "json"), "1")
+    cache.put(("b", "json"), "2")
+    assert cache.get(("a", "json")) == "1"
+
+    cache.put(("c", "json"), "3")
+    assert cache.get(("b", "json")) is None
+    assert cache.get(("a", "json")) == "1"
+    assert cache.get(("c", "json")) == "3"
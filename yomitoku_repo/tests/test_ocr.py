@@ -1,8 +1,11 @@
+import numpy as np
 import pytest
 import torch
 from omegaconf import OmegaConf
 
+from yomitoku.data.functions import standardization_image
 from yomitoku.ocr import OCR
+from yomitoku.text_detector import TextDetector
 
 
 def test_ocr():
@@ -41,3 +44,60 @@ def test_ocr_invalid_path():
 
     with pytest.raises(FileNotFoundError):
         OCR(configs=config)
+
+
+def test_text_detector_tiling(monkeypatch):
+    detector = TextDetector(from_pretrained=False, device="cpu")
+    detector._cfg.data.tiling = True
+    detector._cfg.data.tile_size = 256
+    detector._cfg.data.tile_overlap = 64
+
+    positions = detector.tile_positions((700, 500))
+    assert positions[0] == (0, 0)
+    assert max(y for _, y in positions) == 700 - 256
+    assert max(x for x, _ in positions) == 500 - 256
+    assert detector.tile_positions((100, 200)) == [(0, 0)]
+
+    # 各タイルの予測がタイルの位置に戻されていることを確認するため、入力をそのまま返す
+    tiles = []
+
+    def infer(tensor):
+        tiles.append(tensor.shape)
+        return {"binary": torch.sigmoid(tensor[:, :1])}
+
+    monkeypatch.setattr(detector, "infer", infer)
+
+    img = np.random.randint(0, 255, (700, 500, 3), dtype=np.uint8)
+    binary = detector.infer_tiled(img)["binary"]
+
+    expected = standardization_image(img[:, :, ::-1].astype(np.float32))
+    expected = torch.sigmoid(torch.as_tensor(expected[:, :, 0]))
+    assert binary.shape == (1, 1, 700, 500)
+    assert torch.allclose(binary[0, 0], expected)
+    assert all(shape[2:] == (256, 256) for shape in tiles)
+    assert sum(shape[0] for shape in tiles) == len(positions)
+
+    detector._cfg.data.tile_size = 250
+    with pytest.raises(ValueError):
+        detector.tile_positions((700, 500))
+
+
+def test_text_detector_adaptive_resolution(monkeypatch):
+    detector = TextDetector(from_pretrained=False, device="cpu")
+    img = np.full((3500, 2480, 3), 255, dtype=np.uint8)
+    assert detector.input_size(img) == 1280
+
+    detector._cfg.data.adaptive_resolution = True
+    # 通常の解像度(1600/3500倍)で20px以下の文字は縮小しない
+    monkeypatch.setattr("yomitoku.text_detector.estimate_char_size", lambda _: 40)
+    assert detector.input_size(img) == 1280
+
+    monkeypatch.setattr("yomitoku.text_detector.estimate_char_size", lambda _: 60)
+    assert detector.input_size(img) == 2480 * 20 // 60
+
+    monkeypatch.setattr("yomitoku.text_detector.estimate_char_size", lambda _: 400)
+    assert detector.input_size(img) == 640
+    assert detector.preprocess(img).shape[2:] == (896, 640)
+
+    monkeypatch.setattr("yomitoku.text_detector.estimate_char_size", lambda _: None)
+    assert detector.input_size(img) == 1280
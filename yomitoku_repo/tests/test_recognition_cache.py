@@ -0,0 +1,102 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+import torch
+
+from yomitoku.recognition_cache import RecognitionCache
+from yomitoku.text_recognizer import TextRecognizer
+
+
+def _word(text="Page 12", noise=0, seed=0):
+    img = np.full((48, 320, 3), 255, dtype=np.uint8)
+    cv2.putText(img, text, (8, 36), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    if noise > 0:
+        rng = np.random.default_rng(seed)
+        img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255)
+        img = img.astype(np.uint8)
+    return img
+
+
+def test_recognition_cache_lru():
+    cache = RecognitionCache(max_size=2)
+
+    cache.put("a", "ア", 0.9)
+    cache.put("b", "イ", 0.8)
+    assert cache.get("a") == ("ア", 0.9)
+
+    # 最も古く使われた"b"が追い出される
+    cache.put("c", "ウ", 0.7)
+    assert cache.get("b") is None
+    assert cache.get("c") == ("ウ", 0.7)
+
+    assert len(cache) == 2
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 1, "hit_rate": 2 / 3}
+
+    with pytest.raises(ValueError):
+        RecognitionCache(max_size=0)
+
+
+def test_recognition_cache_key():
+    cache = RecognitionCache()
+
+    assert cache.key(_word()) == cache.key(_word())
+    assert cache.key(_word()) != cache.key(_word(noise=2))
+    assert cache.key(_word()) != cache.key(_word("Page 13"))
+    assert cache.key(_word()) != cache.key(_word()[:, :160])
+
+
+def test_recognition_cache_persist(tmp_path):
+    path = tmp_path / "cache.json"
+
+    cache = RecognitionCache(path=str(path), model="parseq")
+    cache.put("a", "ア", 0.9)
+    cache.save()
+
+    assert RecognitionCache(path=str(path), model="parseq").get("a") == ("ア", 0.9)
+    assert RecognitionCache(path=str(path), model="parseq-small").get("a") is None
+
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f)["entries"] == [["a", "ア", 0.9]]
+
+
+def test_text_recognizer_cache(monkeypatch):
+    torch.manual_seed(0)
+    reference = TextRecognizer(from_pretrained=False, device="cpu")
+    recognizer = TextRecognizer(from_pretrained=False, device="cpu", cache_size=16)
+    recognizer.model.load_state_dict(reference.model.state_dict())
+
+    img = np.full((400, 400, 3), 255, dtype=np.uint8)
+    img[50:98, 40:360] = _word("Header")
+    img[150:198, 40:360] = _word("Header")
+    img[250:298, 40:360] = _word("Body 1")
+    points = [
+        [[40, 50], [360, 50], [360, 98], [40, 98]],
+        [[40, 150], [360, 150], [360, 198], [40, 198]],
+        [[40, 250], [360, 250], [360, 298], [40, 298]],
+    ]
+
+    num_words = []
+    infer = recognizer.infer
+
+    def counting_infer(data):
+        num_words.append(len(data))
+        return infer(data)
+
+    monkeypatch.setattr(recognizer, "infer", counting_infer)
+
+    expected, _ = reference(img, points)
+    results, _ = recognizer(img, points)
+
+    # 同じ単語画像は一度だけモデルに渡す
+    assert num_words == [2]
+    assert results.contents == expected.contents
+    assert results.scores == pytest.approx(expected.scores, abs=1e-6)
+    assert results.directions == expected.directions
+
+    # 二度目はすべてキャッシュから返す
+    results, _ = recognizer(img, points)
+    assert num_words == [2]
+    assert results.contents == expected.contents
+    assert recognizer.cache.hits == 3
@@ -0,0 +1,122 @@
+import numpy as np
+
+from yomitoku.ruby import (
+    find_ruby_candidates,
+    pair_ruby,
+    prune_ruby,
+    split_ruby_segments,
+)
+from yomitoku.schemas import TextDetectorSchema, WordPrediction
+
+
+def _quad(x1, y1, x2, y2):
+    return [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+
+
+def test_find_ruby_candidates_vertical():
+    points = [
+        _quad(100, 100, 130, 500),  # 親文字
+        _quad(132, 150, 145, 200),  # 右側のルビ
+        _quad(60, 100, 90, 500),  # 同じ太さの隣の行
+        _quad(45, 300, 58, 340),  # 行の左側の小さな文字
+    ]
+
+    is_ruby, bases = find_ruby_candidates(points)
+
+    assert is_ruby.tolist() == [False, True, False, False]
+    assert bases.tolist() == [-1, 0, -1, -1]
+
+
+def test_find_ruby_candidates_horizontal():
+    points = [
+        _quad(100, 100, 500, 130),  # 親文字
+        _quad(150, 86, 200, 98),  # 上側のルビ
+        _quad(150, 132, 200, 144),  # 下側の小さな文字
+        _quad(600, 86, 650, 98),  # 親文字から離れた小さな文字
+    ]
+
+    is_ruby, bases = find_ruby_candidates(points)
+
+    assert is_ruby.tolist() == [False, True, False, False]
+    assert bases[1] == 0
+
+
+def test_find_ruby_candidates_many_lines():
+    points = []
+    expected = []
+    for col in range(40):
+        x = 2000 - col * 50
+        for row in range(3):
+            y = 100 + row * 1000
+            points.append(_quad(x, y, x + 30, y + 900))
+            points.append(_quad(x + 32, y + 100, x + 45, y + 160))
+            expected.extend([False, True])
+
+    is_ruby, bases = find_ruby_candidates(points)
+
+    assert is_ruby.tolist() == expected
+    assert np.all(bases[1::2] == np.arange(0, len(points), 2))
+
+
+def _word(points, content, direction):
+    return WordPrediction(
+        points=points,
+        content=content,
+        direction=direction,
+        det_score=0.9,
+        rec_score=0.9,
+    )
+
+
+def test_pair_ruby():
+    words = [
+        # 縦書き: 4文字目にルビ
+        _word(_quad(100, 100, 130, 400), "吾輩は猫である", "vertical"),
+        _word(_quad(132, 225, 145, 275), "ねこ", "vertical"),
+        # 横書き: 大きな文字のルビ
+        _word(_quad(300, 700, 700, 780), "漢字かな", "horizontal"),
+        _word(_quad(310, 660, 490, 695), "かんじ", "horizontal"),
+        # 親文字の横にあっても、かな以外はルビとしない
+        _word(_quad(132, 300, 145, 340), "12", "vertical"),
+        # 小さなかなの本文はルビとしない
+        _word(_quad(500, 100, 508, 160), "ほんぶん", "vertical"),
+    ]
+
+    pairs = pair_ruby(words)
+
+    assert pairs == [
+        {"base": 0, "ruby": 1, "span": [3, 4]},
+        {"base": 2, "ruby": 3, "span": [0, 2]},
+    ]
+
+
+def test_split_ruby_segments():
+    assert split_ruby_segments("吾輩は猫である", [([3, 4], "ねこ")]) == [
+        ("吾輩は", None),
+        ("猫", "ねこ"),
+        ("である", None),
+    ]
+
+    assert split_ruby_segments("漢字", [([0, 2], "かんじ"), ([1, 2], "じ")]) == [
+        ("漢字", "かんじ"),
+    ]
+
+    assert split_ruby_segments("本文", []) == [("本文", None)]
+
+
+def test_prune_ruby():
+    det_outputs = TextDetectorSchema(
+        points=[
+            _quad(100, 100, 130, 500),
+            _quad(132, 150, 145, 200),
+        ],
+        scores=[0.9, 0.8],
+    )
+
+    results = prune_ruby(det_outputs)
+
+    assert results.points == [_quad(100, 100, 130, 500)]
+    assert results.scores == [0.9]
+
+    results = prune_ruby(TextDetectorSchema(points=[], scores=[]))
+    assert results.points == []
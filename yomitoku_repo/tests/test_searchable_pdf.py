@@ -0,0 +1,207 @@
+import os
+
+import cv2
+import numpy as np
+import pypdfium2
+from PIL import Image
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from yomitoku.schemas import OCRSchema, WordPrediction
+from yomitoku.utils.searchable_pdf import (
+    FONT_PATH,
+    SearchablePDFWriter,
+    _calc_font_size,
+    _load_page_image,
+    create_searchable_pdf,
+    create_searchable_pdf_overlay,
+)
+
+
+def _ocr_result():
+    words = [
+        {
+            "points": [[10, 10], [110, 10], [110, 40], [10, 40]],
+            "content": "テスト",
+            "direction": "horizontal",
+            "det_score": 0.9,
+            "rec_score": 0.9,
+        },
+        {
+            "points": [[150, 10], [180, 10], [180, 130], [150, 130]],
+            "content": "縦書き",
+            "direction": "vertical",
+            "det_score": 0.9,
+            "rec_score": 0.9,
+        },
+    ]
+    return OCRSchema(words=[WordPrediction(**word) for word in words])
+
+
+def test_calc_font_size():
+    pdfmetrics.registerFont(TTFont("MPLUS1p-Medium", FONT_PATH))
+
+    for content, bbox_height, bbox_width in [
+        ("テスト", 30, 100),
+        ("abc", 12, 200),
+        ("", 20, 10),
+    ]:
+        min_diff = np.inf
+        expected = None
+        for rate in np.arange(0.5, 1.0, 0.01):
+            font_size = bbox_height * rate
+            diff = abs(stringWidth(content, "MPLUS1p-Medium", font_size) - bbox_width)
+            if diff < min_diff:
+                min_diff = diff
+                expected = font_size
+
+        assert np.isclose(_calc_font_size(content, bbox_height, bbox_width), expected)
+
+
+def test_create_searchable_pdf(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    img = np.random.randint(0, 255, (200, 300, 3), dtype=np.uint8)
+    path_jpg = str(tmp_path / "page.jpg")
+    cv2.imwrite(path_jpg, img)
+    img = cv2.imread(path_jpg)
+
+    out_path = tmp_path / "out.pdf"
+    create_searchable_pdf(
+        [img, img],
+        [_ocr_result(), _ocr_result()],
+        output_path=str(out_path),
+        sources=[path_jpg, None],
+    )
+
+    assert os.path.exists(out_path)
+    assert not any(name.startswith("tmp_") for name in os.listdir(tmp_path))
+
+    with open(out_path, "rb") as f:
+        data = f.read()
+
+    assert b"/DCTDecode" in data
+
+    doc = pypdfium2.PdfDocument(str(out_path))
+    assert len(doc) == 2
+    assert "テスト" in doc[0].get_textpage().get_text_range()
+    doc.close()
+
+
+def test_searchable_pdf_writer_order(tmp_path):
+    out_path = str(tmp_path / "out.pdf")
+    sizes = [(100 + 10 * i, 200) for i in range(7)]
+
+    # ワーカーで準備したページも追加した順に書き込む
+    with SearchablePDFWriter(out_path, num_workers=2) as writer:
+        for w, h in sizes:
+            writer.add_page(np.zeros((h, w, 3), dtype=np.uint8), _ocr_result())
+            assert len(writer.pending) < 2 * writer.num_workers
+
+    assert writer.num_pages == len(sizes)
+
+    doc = pypdfium2.PdfDocument(out_path)
+    assert [tuple(map(round, page.get_size())) for page in doc] == sizes
+    doc.close()
+
+
+def test_load_page_image_exif_orientation(tmp_path):
+    img = np.random.randint(0, 255, (200, 300, 3), dtype=np.uint8)
+    exif = Image.Exif()
+    exif[0x0112] = 3  # 180度回転
+
+    path_jpg = str(tmp_path / "rotated.jpg")
+    Image.fromarray(img).save(path_jpg, exif=exif)
+
+    # cv2は回転を適用して読み込むので、縦横が同じでも元のJPEGは埋め込まない
+    decoded = cv2.imread(path_jpg)
+    assert decoded.shape == img.shape
+    assert _load_page_image(decoded, path_jpg).jpeg_fh() is None
+
+    with open(path_jpg, "rb") as f:
+        assert _load_page_image(decoded, f.read()).jpeg_fh() is None
+
+    path_jpg = str(tmp_path / "page.jpg")
+    Image.fromarray(img).save(path_jpg)
+    assert _load_page_image(cv2.imread(path_jpg), path_jpg).jpeg_fh() is not None
+
+
+def test_vertical_text_layer(tmp_path):
+    img = np.zeros((200, 300, 3), dtype=np.uint8)
+    out_path = str(tmp_path / "out.pdf")
+    create_searchable_pdf([img], [_ocr_result()], output_path=out_path)
+
+    doc = pypdfium2.PdfDocument(out_path)
+    textpage = doc[0].get_textpage()
+    text = textpage.get_text_range()
+    start = text.index("縦書き")
+
+    # quad of the vertical word in PDF coordinates (origin at the bottom left)
+    x1, y1, x2, y2 = 150, 200 - 130, 180, 200 - 10
+
+    boxes = [textpage.get_charbox(start + i) for i in range(3)]
+    for left, bottom, right, top in boxes:
+        assert x1 <= left and right <= x2
+        assert y1 <= bottom and top <= y2
+
+    # the characters are stacked from top to bottom
+    for upper, lower in zip(boxes, boxes[1:]):
+        assert lower[3] <= upper[1] + 1e-3
+    doc.close()
+
+
+def test_create_searchable_pdf_overlay(tmp_path):
+    path_pdf = str(tmp_path / "src.pdf")
+    c = canvas.Canvas(path_pdf, pagesize=(300, 200))
+    for _ in range(3):
+        c.rect(10, 10, 100, 50)
+        c.showPage()
+    c.save()
+
+    doc = pypdfium2.PdfDocument(path_pdf)
+    doc[1].set_rotation(90)
+    doc.save(path_pdf + ".tmp")
+    doc.close()
+    os.replace(path_pdf + ".tmp", path_pdf)
+
+    doc = pypdfium2.PdfDocument(path_pdf)
+    imgs = [
+        np.array(doc[i].render(scale=200 / 72).to_pil())[:, :, ::-1] for i in [2, 1]
+    ]
+    doc.close()
+
+    out_path = str(tmp_path / "out.pdf")
+    create_searchable_pdf_overlay(
+        path_pdf,
+        imgs,
+        [_ocr_result(), _ocr_result()],
+        output_path=out_path,
+        pages=[2, 1],
+    )
+
+    with open(out_path, "rb") as f:
+        data = f.read()
+
+    # 元のページをそのまま使うので画像は埋め込まれない
+    assert b"/Subtype /Image" not in data
+
+    doc = pypdfium2.PdfDocument(out_path)
+    assert len(doc) == 2
+    assert doc[0].get_size() == (300, 200)
+    assert doc[1].get_rotation() == 90
+    assert doc[1].get_size() == (200, 300)
+
+    for i in range(2):
+        textpage = doc[i].get_textpage()
+        assert "テスト" in textpage.get_text_range()
+
+        # the first word is at the top left of the page as displayed,
+        # which is the bottom left of the user space when rotated by 90 degrees
+        left, bottom, right, top = textpage.get_charbox(0)
+        if i == 0:
+            assert left < 300 * 0.2 and top > 200 * 0.8
+        else:
+            assert left < 300 * 0.2 and bottom < 200 * 0.2
+    doc.close()
@@ -0,0 +1,169 @@
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import pytest
+
+from yomitoku.cli.server import make_handler
+from yomitoku.schemas import DocumentAnalyzerSchema
+from yomitoku.utils.batching import MicroBatcher
+
+
+class DummyAnalyzer:
+    def __init__(self):
+        self.num_calls = 0
+
+    def __call__(self, img, layout_executor):
+        self.num_calls += 1
+        return DocumentAnalyzerSchema(paragraphs=[], tables=[], words=[], figures=[])
+
+    def metrics(self):
+        return {"requests": self.num_calls}
+
+
+@pytest.fixture
+def server():
+    analyzer = DummyAnalyzer()
+    with ThreadPoolExecutor(max_workers=2) as layout_executor:
+        httpd = ThreadingHTTPServer(
+            ("127.0.0.1", 0), make_handler(analyzer, layout_executor)
+        )
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        yield httpd.server_address
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def request(address, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection(*address, timeout=5)
+    try:
+        if headers is None:
+            conn.request(method, path, body=body)
+        else:
+            # Content-Length を任意の値で送るため、ヘッダーを直接書き込む
+            conn.putrequest(method, path)
+            for key, value in headers.items():
+                conn.putheader(key, value)
+            conn.endheaders(body)
+        res = conn.getresponse()
+        return res.status, json.loads(res.read())
+    finally:
+        conn.close()
+
+
+def test_micro_batcher_merges_concurrent_items():
+    batches = []
+    release = threading.Event()
+
+    def func(items):
+        release.wait(timeout=5)
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(func, max_batch_size=4, max_wait=1.0)
+    futures = [batcher.submit(i) for i in range(4)]
+    release.set()
+
+    assert [f.result(timeout=5) for f in futures] == [0, 2, 4, 6]
+    assert batches == [[0, 1, 2, 3]]
+    assert batcher.metrics()["batches"] == 1
+    assert batcher.metrics()["mean_batch_size"] == 4
+    batcher.close()
+
+
+def test_micro_batcher_flushes_partial_batch():
+    batches = []
+
+    def func(items):
+        batches.append(list(items))
+        return items
+
+    batcher = MicroBatcher(func, max_batch_size=8, max_wait=0.05)
+    start = time.monotonic()
+    assert batcher(1) == 1
+    assert time.monotonic() - start < 2.0
+    assert batches == [[1]]
+    batcher.close()
+
+
+def test_micro_batcher_propagates_exception():
+    def func(items):
+        raise RuntimeError("broken batch")
+
+    batcher = MicroBatcher(func, max_batch_size=2, max_wait=1.0)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="broken batch"):
+            future.result(timeout=5)
+
+    batcher.close()
+
+
+def test_micro_batcher_output_mismatch():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=2, max_wait=1.0)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+    batcher.close()
+
+
+def test_micro_batcher_timeout():
+    release = threading.Event()
+
+    def func(items):
+        release.wait(timeout=5)
+        return items
+
+    batcher = MicroBatcher(func, max_batch_size=1, timeout=0.05)
+    with pytest.raises(FutureTimeoutError):
+        batcher(1)
+
+    release.set()
+    batcher.close()
+
+
+def test_server_endpoints(server):
+    status, body = request(server, "GET", "/health")
+    assert status == 200
+    assert body == {"status": "ok"}
+
+    status, body = request(server, "GET", "/metrics")
+    assert status == 200
+    assert body == {"requests": 0}
+
+    status, _ = request(server, "GET", "/unknown")
+    assert status == 404
+
+    status, _ = request(server, "POST", "/unknown", body=b"")
+    assert status == 404
+
+
+def test_server_analyze(server):
+    img = np.full((64, 64, 3), 255, dtype=np.uint8)
+    _, data = cv2.imencode(".png", img)
+
+    status, body = request(server, "POST", "/analyze", body=data.tobytes())
+    assert status == 200
+    assert body == {"paragraphs": [], "tables": [], "words": [], "figures": []}
+
+    status, body = request(server, "POST", "/analyze", body=b"not an image")
+    assert status == 400
+    assert "error" in body
+
+    status, _ = request(
+        server,
+        "POST",
+        "/analyze",
+        body=b"",
+        headers={"Content-Length": "abc"},
+    )
+    assert status == 400
@@ -0,0 +1,157 @@
+import cv2
+import numpy as np
+import pytest
+import torch
+
+from yomitoku.text_recognizer import TextRecognizer
+
+
+def _word(text="Page 12"):
+    img = np.full((48, 320, 3), 255, dtype=np.uint8)
+    cv2.putText(img, text, (8, 36), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    return img
+
+
+def test_text_recognizer_decode_mode():
+    torch.manual_seed(0)
+    recognizers = {
+        mode: TextRecognizer(
+            model_name="parseq-small",
+            from_pretrained=False,
+            device="cpu",
+            decode_mode=mode,
+            ar_fallback_threshold=0.0,
+        )
+        for mode in ["ar", "nar", "hybrid"]
+    }
+    state_dict = recognizers["ar"].model.state_dict()
+    for recognizer in recognizers.values():
+        recognizer.model.load_state_dict(state_dict)
+
+    img = np.full((200, 400, 3), 255, dtype=np.uint8)
+    img[50:98, 40:360] = _word("Header")
+    img[120:168, 40:360] = _word("Body 1")
+    points = [
+        [[40, 50], [360, 50], [360, 98], [40, 98]],
+        [[40, 120], [360, 120], [360, 168], [40, 168]],
+    ]
+
+    ar, _ = recognizers["ar"](img, points)
+    nar, _ = recognizers["nar"](img, points)
+    hybrid = recognizers["hybrid"]
+
+    # しきい値を下回る単語がなければ非自己回帰の結果のまま
+    results, _ = hybrid(img, points)
+    assert results.contents == nar.contents
+    assert results.scores == pytest.approx(nar.scores)
+    assert hybrid.decoding_stats()["fallback"] == 0
+
+    # すべての単語が下回れば自己回帰の結果になる
+    hybrid.set_decode_mode("hybrid", ar_fallback_threshold=1.1)
+    results, _ = hybrid(img, points)
+    assert results.contents == ar.contents
+    assert results.scores == pytest.approx(ar.scores, abs=1e-6)
+    assert hybrid.decoding_stats() == {
+        "words": 4,
+        "fallback": 2,
+        "fallback_rate": 0.5,
+    }
+
+    with pytest.raises(ValueError):
+        hybrid.set_decode_mode("beam")
+
+
+def test_parseq_hybrid_fallback(monkeypatch):
+    torch.manual_seed(0)
+    model = TextRecognizer(
+        model_name="parseq-small", from_pretrained=False, device="cpu"
+    ).model
+    model.refine_iters = 0
+    model.ar_fallback_threshold = 0.9
+
+    tokenizer = model.tokenizer
+    num_steps = model.max_label_length + 1
+    num_classes = model.head.out_features
+    token = tokenizer._tok2ids("1")[0]
+
+    # 1つ目の系列はすべての位置で確信度が高く、2つ目は先頭の位置だけ低い
+    nar = torch.full((2, num_steps, num_classes), -20.0)
+    nar[:, 0, token] = 20.0
+    nar[:, 1:, tokenizer.eos_id] = 20.0
+    nar[1, 0] = 0.0
+
+    monkeypatch.setattr(model, "_decode_nar", lambda memory, pos_queries: nar.clone())
+
+    calls = []
+    decode_ar = model._decode_ar
+
+    def spy(memory, pos_queries, tgt_mask, query_mask, testing):
+        logits = decode_ar(memory, pos_queries, tgt_mask, query_mask, testing)
+        calls.append((memory.shape[0], logits))
+        return logits
+
+    monkeypatch.setattr(model, "_decode_ar", spy)
+
+    with torch.inference_mode():
+        logits = model(torch.randn(2, 3, *model.cfg.data.img_size))
+
+    # 確信度の低い2つ目の系列だけを自己回帰で復号し直す
+    assert len(calls) == 1
+    rows, fallback = calls[0]
+    assert rows == 1
+    assert torch.equal(logits[0], nar[0])
+    assert torch.allclose(logits[1, : fallback.shape[1]], fallback[0])
+    assert (model.num_decoded, model.num_fallback) == (2, 1)
+
+
+def test_text_recognizer_cascade(monkeypatch):
+    recognizer = TextRecognizer(
+        model_name="parseq-small",
+        from_pretrained=False,
+        device="cpu",
+        cascade_model="parseqv2",
+        cascade_threshold=0.0,
+    )
+
+    img = np.full((200, 400, 3), 255, dtype=np.uint8)
+    img[50:98, 40:360] = _word("Header")
+    img[120:168, 40:360] = _word("Body 1")
+    points = [
+        [[40, 50], [360, 50], [360, 98], [40, 98]],
+        [[40, 120], [360, 120], [360, 168], [40, 168]],
+    ]
+
+    cascade_words = []
+    infer = recognizer.cascade.infer
+
+    def counting_infer(data):
+        cascade_words.append(len(data))
+        return infer(data)
+
+    monkeypatch.setattr(recognizer.cascade, "infer", counting_infer)
+
+    # すべての単語がしきい値以上なら大きいモデルは呼ばない
+    small, _ = recognizer(img, points)
+    assert cascade_words == []
+    assert recognizer.cascade_stats() == {
+        "words": 2,
+        "escalated": 0,
+        "escalation_rate": 0.0,
+    }
+
+    large, _ = recognizer.cascade(img, points)
+    cascade_words.clear()
+
+    # しきい値を超えない単語はすべて大きいモデルの結果になる
+    recognizer.cascade_threshold = 1.1
+    results, _ = recognizer(img, points)
+    assert results.contents == large.contents
+    assert results.scores == pytest.approx(large.scores)
+    assert results.contents != small.contents or results.scores != small.scores
+    assert cascade_words == [2]
+
+    assert recognizer.cascade_stats() == {
+        "words": 4,
+        "escalated": 2,
+        "escalation_rate": 0.5,
+    }
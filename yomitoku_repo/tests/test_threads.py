@@ -0,0 +1,115 @@
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import torch
+
+from yomitoku.cli.main import parse_thread_budget
+from yomitoku.document_analyzer import _build_thread_budget
+from yomitoku.utils.threads import ThreadBudget, available_cores
+
+
+def test_thread_budget_split():
+    budget = ThreadBudget({"a": 3, "b": 1}, num_threads=4)
+    assert budget.threads("a") == 3
+    assert budget.threads("b") == 1
+
+    budget = ThreadBudget({"a": 1, "b": 2}, num_threads=8)
+    assert budget.threads("a") + budget.threads("b") == 8
+    assert budget.threads("b") == 5
+
+    # 重みが偏っていても各ステージに最低1スレッドを割り当てる
+    budget = ThreadBudget({"a": 100, "b": 1, "c": 1}, num_threads=4)
+    assert [budget.threads(name) for name in "abc"] == [2, 1, 1]
+
+    budget = ThreadBudget({"a": 1, "b": 1}, num_threads=1)
+    assert budget.threads("a") == budget.threads("b") == 1
+
+    with pytest.raises(ValueError):
+        ThreadBudget({})
+
+    with pytest.raises(ValueError):
+        ThreadBudget({"a": 0})
+
+
+def test_thread_budget_cores():
+    cores = available_cores()
+    budget = ThreadBudget({"a": 1, "b": 1}, num_threads=2 * len(cores))
+    assert set(budget.cores("a")) <= set(cores)
+    assert set(budget.cores("b")) <= set(cores)
+    assert len(budget.cores("a")) == min(len(cores), budget.threads("a"))
+
+
+def test_thread_budget_stage():
+    budget = ThreadBudget({"a": 3, "b": 1}, num_threads=4, pin=True)
+    default = torch.get_num_threads()
+    results = {}
+    barrier = threading.Barrier(2)
+
+    def run(name):
+        with budget.stage(name):
+            barrier.wait(timeout=5)
+            results[name] = torch.get_num_threads()
+            if hasattr(os, "sched_getaffinity"):
+                affinity = os.sched_getaffinity(threading.get_native_id())
+                assert affinity == set(budget.cores(name))
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 同時に実行しているステージのスレッド数は互いに上書きされない
+    assert results == {"a": 3, "b": 1}
+    assert torch.get_num_threads() == default
+
+
+def test_thread_budget_stage_in_executor():
+    budget = ThreadBudget({"a": 3, "b": 1}, num_threads=4)
+    default = torch.get_num_threads()
+    entered = threading.Barrier(2)
+
+    def run(name):
+        with budget.stage(name):
+            # 両方のステージが設定を終えてから、各スレッドで初めて並列演算を行う
+            entered.wait(timeout=5)
+            torch.ones(256, 256) @ torch.ones(256, 256)
+            return torch.get_num_threads()
+
+    # 新しいワーカースレッドで実行する
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {name: executor.submit(run, name) for name in "ab"}
+        results = {name: future.result() for name, future in futures.items()}
+
+    assert results == {"a": 3, "b": 1}
+
+    budget.restore()
+    assert torch.get_num_threads() == default
+
+
+def test_build_thread_budget():
+    budget = _build_thread_budget({"text_detector": 3, "layout_analyzer": 1}, False)
+    assert budget.threads("text_detector") == 3
+    assert budget.threads("layout_analyzer") == 1
+
+    budget = _build_thread_budget("auto", True)
+    assert budget.pin
+
+    with pytest.raises(ValueError):
+        _build_thread_budget({"text_detector": 3}, False)
+
+    with pytest.raises(ValueError):
+        _build_thread_budget(4, False)
+
+
+def test_parse_thread_budget():
+    assert parse_thread_budget("auto") == "auto"
+    assert parse_thread_budget("none") is None
+    assert parse_thread_budget("6,2") == {"text_detector": 6, "layout_analyzer": 2}
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_thread_budget("6")
@@ -0,0 +1,190 @@
+import cv2
+import numpy as np
+import pytest
+
+from yomitoku.document_analyzer import DocumentAnalyzer
+from yomitoku.schemas import Element, LayoutAnalyzerSchema, TextDetectorSchema
+from yomitoku.triage import (
+    LayoutHistory,
+    TriageCounter,
+    has_ruled_lines,
+    is_blank_page,
+    page_signature,
+    page_statistics,
+    signature_similarity,
+)
+
+
+def _page(background=235, seed=0):
+    rng = np.random.default_rng(seed)
+    img = rng.normal(background, 3, (1754, 1240, 3))
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def _text_page():
+    img = _page()
+    for y in range(100, 1650, 40):
+        cv2.putText(
+            img,
+            "The quick brown fox " * 3,
+            (80, y),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (20, 20, 20),
+            1,
+        )
+    return img
+
+
+def _table_page():
+    img = _page()
+    for y in range(300, 1000, 100):
+        cv2.line(img, (150, y), (1050, y), (0, 0, 0), 2)
+    for x in range(150, 1100, 150):
+        cv2.line(img, (x, 300), (x, 900), (0, 0, 0), 2)
+    return img
+
+
+def _form_page(seed):
+    # 同じ罫線の様式に、ページごとに異なる値を記入する
+    img = _table_page()
+    rng = np.random.default_rng(seed)
+    for y in range(350, 900, 100):
+        for x in range(160, 1050, 150):
+            value = "".join(rng.choice(list("0123456789"), rng.integers(2, 8)))
+            cv2.putText(img, value, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+    return img
+
+
+def test_page_statistics():
+    blank = page_statistics(_page())
+    assert is_blank_page(blank)
+    assert not has_ruled_lines(blank)
+
+    # 紙の濃淡が緩やかに変化しているだけのページも白紙とみなす
+    gradient = np.linspace(180, 250, 1754)[:, None, None]
+    gradient = np.broadcast_to(gradient, (1754, 1240, 3)).astype(np.uint8)
+    assert is_blank_page(page_statistics(gradient))
+
+    text = page_statistics(_text_page())
+    assert not is_blank_page(text)
+    assert not has_ruled_lines(text)
+
+    # 白黒反転したページも同じように判定する
+    inverted = page_statistics(255 - _text_page())
+    assert inverted["ink_ratio"] == pytest.approx(text["ink_ratio"], rel=0.05)
+
+    # 細い一行の文字は縮小しても消えない
+    img = _page()
+    cv2.putText(
+        img, "Chapter 1", (500, 800), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (20, 20, 20), 1
+    )
+    assert not is_blank_page(page_statistics(img))
+
+    assert has_ruled_lines(page_statistics(_table_page()))
+
+
+def test_triage_counter():
+    counter = TriageCounter()
+    counter["pages"] += 2
+    snapshot = counter.snapshot()
+    counter["pages"] += 3
+    counter["blank"] += 1
+
+    assert counter.since(snapshot) == {
+        "pages": 3,
+        "blank": 1,
+        "no_text": 0,
+        "layout_skipped": 0,
+        "layout_reused": 0,
+    }
+
+
+def test_page_signature():
+    form = page_signature(_form_page(1))
+    assert signature_similarity(form, page_signature(_form_page(2))) > 0.9
+    assert signature_similarity(form, page_signature(_text_page())) < 0.5
+    assert signature_similarity(form, page_signature(_form_page(1)[:, :600])) == -1
+
+    layout = LayoutAnalyzerSchema(
+        paragraphs=[Element(box=[10, 10, 100, 50], score=0.9, role=None)],
+        tables=[],
+        figures=[],
+    )
+    history = LayoutHistory(threshold=0.9)
+    img = _form_page(1)
+    history.add(img, form, layout)
+
+    reused = history.find(_form_page(2), page_signature(_form_page(2)))
+    assert reused == layout and reused is not layout
+    assert history.find(_text_page(), page_signature(_text_page())) is None
+
+
+class _Stage:
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.outputs
+
+
+def _make_analyzer(skip_blank, layout_policy):
+    # モデルを読み込まずに各段階の呼び出しだけを確認する
+    analyzer = DocumentAnalyzer.__new__(DocumentAnalyzer)
+    analyzer.ignore_meta = False
+    analyzer.reading_order = "auto"
+    analyzer.visualize = False
+    analyzer.split_text_across_cells = False
+    analyzer.skip_ruby = False
+    analyzer.thread_budget = None
+    analyzer.skip_blank = skip_blank
+    analyzer.layout_policy = layout_policy
+    analyzer.triage = TriageCounter()
+    analyzer.layout_history = None
+    analyzer.text_detector = _Stage((TextDetectorSchema(points=[], scores=[]), None))
+    analyzer.text_recognizer = _Stage(None)
+    analyzer.layout = _Stage(None)
+    return analyzer
+
+
+def test_document_analyzer_triage():
+    analyzer = _make_analyzer(skip_blank=True, layout_policy="auto")
+
+    results, _, _ = analyzer(_page())
+    assert results.paragraphs == [] and results.words == []
+    assert analyzer.text_detector.calls == 0
+
+    results, _, _ = analyzer(_text_page())
+    assert results.words == []
+    assert analyzer.text_detector.calls == 1
+    assert analyzer.text_recognizer.calls == 0
+    assert analyzer.layout.calls == 0
+
+    assert analyzer.triage.snapshot() == {
+        "pages": 2,
+        "blank": 1,
+        "no_text": 1,
+        "layout_skipped": 1,
+        "layout_reused": 0,
+    }
+
+    with pytest.raises(ValueError):
+        DocumentAnalyzer(layout_policy="never")
+
+
+def test_document_analyzer_reuse_layout():
+    analyzer = _make_analyzer(skip_blank=False, layout_policy="always")
+    analyzer.layout_history = LayoutHistory(threshold=0.9)
+    analyzer.layout = _Stage(
+        (LayoutAnalyzerSchema(paragraphs=[], tables=[], figures=[]), None)
+    )
+
+    for page in [_form_page(1), _form_page(2), _text_page(), _form_page(3)]:
+        analyzer(page)
+
+    # 様式が同じページではレイアウト解析を省略し、文字の検出は毎ページ行う
+    assert analyzer.layout.calls == 2
+    assert analyzer.text_detector.calls == 4
+    assert analyzer.triage["layout_reused"] == 2
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from yomitoku.document_analyzer import is_noise, is_vertical
+from yomitoku.ocr import ocr_aggregate
+from yomitoku.schemas import OCRSchema, TextDetectorSchema, TextRecognizerSchema
+from yomitoku.utils.misc import calc_overlap_ratio, calc_overlap_ratios, quad_to_xyxy
+from yomitoku.word_array import WordArray
+
+
+def make_outputs():
+    points = [
+        [[0, 0], [100, 0], [100, 20], [0, 20]],
+        [[10, 30], [30, 30], [30, 130], [10, 130]],
+        [[50, 50], [55, 50], [55, 52], [50, 52]],
+    ]
+    det = TextDetectorSchema(points=points, scores=[0.9, 0.8, 0.7])
+    rec = TextRecognizerSchema(
+        contents=["横書き", "縦書き", "ノイズ"],
+        scores=[0.95, 0.85, 0.1],
+        points=points,
+        directions=["horizontal", "vertical", "horizontal"],
+    )
+    return det, rec
+
+
+def test_word_array_roundtrip():
+    det, rec = make_outputs()
+    words = WordArray.from_outputs(det, rec)
+
+    assert len(words) == 3
+    assert words.points.shape == (3, 4, 2)
+    assert words.points.dtype == np.int32
+    assert words.vertical.tolist() == [False, True, False]
+    assert words.directions == rec.directions
+
+    # 既存のスキーマと同じ結果になる
+    expected = OCRSchema(words=ocr_aggregate(det, rec))
+    assert words.to_words() == ocr_aggregate(det, rec)
+    assert words.to_schema() == expected
+    assert WordArray.from_schema(expected).to_schema() == expected
+    assert WordArray.from_schema(expected.words).to_schema() == expected
+
+
+def test_word_array_subset():
+    det, rec = make_outputs()
+    words = WordArray.from_outputs(det, rec)
+
+    subset = words[words.vertical]
+    assert len(subset) == 1
+    assert subset.contents == ["縦書き"]
+    assert subset.xyxy().tolist() == [[10, 30, 30, 130]]
+
+    subset = words[[0, 2]]
+    assert subset.contents == ["横書き", "ノイズ"]
+    assert subset.det_scores.tolist() == [0.9, 0.7]
+
+    empty = WordArray.from_schema([])
+    assert len(empty) == 0
+    assert empty.xyxy().shape == (0, 4)
+
+
+def test_word_array_invalid():
+    with pytest.raises(ValueError):
+        WordArray([[[0, 0]] * 4], [0.9], [0.9], ["diagonal"], ["a"])
+
+    with pytest.raises(ValueError):
+        WordArray([[[0, 0]] * 4], [0.9, 0.8], [0.9], ["horizontal"], ["a"])
+
+
+def test_vectorized_geometry():
+    det, rec = make_outputs()
+    quads = WordArray.from_outputs(det, rec).points
+
+    boxes = quad_to_xyxy(quads)
+    assert boxes.tolist() == [list(quad_to_xyxy(p)) for p in det.points]
+
+    rect = [0, 0, 60, 60]
+    ratios = calc_overlap_ratios(rect, boxes)
+    expected = [calc_overlap_ratio(rect, box)[0] for box in boxes]
+    assert np.allclose(ratios, expected)
+    assert calc_overlap_ratios(rect, np.zeros((0, 4))).shape == (0,)
+
+    assert is_vertical(quads).tolist() == [is_vertical(p) for p in det.points]
+    assert is_noise(quads).tolist() == [is_noise(p) for p in det.points]
+    assert is_noise(quads).tolist() == [False, False, True]